@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE "Flyer" ADD COLUMN     "contentHash" TEXT;
+
+-- AlterTable
+ALTER TABLE "Offer" ADD COLUMN     "contentHash" TEXT;
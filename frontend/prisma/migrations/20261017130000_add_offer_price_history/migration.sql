@@ -0,0 +1,12 @@
+-- CreateTable (range-partitioned by month, edited by hand: Prisma can't express partitioning)
+CREATE TABLE "OfferPriceHistory" (
+    "contentId" TEXT NOT NULL,
+    "observedAt" TIMESTAMP(3) NOT NULL,
+    "currentPrice" DOUBLE PRECISION NOT NULL,
+    "oldPrice" DOUBLE PRECISION,
+
+    CONSTRAINT "OfferPriceHistory_pkey" PRIMARY KEY ("contentId","observedAt")
+) PARTITION BY RANGE ("observedAt");
+
+-- Rows outside the monthly partitions created by the scraper
+CREATE TABLE "OfferPriceHistory_default" PARTITION OF "OfferPriceHistory" DEFAULT;
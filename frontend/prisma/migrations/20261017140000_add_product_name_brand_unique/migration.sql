@@ -0,0 +1,19 @@
+-- Merge duplicate products: offers move to the oldest product of each (name, brand)
+WITH "ranked" AS (
+    SELECT "id", first_value("id") OVER (PARTITION BY "name", "brand" ORDER BY "createdAt", "id") AS "keepId"
+    FROM "Product"
+)
+UPDATE "Offer" SET "productId" = "ranked"."keepId"
+FROM "ranked"
+WHERE "Offer"."productId" = "ranked"."id" AND "ranked"."id" <> "ranked"."keepId";
+
+WITH "ranked" AS (
+    SELECT "id", first_value("id") OVER (PARTITION BY "name", "brand" ORDER BY "createdAt", "id") AS "keepId"
+    FROM "Product"
+)
+DELETE FROM "Product"
+USING "ranked"
+WHERE "Product"."id" = "ranked"."id" AND "ranked"."id" <> "ranked"."keepId";
+
+-- CreateIndex (NULLS NOT DISTINCT added by hand, Prisma can't express it)
+CREATE UNIQUE INDEX "Product_name_brand_key" ON "Product"("name", "brand") NULLS NOT DISTINCT;
@@ -0,0 +1,96 @@
+"""Benchmark: per-row vs batch vs backfill (COPY) loads of DatabasePipeline
+
+Writes synthetic retailers, flyers, offers and stores into the database from
+DATABASE_URL (one separate set of rows per write mode, each into "empty"
+tables from the pipeline's point of view) and removes them again afterwards.
+
+    python benchmarks/bulk_load.py --offers 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, UTC
+
+scraper_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, scraper_dir)
+
+from scrapy import Spider
+from sqlalchemy import text
+
+from database.session import get_db_session
+from scraper.pipelines import DatabasePipeline
+
+PREFIX = "bench"
+
+
+def make_items(mode: str, offers: int, retailers: int = 50, stores_per_retailer: int = 20, offers_per_flyer: int = 100):
+    """Synthetic items in the order the spiders yield them"""
+    now = datetime.now(UTC)
+    names = [f"{PREFIX}-{mode}-retailer-{i}" for i in range(retailers)]
+    for name in names:
+        yield {"name": name, "category": "Supermarkt", "logoUrl": f"https://{PREFIX}.invalid/{name}.png"}
+    for i, name in enumerate(names):
+        for j in range(stores_per_retailer):
+            yield {"retailerId": name, "address": f"Teststr. {j}", "city": "Berlin", "postalCode": f"{10000 + i:05d}"}
+    flyers = max(1, offers // offers_per_flyer)
+    for f in range(flyers):
+        yield {
+            "retailerId": names[f % retailers], "title": f"Flyer {f}", "pages": 12,
+            "validFrom": now, "validUntil": now + timedelta(days=7),
+            "url": f"https://{PREFIX}.invalid/{mode}/flyer/{f}", "contentId": f"{PREFIX}-{mode}-flyer-{f}",
+        }
+    for o in range(offers):
+        yield {
+            "retailerId": names[o % retailers], "productName": f"Bench Product {o % (offers // 4 or 1)}",
+            "brand": f"Brand {o % 30}", "category": "Lebensmittel",
+            "currentPrice": 0.99 + o % 500 / 100, "oldPrice": 1.99 + o % 500 / 100,
+            "url": f"https://{PREFIX}.invalid/{mode}/offer/{o}", "contentId": f"{PREFIX}-{mode}-offer-{o}",
+            "parentContentId": f"{PREFIX}-{mode}-flyer-{o // offers_per_flyer % flyers}",
+            "validFrom": now, "validUntil": now + timedelta(days=7),
+        }
+
+
+def run(mode: str, offers: int) -> float:
+    pipeline = DatabasePipeline(write_mode=mode, batch_size=500, batch_interval=0)
+    spider = Spider("benchmark")
+    pipeline.open_spider(spider)
+    started = time.perf_counter()
+    for item in make_items(mode, offers):
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+    return time.perf_counter() - started
+
+
+def cleanup():
+    with get_db_session() as session:
+        session.execute(text('DELETE FROM "OfferPriceHistory" WHERE "contentId" LIKE :p'), {"p": f"{PREFIX}-%"})
+        session.execute(text('DELETE FROM "Retailer" WHERE name LIKE :p'), {"p": f"{PREFIX}-%"})
+        session.execute(text('DELETE FROM "Product" WHERE name LIKE :p'), {"p": "Bench Product %"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offers", type=int, default=5000)
+    parser.add_argument("--modes", default="row,batch,backfill")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark rows")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    cleanup()
+    try:
+        results = {}
+        for mode in args.modes.split(","):
+            results[mode] = run(mode, args.offers)
+            print(f"{mode:>9}: {results[mode]:8.2f}s  ({args.offers / results[mode]:,.0f} offers/s)")
+        if "row" in results:
+            for mode, seconds in results.items():
+                print(f"{mode:>9}: {results['row'] / seconds:5.1f}x the per-row path")
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
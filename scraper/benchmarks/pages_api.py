@@ -0,0 +1,96 @@
+"""Benchmark: whole-body vs page-by-page parsing of the brochure pages API
+
+Uses the pages_api_response.json fixture and compares, for FlyersSpider's
+offer extraction:
+
+* baseline: ``json.loads(response.text)`` (decode to str, build the full tree)
+* bytes:    ``iter_page_models(body, streaming=False)`` (fast JSON backend
+  over bytes, full tree)
+* streaming: ``iter_page_models(body)`` with ijson (one page at a time; needs
+  ijson)
+
+Every variant decodes the pages into the typed schemas (scraper.schemas).
+
+Reported per variant: time to the first offer, total time and peak memory
+traced by tracemalloc.
+
+    python benchmarks/pages_api.py --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+scraper_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, scraper_dir)
+
+from scrapy.http import Request, TextResponse
+
+from scraper.pages_api import IJSON_AVAILABLE, iter_page_models
+from scraper.schemas import PagesResponse, decode
+from scraper.spiders.flyers import FlyersSpider
+
+FIXTURE = os.path.join(scraper_dir, "pages_api_response.json")
+
+
+def page_offers(spider, pages):
+    for page in pages:
+        for offer in page.offers:
+            if offer.content is not None and offer.content.type == "offer":
+                yield spider._offer_item(offer.content)
+
+
+def baseline_offers(spider, response):
+    yield from page_offers(spider, decode(PagesResponse, json.loads(response.text)).contents)
+
+
+def streamed_offers(spider, response, streaming):
+    yield from page_offers(spider, iter_page_models(response.body, streaming=streaming))
+
+
+def measure(variant, body, repeat):
+    spider = FlyersSpider()
+    first, total, peak, count = [], [], 0, 0
+    for _ in range(repeat):
+        # A fresh response each run, so the cached response.text doesn't carry over
+        response = TextResponse("https://content-viewer-be.kaufda.de/api/v1/brochures/x/pages",
+                                body=body, encoding="utf-8", request=Request("https://example.invalid"))
+        tracemalloc.start()
+        started = time.perf_counter()
+        offers = variant(spider, response)
+        next(offers)
+        first.append(time.perf_counter() - started)
+        count = 1 + sum(1 for _ in offers)
+        total.append(time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return min(first), min(total), peak, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(FIXTURE, "rb") as f:
+        body = f.read()
+    print(f"Fixture: {len(body) / 1024:.0f} KiB")
+
+    variants = {
+        "baseline": baseline_offers,
+        "bytes": lambda spider, response: streamed_offers(spider, response, streaming=False),
+    }
+    if IJSON_AVAILABLE:
+        variants["streaming"] = lambda spider, response: streamed_offers(spider, response, streaming=True)
+    else:
+        print("ijson is not installed, skipping the streaming variant")
+
+    for name, variant in variants.items():
+        first, total, peak, count = measure(variant, body, args.repeat)
+        print(f"{name:>9}: first offer {first * 1000:7.2f} ms | all {count} offers {total * 1000:7.2f} ms | peak {peak / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
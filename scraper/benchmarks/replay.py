@@ -0,0 +1,388 @@
+"""Benchmark: replay recorded kaufDA responses through the spiders and pipelines
+
+No network and no browser: the requests of RetailersSpider, FlyersSpider and
+OffersSpider are answered from recorded responses, their callbacks run as
+the engine would call them, and every item goes through the project's
+ITEM_PIPELINES chain into the database from DATABASE_URL.
+
+Responses replayed:
+
+* homepage: ``--homepage`` (a saved https://www.kaufda.de HTML page), or a
+  homepage built from sample_flyer_data.json (brochures) and
+  pages_api_response.json (offers, publishers)
+* brochure pages API: pages_api_response.json, one copy per brochure with
+  the offer IDs made unique to that brochure
+* retailer pages (/Geschaefte/...): a __NEXT_DATA__ page with
+  ``--stores`` stores per retailer
+
+Reported: items/sec through the pipelines, p50/p99 latency per callback and
+of the pipeline chain per item, and peak RSS. With ``--baseline`` the run
+fails (exit code 1) when items/sec drops, or a p99 latency or the peak RSS
+grows, by more than ``--threshold`` compared to the saved baseline.
+
+The pipelines write real rows: use a scratch database. The run refuses to
+start when rows of the replayed retailers exist already (``--reset``
+deletes them) and removes its rows afterwards unless ``--keep`` is given.
+Pipelines run their database calls inline, without the writer threads.
+
+    python benchmarks/replay.py --brochures 20 --save-baseline replay-baseline.json
+    python benchmarks/replay.py --brochures 20 --baseline replay-baseline.json
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from collections import defaultdict
+
+scraper_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, scraper_dir)
+os.chdir(scraper_dir)  # scrapy.cfg
+
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse, Request, TextResponse
+from scrapy.utils.misc import build_from_crawler, load_object
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+from scrapy.utils.test import get_crawler
+from sqlalchemy import text
+
+from database.session import get_db_session
+from scraper.items import RetailerItem
+from scraper.next_data import extract_next_data
+from scraper.spiders.flyers import FlyersSpider
+from scraper.spiders.offers import OffersSpider
+from scraper.spiders.retailers import RetailersSpider
+
+HOMEPAGE_URL = "https://www.kaufda.de"
+PAGES_API_PATH = "/api/v1/brochures/"
+RETAILER_PATH = "/Geschaefte/"
+SPIDERS = (RetailersSpider, FlyersSpider, OffersSpider)  # retailers first, like a real run
+
+
+def next_data_page(json_data: dict) -> bytes:
+    script = json.dumps(json_data, ensure_ascii=False).replace("<", "\\u003c")
+    return (
+        '<html><head><title>kaufDA</title></head><body><div id="__next"></div>'
+        f'<script id="__NEXT_DATA__" type="application/json">{script}</script></body></html>'
+    ).encode("utf-8")
+
+
+class Recording:
+    """Recorded responses, looked up by request URL"""
+
+    def __init__(self, brochures: int, retailers: int, stores: int, homepage_path: str = None):
+        with open(os.path.join(scraper_dir, "sample_flyer_data.json"), encoding="utf-8") as f:
+            self.brochure = json.load(f)["content"]
+        with open(os.path.join(scraper_dir, "pages_api_response.json"), encoding="utf-8") as f:
+            self.pages = json.load(f)
+        self.retailers = retailers
+        self.stores = stores
+        self.content_ids = [f"{self.brochure['id']}-{n}" for n in range(brochures)]
+        if homepage_path:
+            with open(homepage_path, "rb") as f:
+                self.homepage = f.read()
+        else:
+            self.homepage = next_data_page(self._homepage_data())
+        self.pages_bodies = {content_id: self._pages_body(content_id) for content_id in self.content_ids}
+
+    def _offers(self):
+        for page in self.pages.get("contents", []):
+            for offer in page.get("offers", []):
+                content = offer.get("content") or {}
+                if content.get("type") == "offer" and content.get("deals") and content.get("products"):
+                    yield page, content
+
+    def _homepage_data(self) -> dict:
+        publishers = {self.brochure["publisher"]["name"]: self.brochure["publisher"]}
+        home_offers = []
+        for page, content in self._offers():
+            publisher = content.get("publisher") or {}
+            publishers.setdefault(publisher.get("name"), publisher)
+            deal, product = content["deals"][0], content["products"][0]
+            if not (deal.get("min") or deal.get("max")):
+                continue
+            home_offers.append({
+                "id": f"home-{content['id']}",
+                "title": product.get("name"),
+                "brand": product.get("brandName"),
+                "publisherId": publisher.get("id"),
+                "publisherName": publisher.get("name", ""),
+                "prices": {"mainPrice": deal.get("min") or deal.get("max"), "priceByBaseUnit": deal.get("priceByBaseUnit")},
+                "parentContent": {"id": self.content_ids[0], "type": "brochure", "page": {"number": page.get("number")}},
+                "offerImages": {"url": {"large": content.get("image")}},
+            })
+        brochures = [
+            dict(self.brochure, id=content_id, contentId=content_id, title=f"{self.brochure['title']} {n + 1}")
+            for n, content_id in enumerate(self.content_ids)
+        ]
+        links = [
+            {"link_text": name, "link_href": f"/{name.replace(' ', '-')}/Sortiment"}
+            for name in [*filter(None, publishers), *(f"Replay Markt {n + 1}" for n in range(self.retailers))]
+        ]
+        return {
+            "page": "/",
+            "props": {"pageProps": {"pageInformation": {
+                "template": {"content": {"PublisherLinkbox": {"links": links}}},
+                "brochures": {"topRanked": brochures[:5], "main": {"items": brochures[5:]}},
+                "offers": {"main": {"items": home_offers}},
+            }}},
+        }
+
+    def _pages_body(self, content_id: str) -> bytes:
+        pages = copy.deepcopy(self.pages)
+        for page in pages.get("contents", []):
+            for offer in page.get("offers", []):
+                content = offer.get("content") or {}
+                if content.get("id"):
+                    content["id"] = f"{content['id']}-{content_id[-8:]}"
+                if isinstance(content.get("parentContent"), dict):
+                    content["parentContent"]["id"] = content_id
+        return json.dumps(pages).encode("utf-8")
+
+    def _retailer_page(self, url: str) -> bytes:
+        slug = url.rstrip("/").rsplit("/", 1)[-1]
+        stores = [
+            {"address": f"{slug}-Straße {n}", "city": "Berlin", "postalCode": f"{10115 + n:05d}",
+             "latitude": 52.5 + n / 1000, "longitude": 13.4 + n / 1000}
+            for n in range(self.stores)
+        ]
+        return next_data_page({"page": "/Geschaefte/[slug]", "props": {"pageProps": {"stores": stores}}})
+
+    def response(self, request: Request):
+        """Recorded response for a request, None if nothing was recorded for it"""
+        url = request.url
+        if url.rstrip("/") == HOMEPAGE_URL:
+            return HtmlResponse(url, body=self.homepage, encoding="utf-8", request=request)
+        if PAGES_API_PATH in url:
+            content_id = url.split(PAGES_API_PATH, 1)[1].split("/", 1)[0]
+            body = self.pages_bodies.get(content_id)
+            return TextResponse(url, body=body, encoding="utf-8", request=request) if body else None
+        if RETAILER_PATH in url:
+            return HtmlResponse(url, body=self._retailer_page(url), encoding="utf-8", request=request)
+        return None
+
+
+class Replay:
+    """Run one spider over the recording and push its items through the pipelines"""
+
+    def __init__(self, spidercls, settings, recording: Recording):
+        self.crawler = get_crawler(spidercls, settings)
+        self.spider = spidercls.from_crawler(self.crawler)
+        self.crawler.spider = self.spider
+        self.recording = recording
+        self.pipelines = []
+        for path in self.crawler.settings.getwithbase("ITEM_PIPELINES").keys():
+            pipeline = build_from_crawler(load_object(path), self.crawler)
+            if getattr(pipeline, "writer", None) is not None:
+                pipeline.writer = None  # inline database calls, there is no reactor here
+            self.pipelines.append(pipeline)
+        self.callback_ms = defaultdict(list)
+        self.pipeline_ms = []
+        self.items = 0
+        self.dropped = 0
+        self.unrecorded = 0
+        self.keys = defaultdict(set)
+
+    def run(self):
+        self._each("open_spider")
+        queue = [Request(url, dont_filter=True) for url in self.spider.start_urls]
+        while queue:
+            request = queue.pop(0)
+            response = self.recording.response(request)
+            if response is None:
+                self.unrecorded += 1
+                continue
+            callback = request.callback or self.spider.parse
+            queue.extend(self._call(callback, response))
+        started = time.perf_counter()
+        self._each("close_spider")  # flushes the write batches
+        self.callback_ms[f"{self.spider.name}.close_spider"].append((time.perf_counter() - started) * 1000)
+
+    def _each(self, method: str):
+        for pipeline in self.pipelines:
+            if hasattr(pipeline, method):
+                getattr(pipeline, method)(self.spider)
+
+    def _call(self, callback, response):
+        """Run a callback, timing the callback only, and process its items"""
+        requests = []
+        elapsed = 0.0
+        started = time.perf_counter()
+        results = iter(callback(response) or ())
+        while True:
+            try:
+                result = next(results)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - started
+            if isinstance(result, Request):
+                requests.append(result)
+            else:
+                self._process(result)
+            started = time.perf_counter()
+        self.callback_ms[f"{self.spider.name}.{callback.__name__}"].append(elapsed * 1000)
+        return requests
+
+    def _process(self, item):
+        self._remember(item)
+        started = time.perf_counter()
+        try:
+            for pipeline in self.pipelines:
+                item = pipeline.process_item(item, self.spider)
+            self.items += 1
+        except DropItem:
+            self.dropped += 1
+        self.pipeline_ms.append((time.perf_counter() - started) * 1000)
+
+    def _remember(self, item):
+        """Keep what's needed to remove the replayed rows again"""
+        for field in ("name", "retailerId"):
+            if item.get(field):
+                self.keys["retailers"].add(item[field])
+        if item.get("productName"):
+            self.keys["products"].add(item["productName"])
+        if item.get("productName") and item.get("contentId"):
+            self.keys["offers"].add(item["contentId"])
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+def existing_retailers(names) -> int:
+    with get_db_session() as session:
+        return session.execute(
+            text('SELECT count(*) FROM "Retailer" WHERE name = ANY(:names)'), {"names": list(names)}
+        ).scalar()
+
+
+def cleanup(keys):
+    """Delete the replayed retailers (flyers, offers and stores cascade), their products and price history"""
+    with get_db_session() as session:
+        session.execute(text('DELETE FROM "OfferPriceHistory" WHERE "contentId" = ANY(:ids)'), {"ids": list(keys["offers"])})
+        session.execute(text('DELETE FROM "Retailer" WHERE name = ANY(:names)'), {"names": list(keys["retailers"])})
+        session.execute(text(
+            'DELETE FROM "Product" p WHERE name = ANY(:names) AND NOT EXISTS (SELECT 1 FROM "Offer" o WHERE o."productId" = p.id)'
+        ), {"names": list(keys["products"])})
+        session.commit()
+
+
+def compare(result: dict, baseline: dict, threshold: float, min_ms: float) -> list:
+    """Regressions of ``result`` against ``baseline`` beyond ``threshold``
+
+    Latencies that grow by less than ``min_ms`` are timer noise, not
+    regressions.
+    """
+    failures = []
+    if result["items_per_sec"] < baseline["items_per_sec"] * (1 - threshold):
+        failures.append(f"items/sec {result['items_per_sec']:.1f} < baseline {baseline['items_per_sec']:.1f}")
+    for name, latency in result["latency_ms"].items():
+        base = baseline.get("latency_ms", {}).get(name)
+        if base and latency["p99"] > max(base["p99"] * (1 + threshold), base["p99"] + min_ms):
+            failures.append(f"{name} p99 {latency['p99']:.2f} ms > baseline {base['p99']:.2f} ms")
+    if result["peak_rss_kib"] > baseline["peak_rss_kib"] * (1 + threshold):
+        failures.append(f"peak RSS {result['peak_rss_kib']} KiB > baseline {baseline['peak_rss_kib']} KiB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--brochures", type=int, default=20, help="brochures on the built homepage")
+    parser.add_argument("--retailers", type=int, default=10, help="retailers added to the homepage links")
+    parser.add_argument("--stores", type=int, default=50, help="stores per retailer page")
+    parser.add_argument("--homepage", help="recorded homepage HTML to replay instead of the built one")
+    parser.add_argument("--write-mode", help="DATABASE_WRITE_MODE (default: project setting)")
+    parser.add_argument("--baseline", help="fail on regressions against this result file")
+    parser.add_argument("--save-baseline", help="write the result to this file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression (default: 0.25)")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore p99 growth below this (default: 1.0)")
+    parser.add_argument("--reset", action="store_true", help="delete rows of the replayed retailers first")
+    parser.add_argument("--keep", action="store_true", help="keep the replayed rows")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # schema drops of the fixtures are expected
+
+    settings = get_project_settings().copy_to_dict()
+    settings.update({
+        "GEOCODING_ENABLED": False,
+        "PAGES_CACHE_ENABLED": False,  # every run parses the recorded pages responses
+        "INCREMENTAL_MODE": False,  # the callbacks are run synchronously, without the lookup
+        "DATABASE_BATCH_INTERVAL": 0,  # no reactor: batches flush on size and at close
+        "HOMEPAGE_SNAPSHOT_RUN_ID": None,
+        "LOG_LEVEL": "WARNING",
+    })
+    if args.write_mode:
+        settings["DATABASE_WRITE_MODE"] = args.write_mode
+
+    install_reactor(settings["TWISTED_REACTOR"])  # installed, never run
+    recording = Recording(args.brochures, args.retailers, args.stores, args.homepage)
+    replays = [Replay(spidercls, settings, recording) for spidercls in SPIDERS]
+
+    # The retailers the run will store, found by the retailers spider itself
+    homepage = recording.response(Request(HOMEPAGE_URL))
+    names = {
+        item["name"]
+        for item in replays[0].spider.parse_homepage_data(extract_next_data(homepage) or {}, homepage)
+        if isinstance(item, RetailerItem)
+    }
+    if existing_retailers(names):
+        if not args.reset:
+            sys.exit(f"Rows of the replayed retailers exist already ({', '.join(sorted(names))}); use a scratch database or --reset")
+        cleanup({"retailers": names, "products": set(), "offers": set()})
+
+    started = time.perf_counter()
+    for replay in replays:
+        replay.run()
+    total = time.perf_counter() - started
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+    keys = defaultdict(set)
+    for replay in replays:
+        for kind, values in replay.keys.items():
+            keys[kind] |= values
+    if not args.keep:
+        cleanup(keys)
+
+    items = sum(replay.items for replay in replays)
+    latency = {}
+    for replay in replays:
+        for name, values in replay.callback_ms.items():
+            latency[name] = {"calls": len(values), "p50": percentile(values, 0.5), "p99": percentile(values, 0.99)}
+    pipeline_ms = [ms for replay in replays for ms in replay.pipeline_ms]
+    latency["pipelines.item"] = {"calls": len(pipeline_ms), "p50": percentile(pipeline_ms, 0.5), "p99": percentile(pipeline_ms, 0.99)}
+    result = {
+        "items": items,
+        "dropped": sum(replay.dropped for replay in replays),
+        "seconds": round(total, 3),
+        "items_per_sec": round(items / total, 1) if total else 0.0,
+        "latency_ms": latency,
+        "peak_rss_kib": peak_rss,
+    }
+
+    print(f"{items} items stored, {result['dropped']} dropped, in {total:.2f}s: {result['items_per_sec']:,.1f} items/sec")
+    unrecorded = sum(replay.unrecorded for replay in replays)
+    if unrecorded:
+        print(f"{unrecorded} requests had no recorded response and were skipped")
+    for name, values in latency.items():
+        print(f"  {name:<40} {values['calls']:>6} calls | p50 {values['p50']:8.2f} ms | p99 {values['p99']:8.2f} ms")
+    print(f"Peak RSS: {peak_rss / 1024:.0f} MiB")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = compare(result, json.load(f), args.threshold, args.min_ms)
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
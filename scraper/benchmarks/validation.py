@@ -0,0 +1,108 @@
+"""Benchmark: per-item cost of ValidationPipeline
+
+Builds offer items from the pages_api_response.json fixture (plus one flyer
+per fixture page) and validates them with:
+
+* before: the previous pipeline body (key-based type detection,
+  ``Model(**item)`` and ``dict(validated)``)
+* after:  ``ValidationPipeline.process_item`` (dispatch on item class,
+  cached strict TypeAdapters, item returned unchanged)
+
+Importing the pipelines needs DATABASE_URL to be set; no connection is made.
+
+    python benchmarks/validation.py --items 5000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, UTC
+from itertools import cycle, islice
+
+scraper_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, scraper_dir)
+
+from scrapy.exceptions import DropItem
+
+from scraper.items import FlyerItem, OfferItem
+from scraper.pages_api import iter_page_models
+from scraper.pipelines import ValidationPipeline
+from scraper.spiders.flyers import FlyersSpider
+from utils.validators import FlyerData, OfferData, RetailerData, StoreData
+
+FIXTURE = os.path.join(scraper_dir, "pages_api_response.json")
+
+
+def fixture_items(count: int):
+    """``count`` flyer and offer items, cycling over the fixture"""
+    spider = FlyersSpider()
+    with open(FIXTURE, "rb") as f:
+        body = f.read()
+    now = datetime.now(UTC)
+    base = []
+    for page in iter_page_models(body):
+        base.append(FlyerItem(
+            retailerId="REWE", title=f"Prospekt Seite {page.number}", pages=22,
+            validFrom=now, validUntil=now + timedelta(days=6),
+            url=f"https://www.kaufda.de/Prospekte/{page.number}",
+        ))
+        for offer in page.offers:
+            if offer.content is not None and offer.content.type == "offer":
+                # A plain copy: items built from the schemas skip validation
+                base.append(OfferItem(spider._offer_item(offer.content)))
+    return [type(item)(item) for item in islice(cycle(base), count)]
+
+
+def before(item, spider):
+    try:
+        if "name" in item:  # RetailerItem
+            validated = RetailerData(**item)
+            return dict(validated)
+        elif "title" in item:  # FlyerItem
+            validated = FlyerData(**item)
+            return dict(validated)
+        elif "productName" in item:  # OfferItem
+            validated = OfferData(**item)
+            return dict(validated)
+        elif "address" in item and "retailerId" in item:  # StoreItem
+            validated = StoreData(**item)
+            return dict(validated)
+    except Exception:
+        return None
+    return item
+
+
+def after(item, spider, pipeline=ValidationPipeline()):
+    try:
+        return pipeline.process_item(item, spider)
+    except DropItem:
+        return None
+
+
+def measure(variant, items, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        passed = sum(1 for item in items if variant(item, None) is not None)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    items = fixture_items(args.items)
+    print(f"{len(items)} items ({sum(isinstance(i, OfferItem) for i in items)} offers)")
+    for name, variant in (("before", before), ("after", after)):
+        elapsed, passed = measure(variant, items, args.repeat)
+        print(f"{name:>6}: {elapsed * 1000:8.2f} ms | {elapsed / len(items) * 1e6:6.2f} us/item | {passed} valid")
+
+
+if __name__ == "__main__":
+    main()
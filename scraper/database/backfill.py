@@ -0,0 +1,285 @@
+"""Backfill loads: spool items to CSV, COPY them into staging tables and merge (PostgreSQL only)
+
+Meant for first loads and re-scrapes after a schema reset, where tens of
+thousands of rows are new. Items are appended to one CSV spool file per
+item type while the spider runs. When it closes, the files are loaded with
+``COPY FROM STDIN`` into temporary staging tables and moved into the real
+tables with one ``INSERT ... SELECT ... ON CONFLICT`` per table, all in a
+single transaction.
+"""
+import csv
+import logging
+import os
+import tempfile
+from datetime import datetime, UTC
+from typing import Any, Dict, Sequence, Tuple
+
+from sqlalchemy import text
+
+from .price_history import ensure_partition
+
+logger = logging.getLogger(__name__)
+
+# COPY reads this as NULL, so empty strings stay empty strings
+NULL = "\\N"
+
+# Staging table columns per item type. Every staging row also gets a "seq"
+# column (its line in the spool file): when a key occurs twice, the last row wins.
+STAGING_COLUMNS: Dict[str, Sequence[Tuple[str, str]]] = {
+    "retailers": (
+        ("name", "TEXT"), ("category", "TEXT"), ("logoUrl", "TEXT"),
+    ),
+    "flyers": (
+        ("retailerName", "TEXT"), ("title", "TEXT"), ("pages", "INTEGER"),
+        ("validFrom", "TIMESTAMP(3)"), ("validUntil", "TIMESTAMP(3)"), ("url", "TEXT"),
+        ("pdfUrl", "TEXT"), ("thumbnailUrl", "TEXT"), ("contentId", "TEXT"),
+        ("publishedFrom", "TIMESTAMP(3)"), ("publishedUntil", "TIMESTAMP(3)"), ("contentHash", "TEXT"),
+    ),
+    "offers": (
+        ("retailerName", "TEXT"), ("flyerId", "TEXT"), ("productName", "TEXT"), ("brand", "TEXT"),
+        ("category", "TEXT"), ("currentPrice", "DOUBLE PRECISION"), ("oldPrice", "DOUBLE PRECISION"),
+        ("discount", "DOUBLE PRECISION"), ("discountPercentage", "DOUBLE PRECISION"), ("unitPrice", "TEXT"),
+        ("url", "TEXT"), ("imageUrl", "TEXT"), ("validUntil", "TIMESTAMP(3)"), ("validFrom", "TIMESTAMP(3)"),
+        ("description", "TEXT"), ("contentId", "TEXT"), ("parentContentId", "TEXT"), ("pageNumber", "INTEGER"),
+        ("publisherId", "TEXT"), ("priceFormatted", "TEXT"), ("oldPriceFormatted", "TEXT"),
+        ("priceFrequency", "TEXT"), ("priceConditions", "TEXT"), ("imageAlt", "TEXT"), ("imageTitle", "TEXT"),
+        ("contentHash", "TEXT"),
+    ),
+    "stores": (
+        ("retailerName", "TEXT"), ("address", "TEXT"), ("city", "TEXT"), ("postalCode", "TEXT"),
+        ("latitude", "DOUBLE PRECISION"), ("longitude", "DOUBLE PRECISION"), ("phone", "TEXT"),
+        ("openingHours", "TEXT"),
+    ),
+}
+
+# Columns every new row gets, as the ORM would fill them in
+NEW_ROW = ('id', '"createdAt"', '"updatedAt"', '"scrapedAt"')
+NEW_ROW_VALUES = "gen_random_uuid()::text, :now, :now, :now"
+
+RETAILERS_SELECT = """
+    SELECT DISTINCT ON (s.name) {new_row}, s.name, COALESCE(s.category, 'General'), s."logoUrl"
+    FROM backfill_retailers s
+    WHERE s.name IS NOT NULL
+    ORDER BY s.name, s.seq DESC
+"""
+
+# Retailers only referenced by other items are created with a fallback category
+REFERENCED_RETAILERS_SQL = """
+    INSERT INTO "Retailer" (id, "createdAt", "updatedAt", "scrapedAt", name, category, "logoUrl")
+    SELECT DISTINCT ON (name) {new_row}, name, category, NULL
+    FROM (
+        SELECT "retailerName" AS name, 'General' AS category, seq FROM backfill_flyers
+        UNION ALL
+        SELECT "retailerName", COALESCE(category, 'General'), seq FROM backfill_offers
+        UNION ALL
+        SELECT "retailerName", 'General', seq FROM backfill_stores
+    ) referenced
+    WHERE name IS NOT NULL
+    ORDER BY name, seq
+    ON CONFLICT (name) DO NOTHING
+"""
+
+FLYERS_SELECT = """
+    SELECT DISTINCT ON (s.url) {new_row}, r.id, s.title, s.pages, s."validFrom", s."validUntil", s.url,
+           s."pdfUrl", s."thumbnailUrl", s."contentId", s."publishedFrom", s."publishedUntil", s."contentHash"
+    FROM backfill_flyers s
+    JOIN "Retailer" r ON r.name = s."retailerName"
+    ORDER BY s.url, s.seq DESC
+"""
+
+# Products are matched on (name, brand); the first offer seen describes a new one
+PRODUCTS_SQL = """
+    INSERT INTO "Product" (id, "createdAt", "updatedAt", "scrapedAt", name, brand, category, description, "imageUrl")
+    SELECT DISTINCT ON (s.name, s.brand) {new_row}, s.name, s.brand, s.category, s.description, s."imageUrl"
+    FROM (
+        SELECT btrim("productName") AS name, brand, category, description, "imageUrl", seq
+        FROM backfill_offers
+    ) s
+    WHERE s.name <> ''
+      AND NOT EXISTS (
+        SELECT 1 FROM "Product" p WHERE p.name = s.name AND p.brand IS NOT DISTINCT FROM s.brand
+      )
+    ORDER BY s.name, s.brand, s.seq
+    ON CONFLICT (name, brand) DO NOTHING
+"""
+
+OFFERS_SELECT = """
+    SELECT DISTINCT ON (s.url) {new_row}, COALESCE(f.id, s."flyerId"), p.id, r.id, s."productName", s.brand,
+           s.category, s."currentPrice", s."oldPrice", s.discount, s."discountPercentage", s."unitPrice", s.url,
+           s."imageUrl", s."validUntil", s."validFrom", s.description, s."contentId", s."parentContentId",
+           s."pageNumber", s."publisherId", s."priceFormatted", s."oldPriceFormatted", s."priceFrequency",
+           s."priceConditions", s."imageAlt", s."imageTitle", s."contentHash"
+    FROM backfill_offers s
+    JOIN "Retailer" r ON r.name = s."retailerName"
+    LEFT JOIN LATERAL (
+        SELECT id FROM "Flyer" WHERE "contentId" = s."parentContentId" LIMIT 1
+    ) f ON true
+    LEFT JOIN LATERAL (
+        SELECT id FROM "Product" WHERE name = btrim(s."productName") AND brand IS NOT DISTINCT FROM s.brand LIMIT 1
+    ) p ON true
+    ORDER BY s.url, s.seq DESC
+"""
+
+STORES_SELECT = """
+    SELECT DISTINCT ON (r.id, btrim(s.address)) {new_row}, r.id, btrim(s.address), COALESCE(s.city, ''),
+           COALESCE(s."postalCode", ''), s.latitude, s.longitude, s.phone, s."openingHours"
+    FROM backfill_stores s
+    JOIN "Retailer" r ON r.name = s."retailerName"
+    WHERE btrim(s.address) <> ''
+    ORDER BY r.id, btrim(s.address), s.seq DESC
+"""
+
+# Latest price per staged offer, appended where it differs from the last recorded one
+PRICE_HISTORY_SQL = """
+    INSERT INTO "OfferPriceHistory" ("contentId", "observedAt", "currentPrice", "oldPrice")
+    SELECT s."contentId", :now, s."currentPrice", s."oldPrice"
+    FROM (
+        SELECT DISTINCT ON ("contentId") "contentId", "currentPrice", "oldPrice"
+        FROM backfill_offers
+        WHERE "contentId" IS NOT NULL AND "retailerName" IN (SELECT name FROM "Retailer")
+        ORDER BY "contentId", seq DESC
+    ) s
+    LEFT JOIN LATERAL (
+        SELECT "currentPrice", "oldPrice" FROM "OfferPriceHistory" h
+        WHERE h."contentId" = s."contentId"
+        ORDER BY h."observedAt" DESC
+        LIMIT 1
+    ) h ON true
+    WHERE h."currentPrice" IS DISTINCT FROM s."currentPrice" OR h."oldPrice" IS DISTINCT FROM s."oldPrice"
+"""
+
+
+def merge_sql(table: str, columns: Sequence[str], select_sql: str, index_elements: Sequence[str],
+              update_columns: Sequence[str] = (), coalesce_columns: Sequence[str] = ()) -> str:
+    """INSERT ... SELECT ... ON CONFLICT DO UPDATE, counting created and updated rows
+
+    Same conflict handling as bulk.upsert_rows: ``update_columns`` are
+    overwritten, ``coalesce_columns`` only with values that are not NULL.
+    The statement returns one row: (created, updated).
+    """
+    quote = lambda col: f'"{col}"'
+    set_ = [f"{quote(col)} = EXCLUDED.{quote(col)}" for col in update_columns]
+    set_ += [f"{quote(col)} = COALESCE(EXCLUDED.{quote(col)}, {quote(table)}.{quote(col)})" for col in coalesce_columns]
+    return f"""
+        WITH merged AS (
+            INSERT INTO {quote(table)} ({", ".join((*NEW_ROW, *map(quote, columns)))})
+            {select_sql.format(new_row=NEW_ROW_VALUES)}
+            ON CONFLICT ({", ".join(map(quote, index_elements))}) DO UPDATE SET {", ".join(set_)}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+    """
+
+
+# (item type, table, columns, SELECT, conflict key, update columns, coalesce columns), in merge order
+MERGES = (
+    ("retailers", "Retailer", ("name", "category", "logoUrl"), RETAILERS_SELECT,
+     ("name",), ("updatedAt",), ("logoUrl",)),
+    ("flyers", "Flyer", (
+        "retailerId", "title", "pages", "validFrom", "validUntil", "url", "pdfUrl", "thumbnailUrl",
+        "contentId", "publishedFrom", "publishedUntil", "contentHash",
+    ), FLYERS_SELECT, ("url",),
+     ("title", "pages", "validFrom", "validUntil", "updatedAt", "scrapedAt"),
+     ("pdfUrl", "thumbnailUrl", "contentId", "publishedFrom", "publishedUntil", "contentHash")),
+    ("offers", "Offer", (
+        "flyerId", "productId", "retailerId", "productName", "brand", "category", "currentPrice", "oldPrice",
+        "discount", "discountPercentage", "unitPrice", "url", "imageUrl", "validUntil", "validFrom",
+        "description", "contentId", "parentContentId", "pageNumber", "publisherId", "priceFormatted",
+        "oldPriceFormatted", "priceFrequency", "priceConditions", "imageAlt", "imageTitle", "contentHash",
+    ), OFFERS_SELECT, ("url",),
+     ("productName", "currentPrice", "oldPrice", "discount", "discountPercentage", "updatedAt", "scrapedAt"),
+     ("productId", "description", "validFrom", "contentId", "parentContentId", "pageNumber", "publisherId",
+      "priceFormatted", "oldPriceFormatted", "priceFrequency", "priceConditions", "imageAlt", "imageTitle",
+      "contentHash")),
+    ("stores", "Store", (
+        "retailerId", "address", "city", "postalCode", "latitude", "longitude", "phone", "openingHours",
+    ), STORES_SELECT, ("retailerId", "address"),
+     ("city", "postalCode", "phone", "openingHours", "updatedAt", "scrapedAt"),
+     ("latitude", "longitude")),
+)
+
+
+class Spool:
+    """CSV files collecting the staging rows of one crawl, one file per item type"""
+
+    def __init__(self, directory: str = None, prefix: str = "backfill"):
+        self.directory = directory or tempfile.gettempdir()
+        self.prefix = prefix
+        self.files = {}  # item type -> (path, file, csv writer)
+        self.counts = {item_type: 0 for item_type in STAGING_COLUMNS}
+
+    def add(self, item_type: str, row: Dict[str, Any]) -> None:
+        """Append one row (a dict with the item type's STAGING_COLUMNS)"""
+        if item_type not in self.files:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix=f"{self.prefix}-{item_type}-", suffix=".csv", dir=self.directory)
+            handle = os.fdopen(fd, "w", newline="", encoding="utf-8")
+            self.files[item_type] = (path, handle, csv.writer(handle))
+        self.counts[item_type] += 1
+        values = [row.get(column) for column, _ in STAGING_COLUMNS[item_type]]
+        self.files[item_type][2].writerow([self.counts[item_type], *(NULL if v is None else v for v in values)])
+
+    def paths(self) -> Dict[str, str]:
+        """Close the files for writing and return their paths"""
+        for _, handle, _ in self.files.values():
+            handle.close()
+        return {item_type: path for item_type, (path, _, _) in self.files.items()}
+
+    def remove(self) -> None:
+        for path in self.paths().values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.files = {}
+
+
+def create_staging_tables(session) -> None:
+    """Temporary staging tables, dropped when the transaction ends"""
+    for item_type, columns in STAGING_COLUMNS.items():
+        definition = ", ".join(f'"{column}" {sql_type}' for column, sql_type in columns)
+        session.execute(text(f"CREATE TEMP TABLE backfill_{item_type} (seq BIGINT, {definition}) ON COMMIT DROP"))
+
+
+def copy_spool(session, item_type: str, path: str) -> None:
+    """Stream a spool file into its staging table"""
+    columns = ", ".join(["seq", *(f'"{column}"' for column, _ in STAGING_COLUMNS[item_type])])
+    cursor = session.connection().connection.cursor()
+    try:
+        with open(path, encoding="utf-8", newline="") as handle:
+            cursor.copy_expert(f"COPY backfill_{item_type} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')", handle)
+    finally:
+        cursor.close()
+
+
+def load_spool(session, paths: Dict[str, str], price_history: bool = True) -> Dict[str, Any]:
+    """COPY the spool files into staging tables and merge them into the real tables
+
+    Runs in the caller's transaction. Returns ``{item type: (created,
+    updated)}`` plus the number of recorded price changes under
+    ``"price_changes"``.
+    """
+    now = datetime.now(UTC).replace(tzinfo=None)
+    create_staging_tables(session)
+    for item_type, path in paths.items():
+        copy_spool(session, item_type, path)
+    session.execute(text("ANALYZE backfill_retailers, backfill_flyers, backfill_offers, backfill_stores"))
+
+    results: Dict[str, Any] = {}
+    for item_type, table, columns, select_sql, index_elements, update_columns, coalesce_columns in MERGES:
+        if item_type == "flyers":
+            session.execute(text(REFERENCED_RETAILERS_SQL.format(new_row=NEW_ROW_VALUES)), {"now": now})
+        elif item_type == "offers":
+            session.execute(text(PRODUCTS_SQL.format(new_row=NEW_ROW_VALUES)), {"now": now})
+        if item_type not in paths:
+            continue
+        sql = merge_sql(table, columns, select_sql, index_elements, update_columns, coalesce_columns)
+        created, updated = session.execute(text(sql), {"now": now}).one()
+        results[item_type] = (created, updated)
+        logger.debug(f"Merged {item_type}: {created} created, {updated} updated")
+
+    results["price_changes"] = 0
+    if price_history and "offers" in paths:
+        ensure_partition(session, now)
+        results["price_changes"] = session.execute(text(PRICE_HISTORY_SQL), {"now": now}).rowcount
+    return results
@@ -0,0 +1,84 @@
+"""Bulk write helpers (PostgreSQL only)"""
+from datetime import datetime, UTC
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.dialects.postgresql import insert
+
+# PostgreSQL accepts at most 65535 bind parameters per statement
+MAX_BIND_PARAMS = 30000
+
+
+def dedupe_rows(rows: Sequence[Dict[str, Any]], key_columns: Sequence[str]) -> List[Dict[str, Any]]:
+    """Keep the last row for every conflict key.
+
+    ON CONFLICT DO UPDATE cannot touch the same row twice in one statement,
+    so duplicates inside a batch must be collapsed before the insert.
+    """
+    unique = {}
+    for row in rows:
+        unique[tuple(row.get(col) for col in key_columns)] = row
+    return list(unique.values())
+
+
+def chunked(rows: Sequence[Dict[str, Any]], column_count: int) -> Iterable[Sequence[Dict[str, Any]]]:
+    """Split rows so a single statement stays below the bind parameter limit"""
+    size = max(1, MAX_BIND_PARAMS // max(1, column_count))
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def upsert_rows(
+    session,
+    model,
+    rows: Sequence[Dict[str, Any]],
+    index_elements: Sequence[str],
+    update_columns: Sequence[str] = (),
+    coalesce_columns: Sequence[str] = (),
+    returning: Sequence[str] = ("id",),
+) -> List[Any]:
+    """INSERT ... ON CONFLICT DO UPDATE for a batch of rows.
+
+    ``update_columns`` are overwritten with the new value, ``coalesce_columns``
+    only when the new value is not NULL. Each returned row holds the
+    ``returning`` columns followed by an ``inserted`` flag read back via
+    ``RETURNING (xmax = 0)``: True for new rows, False for updated ones.
+    """
+    rows = dedupe_rows(rows, index_elements)
+    if not rows:
+        return []
+
+    table = model.__table__
+    results = []
+    for chunk in chunked(rows, len(rows[0])):
+        stmt = insert(table).values(list(chunk))
+        set_ = {col: stmt.excluded[col] for col in update_columns}
+        for col in coalesce_columns:
+            set_[col] = func.coalesce(stmt.excluded[col], table.c[col])
+        if set_:
+            stmt = stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+        stmt = stmt.returning(
+            *[table.c[col] for col in returning],
+            literal_column("(xmax = 0)").label("inserted"),
+        )
+        results.extend(session.execute(stmt).all())
+    return results
+
+
+# Offers are written without flyerId when their flyer isn't stored yet
+LINK_OFFERS_SQL = text("""
+    UPDATE "Offer" AS o
+    SET "flyerId" = f.id, "updatedAt" = :now
+    FROM "Flyer" AS f
+    WHERE o."flyerId" IS NULL
+      AND o."parentContentId" = f."contentId"
+      AND f."contentId" = ANY(:content_ids)
+""")
+
+
+def link_offers_to_flyers(session, content_ids: Iterable[str]) -> int:
+    """Set flyerId on offers whose parent flyer is among ``content_ids``; returns offers updated"""
+    params = {"content_ids": list(content_ids), "now": datetime.now(UTC)}
+    return session.execute(LINK_OFFERS_SQL, params).rowcount
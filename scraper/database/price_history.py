@@ -0,0 +1,107 @@
+"""Append-only offer price history (PostgreSQL only)"""
+import csv
+import io
+from datetime import datetime, UTC
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+# Latest observation per offer, one statement for a whole batch
+LATEST_PRICES_SQL = text("""
+    SELECT DISTINCT ON ("contentId") "contentId", "currentPrice", "oldPrice"
+    FROM "OfferPriceHistory"
+    WHERE "contentId" = ANY(:content_ids)
+    ORDER BY "contentId", "observedAt" DESC
+""")
+
+COPY_SQL = 'COPY "OfferPriceHistory" ("contentId", "observedAt", "currentPrice", "oldPrice") FROM STDIN WITH (FORMAT csv)'
+
+# First days of the months whose partition prepare_partitions created and committed
+_prepared_months = set()
+
+
+def month_bounds(moment: datetime) -> Tuple[datetime, datetime]:
+    """First instant of the month of ``moment`` and of the month after it"""
+    start = datetime(moment.year, moment.month, 1)
+    end = datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+    return start, end
+
+
+def _create_partition(session, moment: datetime) -> datetime:
+    start, end = month_bounds(moment)
+    name = f"OfferPriceHistory_y{start:%Y}m{start:%m}"
+    session.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "OfferPriceHistory" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return start
+
+
+def prepare_partitions(session_scope, moment: datetime = None) -> None:
+    """Create the partitions of this month and the next one, once per process
+
+    Called when a spider opens, in a transaction of its own
+    (``session_scope`` is database.session.get_db_session), so write batches
+    find their partition ready instead of running DDL next to the batches of
+    other spiders.
+    """
+    start, end = month_bounds((moment or datetime.now(UTC)).astimezone(UTC).replace(tzinfo=None))
+    missing = [month for month in (start, end) if month not in _prepared_months]
+    if not missing:
+        return
+    with session_scope() as session:
+        created = [_create_partition(session, month) for month in missing]
+    _prepared_months.update(created)
+
+
+def ensure_partition(session, moment: datetime) -> None:
+    """Create the monthly partition holding ``moment`` if it doesn't exist yet
+
+    Months set up by prepare_partitions are skipped. Any other month is
+    created in the session's transaction: a second connection would wait for
+    the locks this transaction already holds. If the batch rolls back, the
+    partition goes with it and is created again by the next batch.
+    """
+    if month_bounds(moment)[0] not in _prepared_months:
+        _create_partition(session, moment)
+
+
+def latest_prices(session, content_ids) -> Dict[str, Tuple[float, Optional[float]]]:
+    """Last recorded (currentPrice, oldPrice) per contentId"""
+    rows = session.execute(LATEST_PRICES_SQL, {"content_ids": list(content_ids)})
+    return {content_id: (current, old) for content_id, current, old in rows}
+
+
+def record_price_changes(session, observations: Dict[str, Tuple[float, Optional[float]]], observed_at: datetime = None) -> int:
+    """Append the observations whose price differs from the last recorded one
+
+    ``observations`` maps contentId -> (currentPrice, oldPrice). Rows are
+    streamed with COPY on the session's connection, so they commit or roll
+    back together with the rest of the session. Returns the rows written.
+    """
+    if not observations:
+        return 0
+    observed_at = (observed_at or datetime.now(UTC)).astimezone(UTC).replace(tzinfo=None)
+
+    latest = latest_prices(session, observations.keys())
+    changed = [
+        (content_id, prices) for content_id, prices in observations.items()
+        if latest.get(content_id) != prices
+    ]
+    if not changed:
+        return 0
+
+    ensure_partition(session, observed_at)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for content_id, (current_price, old_price) in changed:
+        # An empty unquoted CSV field is NULL for COPY
+        writer.writerow([content_id, observed_at.isoformat(), current_price, "" if old_price is None else old_price])
+    buffer.seek(0)
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(COPY_SQL, buffer)
+    finally:
+        cursor.close()
+    return len(changed)
@@ -5,6 +5,7 @@ from .flyer import Flyer
 from .product import Product
 from .store import Store
 from .offer import Offer
+from .offer_price_history import OfferPriceHistory
 from .scraping_log import ScrapingLog
 
 __all__ = [
@@ -15,5 +16,6 @@ __all__ = [
     "Product",
     "Store",
     "Offer",
+    "OfferPriceHistory",
     "ScrapingLog",
 ]
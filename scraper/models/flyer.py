@@ -20,6 +20,7 @@ class Flyer(BaseModel):
     contentId = Column(String, nullable=True, index=True)
     publishedFrom = Column(DateTime, nullable=True)
     publishedUntil = Column(DateTime, nullable=True)
+    contentHash = Column(String, nullable=True)  # Hash of the scraped fields, for change detection
     scrapedAt = Column(DateTime, default=lambda: datetime.now(UTC), nullable=False)
 
     # Relationships
@@ -35,6 +35,7 @@ class Offer(BaseModel):
     priceConditions = Column(String, nullable=True)  # JSON string
     imageAlt = Column(String, nullable=True)
     imageTitle = Column(String, nullable=True)
+    contentHash = Column(String, nullable=True)  # Hash of the scraped fields, for change detection
     scrapedAt = Column(DateTime, default=lambda: datetime.now(UTC), nullable=False)
 
     # Relationships
@@ -0,0 +1,18 @@
+"""OfferPriceHistory model"""
+from sqlalchemy import Column, String, Float, DateTime
+from .base import Base
+
+
+class OfferPriceHistory(Base):
+    """Append-only price observations of offers, one row per price change
+
+    Range-partitioned by month on observedAt in PostgreSQL (see the Prisma
+    migration); database/price_history.py creates the monthly partitions.
+    Kept compact on purpose: no surrogate id and no created/updated stamps.
+    """
+    __tablename__ = "OfferPriceHistory"
+
+    contentId = Column(String, primary_key=True)  # Offer.contentId
+    observedAt = Column(DateTime, primary_key=True)
+    currentPrice = Column(Float, nullable=False)
+    oldPrice = Column(Float, nullable=True)
@@ -19,3 +19,8 @@ class Product(BaseModel):
     # Relationships
     offers = relationship("Offer", back_populates="product")
 
+    __table_args__ = (
+        # One product per (name, brand), offers without a brand share the NULL brand
+        Index("Product_name_brand_key", "name", "brand", unique=True, postgresql_nulls_not_distinct=True),
+    )
+
@@ -0,0 +1,92 @@
+"""Checkpoints of a scraping run, so that a restarted run resumes it
+
+scripts/scrape_all.py gives every spider its own Scrapy JOBDIR under
+JOBS_DIR/<spider name>. Scrapy keeps the pending requests there (on disk,
+including Playwright requests and their meta such as ``flyer_item``), the
+fingerprints of seen requests and ``spider.state``. The run itself is
+described by JOBS_DIR/run.json: the ScrapingLog entry it reports to and the
+spiders that have finished.
+
+A run that was stopped (SIGTERM from ``docker stop`` or a container
+restart lets Scrapy shut down cleanly and persist its queues) is resumed by
+the next ``scrape_all.py``: it reattaches to the same ScrapingLog entry,
+skips the finished spiders and lets the others continue from their queues.
+``--fresh`` abandons it and starts over.
+"""
+import json
+import os
+import shutil
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Optional
+
+from scrapy.utils.job import job_dir
+
+
+def _write_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class RunState:
+    """run.json of the current run in JOBS_DIR"""
+
+    def __init__(self, jobs_dir: str):
+        self.jobs_dir = Path(jobs_dir)
+        self.path = self.jobs_dir / "run.json"
+        self.data = _read_json(self.path) or {}
+
+    @property
+    def log_id(self) -> Optional[str]:
+        return self.data.get("logId")
+
+    @property
+    def finished(self) -> list:
+        return self.data.get("finished", [])
+
+    def start(self, log_id: str):
+        """Start a new run: drop the job directories of the previous one"""
+        self.clear()
+        self.data = {"logId": log_id, "startedAt": datetime.now(UTC).isoformat(), "finished": []}
+        _write_json(self.path, self.data)
+
+    def resume(self):
+        self.data["resumedAt"] = datetime.now(UTC).isoformat()
+        self.data["resumes"] = self.data.get("resumes", 0) + 1
+        _write_json(self.path, self.data)
+
+    def mark_finished(self, spider_name: str):
+        if spider_name not in self.finished:
+            self.data.setdefault("finished", []).append(spider_name)
+            _write_json(self.path, self.data)
+
+    def spider_jobdir(self, spider_name: str) -> str:
+        return str(self.jobs_dir / spider_name)
+
+    def clear(self):
+        """Remove run.json and the job directories"""
+        if self.jobs_dir.exists():
+            shutil.rmtree(self.jobs_dir)
+        self.data = {}
+
+
+def load_checkpoint(settings, name: str) -> dict:
+    """Checkpoint ``name`` of the spider's JOBDIR, empty without JOBDIR or checkpoint"""
+    path = job_dir(settings)
+    return (_read_json(Path(path) / f"{name}.json") or {}) if path else {}
+
+
+def save_checkpoint(settings, name: str, data: dict):
+    """Save checkpoint ``name`` in the spider's JOBDIR (nothing without JOBDIR)"""
+    path = job_dir(settings)
+    if path:
+        _write_json(Path(path) / f"{name}.json", data)
@@ -0,0 +1,172 @@
+"""Compact index of keys already stored in the database"""
+import hashlib
+import heapq
+import json
+from array import array
+from bisect import bisect_left
+from typing import Optional, Tuple
+
+# NumPy is optional: it sorts and searches faster, the array module works everywhere
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+def key_hash(kind: str, value: str) -> int:
+    """Signed 64-bit hash of a dedup key (``kind`` keeps URLs and contentIds apart)"""
+    digest = hashlib.blake2b(f"{kind}\0{value}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+# Item fields that make up an item's content hash, per item type. Offers come
+# from both FlyersSpider and OffersSpider: fields only OffersSpider sets
+# (validity, formatted old price, conditions, image alt/title) are left out,
+# or the hash would change whenever the other spider saw the offer last.
+CONTENT_FIELDS = {
+    "flyers": (
+        "retailerId", "title", "pages", "validFrom", "validUntil", "pdfUrl", "thumbnailUrl",
+        "publishedFrom", "publishedUntil",
+    ),
+    "offers": (
+        "retailerId", "productName", "brand", "category", "currentPrice", "oldPrice", "discount",
+        "discountPercentage", "unitPrice", "imageUrl", "description", "parentContentId", "pageNumber",
+        "publisherId", "priceFormatted", "priceFrequency",
+    ),
+}
+
+
+def set_placeholder(item, field: str, value) -> None:
+    """Fill a required field the source didn't provide with a stand-in value
+
+    The field is left out of the content hash: a stand-in like the time of
+    the crawl would otherwise make the item look changed on every run.
+    """
+    item[field] = value
+    item._placeholders = getattr(item, "_placeholders", frozenset()) | {field}
+
+
+def content_hash(item, item_type: str) -> str:
+    """Stable hex hash of the fields the database stores for an item
+
+    Placeholder fields (see set_placeholder) are hashed as missing.
+    """
+    placeholders = getattr(item, "_placeholders", ())
+    values = [None if field in placeholders else item.get(field) for field in CONTENT_FIELDS[item_type]]
+    payload = json.dumps(values, default=lambda v: v.isoformat() if hasattr(v, "isoformat") else str(v))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def hex_to_int(value: str) -> int:
+    """Signed 64-bit int of a hex content hash, as kept in a HashIndex"""
+    return int.from_bytes(bytes.fromhex(value), "little", signed=True)
+
+
+class HashIndex:
+    """Sorted array of 64-bit key hashes, optionally with a 64-bit value each
+
+    Costs 8 bytes per key (16 with values) instead of a Python string in a
+    set. Lookups are a binary search. A hit is only probable: two keys can
+    share a hash, with a chance of about ``len(index) / 2**64`` per lookup.
+
+    Hashes are added in chunks which are sorted on their own and merged in
+    ``finish()``, so loading never holds more than one chunk as Python ints.
+    When a key is added twice with different values, the last one wins.
+    """
+
+    def __init__(self, chunk_size: int = 100_000, with_values: bool = False):
+        self.chunk_size = chunk_size
+        self.with_values = with_values
+        self.chunks = []
+        self.pending = []
+        self.hashes = array("q")
+        self.values = array("q")
+
+    def add(self, key: int, value: int = 0) -> None:
+        self.pending.append((key, len(self.pending), value) if self.with_values else key)
+        if len(self.pending) >= self.chunk_size:
+            self._seal_chunk()
+
+    def _seal_chunk(self) -> None:
+        if not self.pending:
+            return
+        self.pending.sort()
+        if self.with_values:
+            # Keep the last value of keys added twice within the chunk
+            keys, values = array("q"), array("q")
+            for key, _, value in self.pending:
+                if keys and keys[-1] == key:
+                    values[-1] = value
+                else:
+                    keys.append(key)
+                    values.append(value)
+            self.chunks.append((keys, values))
+        else:
+            self.chunks.append((array("q", self.pending), None))
+        self.pending = []
+
+    def finish(self) -> "HashIndex":
+        """Merge the loaded chunks into the final sorted array"""
+        self._seal_chunk()
+        chunks, self.chunks = self.chunks, []
+        if NUMPY_AVAILABLE and not self.with_values:
+            merged = np.concatenate([np.frombuffer(keys, dtype=np.int64) for keys, _ in chunks]) if chunks else np.empty(0, np.int64)
+            self.hashes = np.unique(merged)
+            return self
+
+        keys, values = array("q"), array("q")
+        if self.with_values:
+            # (key, chunk number, value): later chunks sort after earlier ones
+            streams = [
+                ((key, n, value) for key, value in zip(chunk_keys, chunk_values))
+                for n, (chunk_keys, chunk_values) in enumerate(chunks)
+            ]
+            for key, _, value in heapq.merge(*streams):
+                if keys and keys[-1] == key:
+                    values[-1] = value
+                else:
+                    keys.append(key)
+                    values.append(value)
+        else:
+            for key in heapq.merge(*(chunk_keys for chunk_keys, _ in chunks)):
+                if not keys or keys[-1] != key:
+                    keys.append(key)
+        self.hashes, self.values = keys, values
+        return self
+
+    def _find(self, key: int) -> int:
+        if NUMPY_AVAILABLE and not isinstance(self.hashes, array):
+            i = int(np.searchsorted(self.hashes, key))
+        else:
+            i = bisect_left(self.hashes, key)
+        return i if i < len(self.hashes) and self.hashes[i] == key else -1
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __contains__(self, key: int) -> bool:
+        return self._find(key) >= 0
+
+    def get(self, key: int) -> Optional[int]:
+        """Value stored for a key, None if the key is unknown"""
+        i = self._find(key)
+        return self.values[i] if i >= 0 and self.with_values else None
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.hashes) * (16 if self.with_values else 8)
+
+    def false_positive_rate(self) -> float:
+        """Chance that a lookup of an unknown key hits by accident"""
+        return len(self.hashes) / 2 ** 64
+
+
+def item_key_hashes(item) -> Tuple[Optional[int], Optional[int]]:
+    """(url hash, contentId hash) of an item; None entries for missing keys"""
+    url = item.get("url")
+    content_id = item.get("contentId")
+    return (
+        key_hash("url", url) if url else None,
+        key_hash("contentId", content_id) if content_id else None,
+    )
@@ -0,0 +1,242 @@
+"""Cached, rate-limited geocoding of store addresses
+
+Spiders only read the local cache. Addresses that are not cached yet are
+geocoded by a single background thread at the rate Nominatim allows, and
+the coordinates are written to the stores once the spider has closed and
+its items are in the database.
+"""
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from scrapy import signals
+from twisted.internet import threads
+
+# Geocoding for address to coordinates (optional, only if coordinates not in JSON)
+try:
+    from geopy.geocoders import Nominatim
+    from geopy.exc import GeocoderServiceError
+    GEOCODING_AVAILABLE = True
+except ImportError:
+    GEOCODING_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Cached "not found" answers are stored with NULL coordinates
+NOT_FOUND = (None, None)
+
+BACKFILL_SQL = """
+    UPDATE "Store" AS s
+    SET latitude = :latitude, longitude = :longitude, "updatedAt" = :updated_at
+    FROM "Retailer" AS r
+    WHERE s."retailerId" = r.id
+      AND r.name = :retailer_name
+      AND s.address = :address
+      AND (s.latitude IS NULL OR s.longitude IS NULL)
+"""
+
+
+def normalize_address(address: str, postal_code: str, city: str) -> str:
+    """Cache key for an address: case, spacing and punctuation don't matter"""
+    parts = []
+    for part in (postal_code, address, city):
+        part = (part or "").casefold().replace("ß", "ss")
+        part = re.sub(r"str\b\.?", "strasse", part)
+        part = re.sub(r"[^\w]+", " ", part)
+        parts.append(" ".join(part.split()))
+    return "|".join(parts)
+
+
+class GeocodeCache:
+    """SQLite table of geocoded addresses, keyed by normalize_address()"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode_cache ("
+            "key TEXT PRIMARY KEY, latitude REAL, longitude REAL, query TEXT, geocoded_at TEXT)"
+        )
+        return conn
+
+    def load(self) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+        conn = self._connect()
+        try:
+            return {key: (lat, lon) for key, lat, lon in conn.execute("SELECT key, latitude, longitude FROM geocode_cache")}
+        finally:
+            conn.close()
+
+    def writer(self):
+        """Connection for the thread that stores new results"""
+        return self._connect()
+
+    @staticmethod
+    def store(conn, key: str, coords: Tuple[Optional[float], Optional[float]], query: str):
+        conn.execute(
+            "INSERT OR REPLACE INTO geocode_cache (key, latitude, longitude, query, geocoded_at) VALUES (?, ?, ?, ?, ?)",
+            (key, coords[0], coords[1], query, datetime.now(UTC).isoformat()),
+        )
+        conn.commit()
+
+
+class GeocodingService:
+    """Resolve store coordinates without blocking the reactor
+
+    ``resolve()`` answers from the cache. On a miss it queues the address
+    for the background thread and returns None, so the store is saved
+    without coordinates; ``close()`` backfills them at the end of the crawl.
+    Failed lookups (timeouts, service errors) are not cached and are tried
+    again on the next crawl; addresses Nominatim doesn't know are.
+    """
+
+    def __init__(self, stats, cache_path: str, user_agent: str, min_delay: float = 1.0,
+                 timeout: float = 10, drain_timeout: float = 300):
+        self.stats = stats
+        self.cache = GeocodeCache(cache_path)
+        self.user_agent = user_agent
+        self.min_delay = min_delay
+        self.timeout = timeout
+        self.drain_timeout = drain_timeout
+        self.known = {}
+        self.pending = {}  # cache key -> stores waiting for it
+        self.resolved = []  # (retailer name, address, latitude, longitude) to backfill
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.thread = None
+        self.deadline = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Return a service bound to the crawler's signals, None if geocoding is off"""
+        settings = crawler.settings
+        if not GEOCODING_AVAILABLE or not settings.getbool("GEOCODING_ENABLED", True):
+            return None
+        service = cls(
+            crawler.stats,
+            cache_path=settings.get("GEOCODING_CACHE_PATH", "cache/geocode_cache.sqlite3"),
+            user_agent=settings.get("GEOCODING_USER_AGENT", "off-board-scraper/1.0"),
+            min_delay=settings.getfloat("GEOCODING_MIN_DELAY", 1.0),
+            timeout=settings.getfloat("GEOCODING_TIMEOUT", 10),
+            drain_timeout=settings.getfloat("GEOCODING_DRAIN_TIMEOUT", 300),
+        )
+        crawler.signals.connect(service.open, signal=signals.spider_opened)
+        crawler.signals.connect(service.close, signal=signals.spider_closed)
+        return service
+
+    def open(self, spider=None):
+        self.known = self.cache.load()
+        logger.info(f"🌍 Geocoding cache: {len(self.known)} known addresses")
+        self.thread = threading.Thread(target=self._work, name="geocoder", daemon=True)
+        self.thread.start()
+
+    def resolve(self, retailer_name: str, address: str, postal_code: str, city: str):
+        """Cached (latitude, longitude) for an address, or None
+
+        On a miss the address is geocoded in the background and the store
+        identified by ``retailer_name`` and ``address`` is updated later.
+        """
+        key = normalize_address(address, postal_code, city)
+        coords = self.known.get(key)
+        if coords is not None:
+            self.stats.inc_value("geocoding/cache_hits")
+            return None if coords == NOT_FOUND else coords
+
+        store = (retailer_name, (address or "").strip())
+        with self.lock:
+            waiting = self.pending.get(key)
+            if waiting is None:
+                self.pending[key] = {store}
+                self.queue.put((key, f"{address}, {postal_code} {city}, Germany"))
+                self.stats.inc_value("geocoding/queued")
+            else:
+                waiting.add(store)
+        self.stats.inc_value("geocoding/cache_misses")
+        return None
+
+    def _work(self):
+        geocoder = Nominatim(user_agent=self.user_agent, timeout=self.timeout)
+        conn = self.cache.writer()
+        last_call = 0.0
+        try:
+            while True:
+                job = self.queue.get()
+                if job is None:
+                    break
+                key, query = job
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    self.stats.inc_value("geocoding/skipped")
+                    continue
+
+                # Nominatim's usage policy allows one request per second
+                wait = self.min_delay - (time.monotonic() - last_call)
+                if wait > 0:
+                    time.sleep(wait)
+                last_call = time.monotonic()
+
+                try:
+                    location = geocoder.geocode(query, timeout=self.timeout)
+                except (GeocoderServiceError, Exception) as e:
+                    logger.debug(f"Geocoding failed for {query}: {e}")
+                    self.stats.inc_value("geocoding/errors")
+                    with self.lock:
+                        self.pending.pop(key, None)
+                    continue
+
+                coords = (location.latitude, location.longitude) if location else NOT_FOUND
+                self.cache.store(conn, key, coords, query)
+                self.known[key] = coords
+                with self.lock:
+                    stores = self.pending.pop(key, set())
+                    if coords != NOT_FOUND:
+                        self.resolved.extend((name, address, *coords) for name, address in stores)
+                self.stats.inc_value("geocoding/geocoded" if location else "geocoding/not_found")
+        finally:
+            conn.close()
+
+    def close(self, spider=None, reason=None):
+        """Finish queued lookups (up to the drain timeout) and backfill the stores"""
+        if self.thread is None:
+            return None
+        return threads.deferToThread(self._finish)
+
+    def _finish(self):
+        queued = self.queue.qsize()
+        if queued:
+            logger.info(f"🌍 Geocoding {queued} remaining addresses (at most {self.drain_timeout:.0f}s)")
+        self.deadline = time.monotonic() + self.drain_timeout
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+        with self.lock:
+            resolved, self.resolved = self.resolved, []
+        if resolved:
+            self._backfill(resolved)
+
+    def _backfill(self, resolved: List[Tuple[str, str, float, float]]):
+        """Write resolved coordinates to stores that don't have any yet"""
+        from sqlalchemy import text
+        from database.session import get_db_session
+
+        now = datetime.now(UTC)
+        params = [
+            {"retailer_name": name, "address": address, "latitude": lat, "longitude": lon, "updated_at": now}
+            for name, address, lat, lon in resolved
+        ]
+        try:
+            with get_db_session() as session:
+                updated = session.execute(text(BACKFILL_SQL), params).rowcount
+                session.commit()
+            self.stats.inc_value("geocoding/backfilled", updated)
+            logger.info(f"🌍 Backfilled coordinates for {updated} stores")
+        except Exception as e:
+            logger.error(f"❌ Failed to backfill store coordinates: {e}")
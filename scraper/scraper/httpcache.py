@@ -0,0 +1,124 @@
+"""Content-addressed HTTP cache storage for recording and replaying crawls
+
+Used as HTTPCACHE_STORAGE by Scrapy's HttpCacheMiddleware. Unlike
+FilesystemCacheStorage it can hold Playwright-rendered pages: the cache key
+is the request fingerprint plus whether the page is rendered, so the plain
+response of a ``playwright_fallback`` request and its rendered retry are
+separate entries (with a shared key, the retry would get the plain response
+back and PlaywrightFallbackMiddleware would loop).
+
+Layout under HTTPCACHE_DIR:
+
+* ``objects/ab/<sha256>.gz``: gzip-compressed response bodies, named by the
+  SHA-256 of the body, so identical bodies (the homepage fetched by every
+  spider, unchanged pages on the next day) are stored once
+* ``index/cd/<key>.json``: status, headers and URL of the response to a
+  request, and the hash of its body
+
+The index is shared by all spiders. Entries older than
+HTTPCACHE_EXPIRATION_SECS are not used (0: they never expire). With
+HTTPCACHE_IGNORE_MISSING (replay mode, ``SCRAPER_HTTPCACHE=replay``) requests
+that aren't in the cache are dropped instead of downloaded, so nothing is
+fetched and no browser is started.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from scrapy.utils.project import data_path
+from scrapy.utils.response import response_from_dict
+
+logger = logging.getLogger(__name__)
+
+# Response attributes kept in the index next to status, URL and headers
+STORED_ATTRIBUTES = ("protocol", "flags", "encoding", "_class")
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write ``path`` so that readers (other spiders, other crawls) never see partial files"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class ContentAddressedCacheStorage:
+    """HTTP cache storage with deduplicated, compressed bodies"""
+
+    def __init__(self, settings):
+        self.cachedir = Path(data_path(settings["HTTPCACHE_DIR"]))
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.compresslevel = settings.getint("HTTPCACHE_GZIP_LEVEL", 6)
+        self.stats = None
+        self._fingerprinter = None
+
+    def open_spider(self, spider):
+        logger.debug(f"Using content-addressed cache storage in {self.cachedir}")
+        self.stats = spider.crawler.stats
+        self._fingerprinter = spider.crawler.request_fingerprinter
+
+    def close_spider(self, spider):
+        pass
+
+    def _key(self, request) -> str:
+        fingerprint = self._fingerprinter.fingerprint(request)
+        if request.meta.get("playwright"):
+            fingerprint = hashlib.sha1(fingerprint + b"|playwright").digest()
+        return fingerprint.hex()
+
+    def _index_path(self, key: str) -> Path:
+        return self.cachedir / "index" / key[:2] / f"{key}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.cachedir / "objects" / digest[:2] / f"{digest}.gz"
+
+    def retrieve_response(self, spider, request):
+        """Return the cached response to ``request``, None if there is none or it expired"""
+        path = self._index_path(self._key(request))
+        try:
+            entry = json.loads(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        if 0 < self.expiration_secs < time.time() - entry["timestamp"]:
+            self.stats.inc_value("httpcache/expired")
+            return None
+        with gzip.open(self._object_path(entry["body"]), "rb") as f:
+            body = f.read()
+        data = {
+            "url": entry["url"],
+            "status": entry["status"],
+            "headers": {k.encode("latin-1"): [v.encode("latin-1") for v in vs] for k, vs in entry["headers"].items()},
+            "body": body,
+            **{name: entry[name] for name in STORED_ATTRIBUTES if name in entry},
+        }
+        request.meta["cache_timestamp"] = entry["timestamp"]
+        return response_from_dict(data)
+
+    def store_response(self, spider, request, response):
+        """Store ``response``, writing its body only if no identical body is stored yet"""
+        digest = hashlib.sha256(response.body).hexdigest()
+        object_path = self._object_path(digest)
+        if object_path.exists():
+            self.stats.inc_value("httpcache/objects_deduplicated")
+        else:
+            data = gzip.compress(response.body, compresslevel=self.compresslevel, mtime=0)
+            _write_atomic(object_path, data)
+            self.stats.inc_value("httpcache/objects_written")
+            self.stats.inc_value("httpcache/bytes_written", len(data))
+        stored = response.to_dict()
+        entry = {
+            "request_url": request.url,
+            "method": request.method,
+            "rendered": bool(request.meta.get("playwright")),
+            "url": response.url,
+            "status": response.status,
+            "headers": {k.decode("latin-1"): [v.decode("latin-1") for v in vs] for k, vs in response.headers.items()},
+            "body": digest,
+            "timestamp": time.time(),
+            **{name: stored[name] for name in STORED_ATTRIBUTES if name in stored},
+        }
+        _write_atomic(self._index_path(self._key(request)), json.dumps(entry).encode("utf-8"))
@@ -17,6 +17,7 @@ class FlyerItem(scrapy.Item):
     contentId = scrapy.Field(required=False)
     publishedFrom = scrapy.Field(required=False)
     publishedUntil = scrapy.Field(required=False)
+    contentHash = scrapy.Field(required=False)  # Set by DeduplicationPipeline
 
 
 class OfferItem(scrapy.Item):
@@ -47,6 +48,7 @@ class OfferItem(scrapy.Item):
     priceConditions = scrapy.Field(required=False)
     imageAlt = scrapy.Field(required=False)
     imageTitle = scrapy.Field(required=False)
+    contentHash = scrapy.Field(required=False)  # Set by DeduplicationPipeline
 
 
 class RetailerItem(scrapy.Item):
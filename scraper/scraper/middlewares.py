@@ -1,5 +1,10 @@
 """Scrapy middlewares"""
+from urllib.parse import urlparse
+
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .rendering import NEXT_DATA_MARKER, wait_until_ready
 
 
 class KaufdaScraperDownloaderMiddleware:
@@ -23,3 +28,143 @@ class KaufdaScraperDownloaderMiddleware:
     def spider_opened(self, spider):
         spider.logger.info(f"Spider opened: {spider.name}")
 
+
+
+class PlaywrightFallbackMiddleware:
+    """Try plain HTTP first for requests marked with ``playwright_fallback``
+
+    ScrapyPlaywrightDownloadHandler hands every request without
+    ``meta["playwright"]`` to Scrapy's HTTP/1.1 handler, so these requests
+    never touch the browser. If the response has no ``__NEXT_DATA__`` script
+    (or the plain request fails) the request is sent again with Playwright.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def _needs_browser(self, request):
+        return request.meta.get("playwright_fallback") and not request.meta.get("playwright")
+
+    def _browser_request(self, request, reason, spider):
+        self.stats.inc_value("playwright_fallback/browser")
+        self.stats.inc_value(f"playwright_fallback/browser/{reason}")
+        spider.logger.debug(f"Plain HTTP not enough for {request.url} ({reason}), retrying with Playwright")
+        return request.replace(meta={**request.meta, "playwright": True}, dont_filter=True)
+
+    def process_response(self, request, response, spider):
+        if not self._needs_browser(request):
+            return response
+        if response.status in (404, 410):
+            return response  # A browser won't find a missing page either
+        if response.status != 200:
+            return self._browser_request(request, f"status_{response.status}", spider)
+        if NEXT_DATA_MARKER not in response.body:
+            return self._browser_request(request, "no_next_data", spider)
+        self.stats.inc_value("playwright_fallback/plain")
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if self._needs_browser(request):
+            return self._browser_request(request, "exception", spider)
+
+
+class ResourceBlocker:
+    """Abort images, fonts, media and tracker requests in Playwright pages
+
+    A Scrapy add-on (see ADDONS) that installs itself as scrapy-playwright's
+    PLAYWRIGHT_ABORT_REQUEST predicate. Hosts in PLAYWRIGHT_ALLOWED_HOSTS are
+    never blocked; otherwise a request is aborted when its host is in
+    PLAYWRIGHT_BLOCKED_HOSTS or its resource type is in
+    PLAYWRIGHT_BLOCKED_RESOURCE_TYPES. Page navigations always go through.
+    """
+
+    def __init__(self, crawler, blocked_types, blocked_hosts, allowed_hosts, bytes_estimate):
+        self.crawler = crawler  # its stats are created after the add-ons
+        self.blocked_types = {t.strip() for t in blocked_types if t.strip()}
+        self.blocked_hosts = tuple(blocked_hosts)
+        self.allowed_hosts = tuple(allowed_hosts)
+        self.bytes_estimate = bytes_estimate
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("PLAYWRIGHT_BLOCK_RESOURCES", True):
+            raise NotConfigured
+        return cls(
+            crawler,
+            blocked_types=settings.getlist("PLAYWRIGHT_BLOCKED_RESOURCE_TYPES"),
+            blocked_hosts=settings.getlist("PLAYWRIGHT_BLOCKED_HOSTS"),
+            allowed_hosts=settings.getlist("PLAYWRIGHT_ALLOWED_HOSTS"),
+            bytes_estimate=settings.getdict("PLAYWRIGHT_BLOCKED_BYTES_ESTIMATE"),
+        )
+
+    def update_settings(self, settings):
+        settings.set("PLAYWRIGHT_ABORT_REQUEST", self, priority="addon")
+
+    @staticmethod
+    def _match_host(host, domains):
+        """Return the domain ``host`` belongs to, if any"""
+        for domain in domains:
+            if host == domain or host.endswith("." + domain):
+                return domain
+        return None
+
+    def _block_reason(self, playwright_request):
+        """Return the stats key suffix for a request to block, None to let it through"""
+        if playwright_request.is_navigation_request():
+            return None
+        host = (urlparse(playwright_request.url).hostname or "").lower()
+        if self._match_host(host, self.allowed_hosts):
+            return None
+        domain = self._match_host(host, self.blocked_hosts)
+        if domain:
+            return f"host/{domain}"
+        if playwright_request.resource_type in self.blocked_types:
+            return f"type/{playwright_request.resource_type}"
+        return None
+
+    def __call__(self, playwright_request) -> bool:
+        """PLAYWRIGHT_ABORT_REQUEST predicate: True aborts the request"""
+        reason = self._block_reason(playwright_request)
+        if reason is None:
+            return False
+        stats = self.crawler.stats
+        stats.inc_value("resource_blocking/blocked")
+        stats.inc_value(f"resource_blocking/blocked/{reason}")
+        stats.inc_value(
+            "resource_blocking/bytes_saved_estimate",
+            self.bytes_estimate.get(playwright_request.resource_type, 0),
+        )
+        return True
+
+
+class ReadinessStatsMiddleware:
+    """Export the measured Playwright readiness waits as crawl stats
+
+    ``readiness/saved_ms`` is the time saved compared to always sleeping for
+    the full ceiling, as the spiders did with ``wait_for_timeout``.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def process_response(self, request, response, spider):
+        for pm in request.meta.get("playwright_page_methods") or ():
+            if getattr(pm, "method", None) is not wait_until_ready or not isinstance(pm.result, dict):
+                continue
+            wait_ms = pm.result["wait_ms"]
+            self.stats.inc_value("readiness/pages")
+            self.stats.inc_value("readiness/wait_ms_total", wait_ms)
+            self.stats.max_value("readiness/wait_ms_max", wait_ms)
+            self.stats.inc_value("readiness/saved_ms", max(0, pm.result["ceiling_ms"] - wait_ms))
+            if pm.result["timed_out"]:
+                self.stats.inc_value("readiness/timeouts")
+        return response
@@ -0,0 +1,122 @@
+"""Locate and decode the __NEXT_DATA__ JSON of a page"""
+import json
+import logging
+import time
+from typing import Any, Optional, Union
+
+from pydantic import ValidationError
+
+from .rendering import NEXT_DATA_MARKER, NEXT_DATA_SELECTOR
+from .schemas import DroppedEntries, decode, describe_errors
+
+# Fast JSON backends are optional: orjson, then msgspec, then the json module
+try:
+    import orjson
+    _fast_loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import msgspec
+        _fast_loads = msgspec.json.Decoder().decode
+        JSON_BACKEND = "msgspec"
+    except ImportError:
+        _fast_loads = json.loads
+        JSON_BACKEND = "json"
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_END = b"</script>"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode JSON with the fastest available backend
+
+    The fast backends are stricter than the json module (NaN, integers
+    beyond 64 bits), so what they reject is decoded again with json before
+    giving up.
+    """
+    try:
+        return _fast_loads(data)
+    except ValueError:
+        if JSON_BACKEND == "json":
+            raise
+        return json.loads(data)
+
+
+def find_next_data(body: bytes) -> Optional[bytes]:
+    """Content of the __NEXT_DATA__ script, found by byte search in the raw body
+
+    Next.js escapes ``<`` inside the JSON, so the first ``</script>`` after
+    the tag ends it.
+    """
+    marker = body.find(NEXT_DATA_MARKER)
+    if marker < 0:
+        return None
+    start = body.find(b">", marker + len(NEXT_DATA_MARKER))
+    if start < 0:
+        return None
+    end = body.find(SCRIPT_END, start)
+    if end < 0:
+        return None
+    return body[start + 1:end]
+
+
+def extract_next_data(response, stats=None, model=None) -> Optional[Any]:
+    """Parsed __NEXT_DATA__ JSON of a response, None if it's missing or invalid
+
+    The script is located by byte search and only falls back to CSS/XPath
+    selectors when that fails. Each call is recorded in ``stats`` under
+    ``next_data/*`` (pages, bytes, parse time) and logged at debug level
+    with its parse time.
+
+    With a ``model`` (see schemas), the parsed JSON is decoded into it and
+    the model is returned instead of a dict. A document that doesn't match
+    the schema is logged as an error and counted under
+    ``next_data/schema_errors``; entries dropped from it are summed up in a
+    single warning.
+    """
+    started = time.perf_counter()
+    source = "byte_search"
+    data = find_next_data(response.body)
+    if data is not None and (response.encoding or "utf-8").lower().replace("-", "") not in ("utf8", "ascii"):
+        data = data.decode(response.encoding)
+    if data is None:
+        source = "selector"
+        data = (
+            response.css(f"{NEXT_DATA_SELECTOR}::text").get()
+            or response.xpath('//script[@id="__NEXT_DATA__"]/text()').get()
+        )
+    if not data:
+        _inc(stats, "next_data/missing")
+        return None
+
+    try:
+        json_data = loads(data)
+        if model is not None:
+            dropped = DroppedEntries(stats)
+            json_data = decode(model, json_data, dropped)
+            if dropped.counts:
+                logger.warning(f"Dropped entries of __NEXT_DATA__ on {response.url} that don't match {model.__name__}: {dropped}")
+    except ValidationError as e:
+        logger.error(f"__NEXT_DATA__ of {response.url} doesn't match {model.__name__}: {describe_errors(e)}")
+        _inc(stats, "next_data/schema_errors")
+        return None
+    except ValueError as e:
+        logger.debug(f"Invalid __NEXT_DATA__ JSON on {response.url}: {e}")
+        _inc(stats, "next_data/invalid")
+        return None
+
+    parse_ms = (time.perf_counter() - started) * 1000
+    if stats is not None:
+        stats.inc_value("next_data/pages")
+        stats.inc_value(f"next_data/{source}")
+        stats.inc_value("next_data/bytes", len(data))
+        stats.inc_value("next_data/parse_ms", round(parse_ms, 3))
+        stats.max_value("next_data/parse_ms_max", round(parse_ms, 3))
+    logger.debug(f"Parsed __NEXT_DATA__ of {response.url} ({len(data)} bytes, {JSON_BACKEND}) in {parse_ms:.2f} ms")
+    return json_data if model is not None or isinstance(json_data, dict) else None
+
+
+def _inc(stats, key: str) -> None:
+    if stats is not None:
+        stats.inc_value(key)
@@ -0,0 +1,68 @@
+"""Incremental reading of the brochure pages API response"""
+import io
+from typing import Any, Dict, Iterator
+
+from pydantic import TypeAdapter
+
+from .next_data import loads
+from .schemas import Entry, Page, PagesResponse, decode
+
+# ijson is optional: it parses the body page by page, otherwise it is decoded whole
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+
+def iter_pages(body: bytes, streaming: bool = True) -> Iterator[Dict[str, Any]]:
+    """Yield the entries of ``contents`` of a pages API response in order
+
+    With ijson, only one page is held as Python objects at a time and the
+    first page is available before the rest of the body is parsed. Without
+    it (or with ``streaming=False``) the body is decoded in one go, straight
+    from bytes, with the fastest JSON backend available.
+    """
+    if streaming and IJSON_AVAILABLE:
+        # use_float: prices must be floats like with json, not Decimal
+        yield from ijson.items(io.BytesIO(body), "contents.item", use_float=True)
+        return
+    data = loads(body)
+    yield from data.get("contents", []) if isinstance(data, dict) else []
+
+
+_page = TypeAdapter(Entry(Page))
+
+
+def _check_contents(body: bytes, stats) -> None:
+    """Raise ValidationError unless ``body`` is an object whose ``contents`` is a list
+
+    ``contents.item`` matches nothing in such a document, so streaming would
+    yield no pages without an error. The document is then decoded whole,
+    which raises the same ValidationError as without streaming. Parsing
+    stops at ``contents``, usually the first key.
+    """
+    for prefix, event, _ in ijson.parse(io.BytesIO(body)):
+        if (prefix == "" and event not in ("start_map", "map_key", "end_map")) or (
+            prefix == "contents" and event != "start_array"
+        ):
+            decode(PagesResponse, loads(body), stats)
+        if prefix == "contents":
+            return
+
+
+def iter_page_models(body: bytes, stats=None, streaming: bool = True) -> Iterator[Page]:
+    """Like iter_pages, with each page decoded into schemas.Page
+
+    Pages that don't match the schema are logged and skipped; a response
+    whose ``contents`` isn't a list raises ValidationError.
+    """
+    if streaming and IJSON_AVAILABLE:
+        _check_contents(body, stats)
+        context = {"stats": stats}
+        for page_data in iter_pages(body):
+            page = _page.validate_python(page_data, context=context)
+            if page is not None:
+                yield page
+        return
+    yield from decode(PagesResponse, loads(body), stats).contents
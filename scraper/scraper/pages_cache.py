@@ -0,0 +1,257 @@
+"""Persistent cache of brochure pages API responses
+
+A published brochure doesn't change, yet FlyersSpider used to download its
+pages API response on every run. The cache keeps the last response per
+contentId in a SQLite file, compressed, with its SHA-256 and the ETag and
+Last-Modified headers it came with:
+
+* hit: the brochure is still valid (its validUntil on the homepage hasn't
+  passed) and the stored payload matches its hash, so the payload is parsed
+  without any request
+* stale: otherwise the request revalidates the stored entry with
+  If-None-Match / If-Modified-Since; a 304 (``revalidated``) reuses the
+  stored payload, a 200 replaces it
+* miss: nothing stored, the response is downloaded and stored
+
+Writes (compressing the payload included) go to a background thread with
+its own connection, which commits whenever its queue runs empty. Entries
+are kept for PAGES_CACHE_RETENTION_DAYS after their brochure expired (or,
+without a validUntil, after they were last fetched), so brochures that stay
+listed past their date are still revalidated; older ones are deleted when
+the spider opens. The counts are in the crawl stats under ``pages_cache/``.
+"""
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timedelta, UTC
+from functools import partial
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+from scrapy import signals
+from twisted.internet import threads
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(moment: Optional[datetime]) -> Optional[str]:
+    """UTC ISO timestamp, so stored timestamps compare as strings"""
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=UTC)
+    return moment.astimezone(UTC).isoformat()
+
+
+class CachedPages(NamedTuple):
+    """Index entry of a stored pages API response"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    payload_hash: str
+
+
+class PagesCache:
+    """SQLite table of pages API payloads, keyed by brochure contentId
+
+    The index (everything but the payloads) is loaded when the spider
+    opens; payloads are read when they are used. Changes are queued for the
+    writer thread and are on disk once ``close()`` has finished.
+    """
+
+    def __init__(self, stats, path: str, retention_days: float = 14):
+        self.stats = stats
+        self.path = Path(path)
+        self.retention = timedelta(days=retention_days)
+        self.conn = None
+        self.known: Dict[str, CachedPages] = {}
+        self.queue = queue.Queue()
+        self.thread = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Return a cache bound to the crawler's signals, None if it is off"""
+        settings = crawler.settings
+        if not settings.getbool("PAGES_CACHE_ENABLED", True):
+            return None
+        # The stats collector is created after the spider: open() takes it from there
+        cache = cls(
+            None,
+            settings.get("PAGES_CACHE_PATH", "cache/pages_cache.sqlite3"),
+            retention_days=settings.getfloat("PAGES_CACHE_RETENTION_DAYS", 14),
+        )
+        crawler.signals.connect(cache.open, signal=signals.spider_opened)
+        crawler.signals.connect(cache.close, signal=signals.spider_closed)
+        return cache
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        # WAL lets the spider read payloads while the writer thread commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages_cache ("
+            "content_id TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, payload_hash TEXT, "
+            "payload BLOB, valid_until TEXT, fetched_at TEXT)"
+        )
+        return conn
+
+    def open(self, spider=None):
+        if self.stats is None:
+            self.stats = spider.crawler.stats
+        self.conn = self._connect()
+        cutoff = _timestamp(datetime.now(UTC) - self.retention)
+        expired = self.conn.execute(
+            "DELETE FROM pages_cache WHERE valid_until < ? OR (valid_until IS NULL AND fetched_at < ?)",
+            (cutoff, cutoff),
+        ).rowcount
+        self.conn.commit()
+        if expired:
+            self.stats.inc_value("pages_cache/expired", expired)
+        self.known = {
+            content_id: CachedPages(etag, last_modified, payload_hash)
+            for content_id, etag, last_modified, payload_hash in self.conn.execute(
+                "SELECT content_id, etag, last_modified, payload_hash FROM pages_cache"
+            )
+        }
+        logger.info(f"📚 Pages API cache: {len(self.known)} known brochures ({expired} expired removed)")
+        self.thread = threading.Thread(target=self._work, name="pages-cache-writer", daemon=True)
+        self.thread.start()
+
+    def close(self, spider=None, reason=None):
+        """Write the queued changes, then close the cache"""
+        if self.thread is None:
+            return None
+        d = threads.deferToThread(self._finish)
+        d.addBoth(self._close_reader)
+        return d
+
+    def _finish(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def _close_reader(self, result):
+        # The reading connection belongs to the reactor thread
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        return result
+
+    def _work(self):
+        conn = self._connect()
+        try:
+            while True:
+                job = self.queue.get()
+                if job is None:
+                    break
+                try:
+                    job(conn)
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to update the pages API cache: {e}")
+                    self.stats.inc_value("pages_cache/write_errors")
+                if self.queue.empty():
+                    conn.commit()
+            conn.commit()
+        finally:
+            conn.close()
+
+    def payload(self, content_id: str) -> Optional[bytes]:
+        """Stored payload of a brochure, None if it is missing or doesn't match its hash"""
+        entry = self.known.get(content_id)
+        row = self.conn.execute("SELECT payload FROM pages_cache WHERE content_id = ?", (content_id,)).fetchone()
+        if entry is None or row is None or row[0] is None:
+            return None
+        try:
+            body = zlib.decompress(row[0])
+        except zlib.error:
+            body = None
+        if body is None or hashlib.sha256(body).hexdigest() != entry.payload_hash:
+            logger.warning(f"Stored pages API payload of {content_id} is corrupt, downloading it again")
+            self.stats.inc_value("pages_cache/corrupt")
+            self.forget(content_id)
+            return None
+        return body
+
+    def lookup(self, content_id: str, valid_until: Optional[datetime]) -> Optional[bytes]:
+        """Payload to use without a request: the brochure is still valid and its payload is intact
+
+        None means the pages must be requested, with conditional_headers()
+        if an entry is stored.
+        """
+        if valid_until is not None and valid_until.tzinfo is None:
+            valid_until = valid_until.replace(tzinfo=UTC)
+        if content_id in self.known and valid_until is not None and valid_until > datetime.now(UTC):
+            body = self.payload(content_id)
+            if body is not None:
+                self.stats.inc_value("pages_cache/hit")
+                self.stats.inc_value("pages_cache/bytes_saved", len(body))
+                return body
+        self.stats.inc_value("pages_cache/stale" if content_id in self.known else "pages_cache/miss")
+        return None
+
+    def conditional_headers(self, content_id: str) -> Dict[str, str]:
+        """Headers revalidating the stored response of a brochure"""
+        entry = self.known.get(content_id)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, content_id: str, response, valid_until: Optional[datetime]):
+        """Store a downloaded (200) response"""
+        body = response.body
+        payload_hash = hashlib.sha256(body).hexdigest()
+        entry = self.known.get(content_id)
+        if entry is not None:
+            # A stale entry the server answered with a full response
+            self.stats.inc_value("pages_cache/unchanged" if entry.payload_hash == payload_hash else "pages_cache/changed")
+        self.stats.inc_value("pages_cache/stored")
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        entry = CachedPages(
+            etag.decode("latin-1") if etag else None,
+            last_modified.decode("latin-1") if last_modified else None,
+            payload_hash,
+        )
+        self.queue.put(partial(self._insert, content_id, entry, body, _timestamp(valid_until),
+                               _timestamp(datetime.now(UTC))))
+        self.known[content_id] = entry
+
+    def revalidated(self, content_id: str, valid_until: Optional[datetime]) -> Optional[bytes]:
+        """Stored payload after a 304 response, None if it can't be used"""
+        body = self.payload(content_id)
+        if body is not None:
+            self.stats.inc_value("pages_cache/revalidated")
+            self.stats.inc_value("pages_cache/bytes_saved", len(body))
+            self.queue.put(partial(
+                self._execute, "UPDATE pages_cache SET valid_until = ?, fetched_at = ? WHERE content_id = ?",
+                (_timestamp(valid_until), _timestamp(datetime.now(UTC)), content_id),
+            ))
+        return body
+
+    def forget(self, content_id: str):
+        self.known.pop(content_id, None)
+        self.queue.put(partial(self._execute, "DELETE FROM pages_cache WHERE content_id = ?", (content_id,)))
+
+    # Writer thread
+
+    @staticmethod
+    def _insert(content_id: str, entry: CachedPages, body: bytes, valid_until: Optional[str],
+                fetched_at: str, conn):
+        conn.execute(
+            "INSERT OR REPLACE INTO pages_cache "
+            "(content_id, etag, last_modified, payload_hash, payload, valid_until, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (content_id, entry.etag, entry.last_modified, entry.payload_hash, zlib.compress(body),
+             valid_until, fetched_at),
+        )
+
+    @staticmethod
+    def _execute(sql: str, params: tuple, conn):
+        conn.execute(sql, params)
@@ -1,11 +1,18 @@
 """Scrapy pipelines"""
-import json
 import logging
 import sys
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, UTC
-from typing import Dict, Any
+from typing import Dict, Any, List
+from pydantic import TypeAdapter, ValidationError
+from scrapy.exceptions import DropItem
+from sqlalchemy import or_, select
 from sqlalchemy.exc import IntegrityError
+from twisted.internet import defer, task
 
 # Add parent directory to path for imports
 parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -13,148 +20,445 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 from database.session import get_db_session
+from database.bulk import upsert_rows, link_offers_to_flyers
+from database.backfill import Spool, load_spool
+from database.price_history import prepare_partitions, record_price_changes
 from models import (
     Retailer,
     Flyer,
     Offer,
     Product,
     Store,
-    ScrapingLog,
 )
 from utils.validators import FlyerData, OfferData, RetailerData, StoreData
-from utils.helpers import normalize_url, extract_price, parse_date
+from utils.helpers import normalize_url
+from .items import FlyerItem, OfferItem, RetailerItem, StoreItem
+from .schemas import describe_errors
+from .dedup import CONTENT_FIELDS, HashIndex, content_hash, hex_to_int, item_key_hashes, key_hash
+from .writer import DatabaseWriter
 
 logger = logging.getLogger(__name__)
 
 
 class ValidationPipeline:
-    """Validate scraped items"""
+    """Validate scraped items against the schemas of utils.validators
+
+    The schema is picked by item class. Validation is strict (no type
+    coercion) and only checks the item: the original item is returned
+    unchanged, or dropped with DropItem when it is invalid.
+    """
+
+    adapters = {
+        RetailerItem: TypeAdapter(RetailerData),
+        FlyerItem: TypeAdapter(FlyerData),
+        OfferItem: TypeAdapter(OfferData),
+        StoreItem: TypeAdapter(StoreData),
+    }
 
     def process_item(self, item, spider):
         """Validate item based on its type"""
+        if getattr(item, "_decoded", False):
+            # Built from a typed schema (see schemas.decoded), already valid
+            return item
+        adapter = self.adapters.get(type(item))
+        if adapter is None:
+            return item
         try:
-            if "name" in item:  # RetailerItem
-                validated = RetailerData(**item)
-                return dict(validated)
-            elif "title" in item:  # FlyerItem
-                validated = FlyerData(**item)
-                return dict(validated)
-            elif "productName" in item:  # OfferItem
-                validated = OfferData(**item)
-                return dict(validated)
-            elif "address" in item and "retailerId" in item:  # StoreItem
-                validated = StoreData(**item)
-                return dict(validated)
-        except Exception as e:
-            logger.warning(f"Validation failed for item: {e}")
-            spider.logger.warning(f"Validation failed: {e}")
-            return None
-
+            adapter.validate_python(dict(item), strict=True)
+        except ValidationError as e:
+            raise DropItem(f"Validation failed for {type(item).__name__}: {describe_errors(e)}")
         return item
 
 
 class DeduplicationPipeline:
-    """Prevent duplicate entries using in-memory cache and database check"""
+    """Prevent duplicate entries using a compact index of stored keys
 
-    def __init__(self):
-        self.seen_urls = set()  # In-memory cache for current run
-        self.seen_content_ids = set()  # In-memory cache for contentId
+    URLs and contentIds already in the database are loaded as 64-bit hashes
+    into a sorted array (see dedup.HashIndex) instead of sets of strings.
+    Keys seen during the current run are tracked separately.
+
+    Two modes are supported (``DEDUP_MODE`` setting):
+
+    * ``changes``: every flyer/offer gets a ``contentHash`` of its stored
+      fields. Known items are only dropped when that hash is unchanged, so
+      new prices still reach the database.
+    * ``skip``: any item already in the database is dropped
+
+    A probable hit of the index is confirmed with a database lookup before
+    the item is dropped (DEDUP_CONFIRM_HITS), so a hash collision never loses
+    an item.
+    """
+
+    def __init__(self, writer: DatabaseWriter = None, stats=None, mode: str = "changes", confirm_hits: bool = True, chunk_size: int = 100_000):
+        self.writer = writer
+        self.stats = stats
+        self.mode = mode
+        self.confirm_hits = confirm_hits
+        self.chunk_size = chunk_size
+        self.index = self._new_index().finish()  # Keys stored in the database
+        self.seen_hashes = set()  # Keys seen in the current run
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            writer=DatabaseWriter.from_crawler(crawler),
+            stats=crawler.stats,
+            mode=settings.get("DEDUP_MODE", "changes"),
+            confirm_hits=settings.getbool("DEDUP_CONFIRM_HITS", True),
+            chunk_size=settings.getint("DEDUP_LOAD_CHUNK_SIZE", 100_000),
+        )
+
+    def _new_index(self):
+        # In changes mode every key carries the stored content hash
+        return HashIndex(self.chunk_size, with_values=self.mode == "changes")
 
     def open_spider(self, spider):
+        """Load existing URLs and contentIds off the reactor thread"""
+        if not self.writer:
+            return self._load_existing(spider)
+        self.writer.open()
+        return self.writer.submit(self._load_existing, spider)
+
+    def close_spider(self, spider):
+        if self.stats:
+            probable = self.stats.get_value("dedup/probable_hits", 0)
+            if probable:
+                false_hits = self.stats.get_value("dedup/false_positives", 0)
+                self.stats.set_value("dedup/false_positive_rate", false_hits / probable)
+        if self.writer:
+            return self.writer.close()
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
+
+    def _load_existing(self, spider):
         """Load existing URLs and contentIds from database to prevent re-scraping"""
+        start = time.perf_counter()
+        index = self._new_index()
         try:
             with get_db_session() as session:
-                # Load existing flyer URLs and contentIds
-                flyers = session.query(Flyer.url, Flyer.contentId).all()
-                for url, content_id in flyers:
-                    if url:
-                        self.seen_urls.add(url)
-                    if content_id:
-                        self.seen_content_ids.add(content_id)
-                
-                # Load existing offer URLs and contentIds
-                offers = session.query(Offer.url, Offer.contentId).all()
-                for url, content_id in offers:
-                    if url:
-                        self.seen_urls.add(url)
-                    if content_id:
-                        self.seen_content_ids.add(content_id)
-                
-                spider.logger.info(f"DeduplicationPipeline: Loaded {len(self.seen_urls)} URLs and {len(self.seen_content_ids)} contentIds from database")
+                # Streamed through a server-side cursor, never all rows at once
+                for model in (Flyer, Offer):
+                    rows = session.query(model.url, model.contentId, model.contentHash).yield_per(self.chunk_size)
+                    for url, content_id, stored_hash in rows:
+                        # 0 stands for "no content hash stored yet"
+                        value = hex_to_int(stored_hash) if stored_hash else 0
+                        if url:
+                            index.add(key_hash("url", url), value)
+                        if content_id:
+                            index.add(key_hash("contentId", content_id), value)
         except Exception as e:
             spider.logger.warning(f"DeduplicationPipeline: Could not load existing URLs from database: {e}")
+        self.index = index.finish()
+
+        if self.stats:
+            self.stats.set_value("dedup/index_entries", len(self.index))
+            self.stats.set_value("dedup/index_bytes", self.index.nbytes)
+            self.stats.set_value("dedup/index_load_seconds", round(time.perf_counter() - start, 3))
+            self.stats.set_value("dedup/hash_collision_rate", self.index.false_positive_rate())
+        spider.logger.info(
+            f"DeduplicationPipeline: Loaded {len(self.index)} URL/contentId hashes from database "
+            f"({self.index.nbytes / 1024:.0f} KiB, mode: {self.mode})"
+        )
 
     def process_item(self, item, spider):
         """Check for duplicates by URL or contentId"""
+        hashes = [h for h in item_key_hashes(item) if h is not None]
+        if not hashes:
+            return item
+
+        # Check keys seen in this run
+        if any(h in self.seen_hashes for h in hashes):
+            self._inc_stat("dedup/run_duplicates")
+            raise DropItem(f"Duplicate item in this run: {item.get('url') or item.get('contentId')}")
+        self.seen_hashes.update(hashes)
+
+        item_hash = None
+        if self.mode == "changes":
+            item_type = DatabasePipeline._get_item_type(item)
+            if item_type in CONTENT_FIELDS:
+                item["contentHash"] = item_hash = content_hash(item, item_type)
+
+        # Check keys stored in the database
+        stored = [h for h in hashes if h in self.index]
+        if not stored:
+            self._inc_stat("dedup/new")
+            return item
+        if self.mode == "changes":
+            stored_hash = self.index.get(stored[0])
+            if not item_hash or not stored_hash or stored_hash != hex_to_int(item_hash):
+                self._inc_stat("dedup/changed")
+                return item
+
+        self._inc_stat("dedup/probable_hits")
+        if not self.confirm_hits:
+            return self._drop_stored(item, True)
+        if not self.writer:
+            return self._drop_stored(item, self._is_stored(item, item_hash))
+        return self.writer.submit(self._is_stored, item, item_hash).addCallback(
+            lambda is_stored: self._drop_stored(item, is_stored)
+        )
+
+    def _drop_stored(self, item, is_stored):
+        """Drop an item confirmed to be in the database, pass on a false positive"""
+        if not is_stored:
+            self._inc_stat("dedup/false_positives")
+            return item
+        if self.mode == "changes":
+            self._inc_stat("dedup/unchanged")
+            raise DropItem(f"Item unchanged since last run: {item.get('url') or item.get('contentId')}")
+        self._inc_stat("dedup/db_duplicates")
+        raise DropItem(f"Item already in database: {item.get('url') or item.get('contentId')}")
+
+    @staticmethod
+    def _is_stored(item, item_hash=None):
+        """Database lookup confirming a probable hit of the hash index"""
         url = item.get("url")
         content_id = item.get("contentId")
-        
-        # Check by URL
-        if url and url in self.seen_urls:
-            spider.logger.debug(f"Duplicate item skipped (by URL): {url}")
-            return None
-        
-        # Check by contentId (for flyers and offers)
-        if content_id and content_id in self.seen_content_ids:
-            spider.logger.debug(f"Duplicate item skipped (by contentId): {content_id}")
-            return None
+        with get_db_session() as session:
+            for model in (Flyer, Offer):
+                conditions = []
+                if url:
+                    conditions.append(model.url == url)
+                if content_id:
+                    conditions.append(model.contentId == content_id)
+                query = session.query(model.id).filter(or_(*conditions))
+                if item_hash:
+                    query = query.filter(model.contentHash == item_hash)
+                if query.first():
+                    return True
+        return False
 
-        # Add to cache
-        if url:
-            self.seen_urls.add(url)
-        if content_id:
-            self.seen_content_ids.add(content_id)
 
-        return item
+class LRUCache(OrderedDict):
+    """Dict holding at most ``maxsize`` entries, dropping the least recently used one
+
+    Lookups reorder the entries, so every access holds the cache's lock: the
+    cache is shared by the DatabaseWriter threads.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self:
+                return default
+            self.move_to_end(key)
+            return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            if len(self) > self.maxsize:
+                self.popitem(last=False)
+
+    def pop(self, key, *default):
+        with self.lock:
+            return super().pop(key, *default)
 
 
 class DatabasePipeline:
-    """Save items to database"""
+    """Save items to database
 
-    def __init__(self):
+    Three write modes are supported (``DATABASE_WRITE_MODE`` setting):
+
+    * ``row``: one transaction per item, looked up and saved through the ORM
+    * ``batch``: items are buffered per type and flushed with
+      ``INSERT ... ON CONFLICT DO UPDATE`` once ``DATABASE_BATCH_SIZE`` items
+      are pending or ``DATABASE_BATCH_INTERVAL`` seconds have passed
+    * ``backfill``: items are spooled to CSV files and loaded with ``COPY``
+      plus one set-based merge per table when the spider closes (for first
+      loads and re-scrapes into an empty database, see database/backfill.py)
+
+    When created through Scrapy, all database calls run on the shared
+    DatabaseWriter thread pool and process_item returns a Deferred.
+
+    Retailer IDs, flyer IDs by contentId and the IDs of the most recently
+    updated products (``PRODUCT_CACHE_SIZE``) are loaded when the spider
+    opens, so items rarely need a lookup. Missing retailers and products are
+    created for a whole batch at once. Offers stored before their flyer are
+    linked to it when the spider closes.
+    """
+
+    # Flush order matters: flyers/offers/stores reference retailers, offers reference flyers
+    ITEM_TYPES = ("retailers", "flyers", "offers", "stores")
+
+    def __init__(self, write_mode: str = "row", batch_size: int = 500, batch_interval: float = 5.0, writer: DatabaseWriter = None,
+                 price_history: bool = True, spool_dir: str = None, product_cache_size: int = 100_000):
+        self.writer = writer
+        self.price_history = price_history
+        self.spool_dir = spool_dir
+        self.spool = None
+        self.lock = writer.lock if writer else threading.Lock()
+        self.write_mode = write_mode
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.buffers: Dict[str, List[Dict[str, Any]]] = {item_type: [] for item_type in self.ITEM_TYPES}
+        self.buffered_count = 0
+        self.last_flush = time.monotonic()
+        self.flush_loop = None
+        # Shared by the writer threads: the dicts are only read and written one key at a
+        # time (atomic operations), LRUCache reorders itself and takes its own lock
         self.retailer_cache: Dict[str, str] = {}  # name -> id
-        self.product_cache: Dict[str, str] = {}  # (name, brand) -> id
+        self.product_cache = LRUCache(product_cache_size)  # (name, brand) -> id
+        self.flyer_cache: Dict[str, str] = {}  # contentId -> id
+        self.unlinked_parents = set()  # parentContentIds of offers stored without their flyer
+        self.written_flyers = set()  # contentIds of flyers written by this spider
+        self.saved_retailers = set()  # names saved by this spider in row mode
+        self.transaction = threading.local()  # IDs cached by the open transaction
         self.saved_items_count = 0
         self.updated_items_count = 0
         self.created_items_count = 0
         self.failed_items_count = 0
+        self.price_changes_count = 0
         self.items_by_type: Dict[str, int] = {
             "retailers": 0,
             "flyers": 0,
             "offers": 0,
             "stores": 0,
         }
-        self.log_id = None
         self.start_time = None
 
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            write_mode=settings.get("DATABASE_WRITE_MODE", "row"),
+            batch_size=settings.getint("DATABASE_BATCH_SIZE", 500),
+            batch_interval=settings.getfloat("DATABASE_BATCH_INTERVAL", 5.0),
+            writer=DatabaseWriter.from_crawler(crawler),
+            price_history=settings.getbool("PRICE_HISTORY_ENABLED", True),
+            spool_dir=settings.get("BACKFILL_SPOOL_DIR"),
+            product_cache_size=settings.getint("PRODUCT_CACHE_SIZE", 100_000),
+        )
+
+    def _run(self, func, *args):
+        """Run a blocking call on the writer threads (inline without a writer)"""
+        if self.writer:
+            return self.writer.submit(func, *args)
+        return func(*args)
+
     def open_spider(self, spider):
-        """Open database session"""
-        self.Session = get_db_session()
+        """Log spider start, prepare the price history partitions and preload the ID caches"""
         self.start_time = datetime.now(UTC)
         self.logger = spider.logger  # Store logger for use in private methods
         spider.logger.info("=" * 80)
         spider.logger.info(f"🚀 DatabasePipeline: Spider '{spider.name}' started")
         spider.logger.info(f"⏰ Start time: {self.start_time.strftime('%Y-%m-%d %H:%M:%S UTC')}")
+        spider.logger.info(f"🧱 Write mode: {self.write_mode}" + (f" (batch size: {self.batch_size}, interval: {self.batch_interval}s)" if self.write_mode == "batch" else ""))
         spider.logger.info("=" * 80)
-        
-        # Find running log entry
+
+        if self.writer:
+            self.writer.open()
+
+        if self.write_mode == "backfill":
+            self.spool = Spool(self.spool_dir, prefix=f"backfill-{spider.name}")
+
+        if self.write_mode == "batch" and self.batch_interval > 0:
+            # Time based flush so a slow trickle of items doesn't sit in memory
+            self.flush_loop = task.LoopingCall(self._flush_if_due, spider)
+            self.flush_loop.start(self.batch_interval, now=False)
+
+        opening = []
+        if self.price_history:
+            opening.append(self._run(self._prepare_price_history, spider))
+        if self.write_mode != "backfill":
+            opening.append(self._run(self._warm_caches, spider))
+        if self.writer:
+            return defer.DeferredList(opening)
+
+    def _prepare_price_history(self, spider):
+        """Create this and next month's OfferPriceHistory partitions before any batch"""
+        try:
+            prepare_partitions(get_db_session)
+        except Exception as e:
+            # Batches then create their partition themselves
+            spider.logger.warning(f"⚠️  Could not prepare price history partitions: {e}")
+
+    def _warm_caches(self, spider):
+        """Load retailer, flyer and recent product IDs with one streamed query each"""
+        started = time.monotonic()
         try:
             with get_db_session() as session:
-                log = session.query(ScrapingLog).filter(
-                    ScrapingLog.status == "running"
-                ).order_by(ScrapingLog.startedAt.desc()).first()
-                if log:
-                    self.log_id = log.id
-                    spider.logger.info(f"📝 Connected to ScrapingLog ID: {self.log_id}")
+                for retailer_id, name in session.execute(
+                    select(Retailer.id, Retailer.name), execution_options={"yield_per": 10_000}
+                ):
+                    self.retailer_cache[name] = retailer_id
+
+                for content_id, flyer_id in session.execute(
+                    select(Flyer.contentId, Flyer.id).where(Flyer.contentId.isnot(None)),
+                    execution_options={"yield_per": 10_000},
+                ):
+                    self.flyer_cache[content_id] = flyer_id
+
+                if self.product_cache.maxsize > 0:
+                    recent = (
+                        select(Product.id, Product.name, Product.brand, Product.updatedAt)
+                        .order_by(Product.updatedAt.desc())
+                        .limit(self.product_cache.maxsize)
+                        .subquery()
+                    )
+                    # Oldest first, so the most recently updated products are evicted last
+                    for product_id, name, brand, _ in session.execute(
+                        select(recent).order_by(recent.c.updatedAt), execution_options={"yield_per": 10_000}
+                    ):
+                        self.product_cache[(name, brand)] = product_id
         except Exception as e:
-            spider.logger.warning(f"⚠️  Could not find running log entry: {e}")
+            spider.logger.warning(f"⚠️  Could not preload retailer/product IDs: {e}")
+            return
+        spider.logger.info(
+            f"🗂️  Preloaded {len(self.retailer_cache)} retailers, {len(self.flyer_cache)} flyers "
+            f"and {len(self.product_cache)} products "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+
+    @staticmethod
+    def _get_item_type(item):
+        """Guess item type from its fields"""
+        if "name" in item:  # RetailerItem
+            return "retailers"
+        elif "title" in item:  # FlyerItem
+            return "flyers"
+        elif "productName" in item:  # OfferItem
+            return "offers"
+        elif "address" in item and "retailerId" in item:  # StoreItem
+            return "stores"
+        return None
 
     def process_item(self, item, spider):
-        """Save item to database"""
+        """Save item to database (buffered in batch mode, spooled in backfill mode)"""
+        if self.write_mode == "backfill":
+            item_type = self._get_item_type(item)
+            row = self._backfill_row(item_type, item) if item_type else None
+            if row is not None:
+                self.spool.add(item_type, row)
+            return item
+        if self.write_mode == "batch":
+            item_type = self._get_item_type(item)
+            if item_type:
+                self.buffers[item_type].append(item)
+                self.buffered_count += 1
+                if self.buffered_count >= self.batch_size:
+                    # The item that fills the batch waits for the write (backpressure)
+                    result = self._run(self._write_buffers, self._take_buffers(), spider)
+                    if isinstance(result, defer.Deferred):
+                        return result.addCallback(lambda _: item)
+                return item
+        return self._run(self._process_item_row, item, spider)
+
+    def _process_item_row(self, item, spider):
+        """Save a single item in its own transaction"""
         item_type = None
         item_created = False
         item_updated = False
-        
+        self.transaction.created = []
+
         try:
             with get_db_session() as session:
                 if "name" in item:  # RetailerItem
@@ -172,6 +476,7 @@ class DatabasePipeline:
                     result = self._save_offer(item, session)
                     item_created = result.get("created", False)
                     item_updated = result.get("updated", False)
+                    self._record_prices([item], session)
                 elif "address" in item and "retailerId" in item:  # StoreItem
                     item_type = "stores"
                     try:
@@ -184,35 +489,33 @@ class DatabasePipeline:
                         raise  # Re-raise to be caught by outer exception handler
 
                 # Note: commit is handled by get_db_session context manager
-                self.saved_items_count += 1
-                
-                if item_created:
-                    self.created_items_count += 1
-                if item_updated:
-                    self.updated_items_count += 1
-                
-                if item_type:
-                    self.items_by_type[item_type] = self.items_by_type.get(item_type, 0) + 1
+                with self.lock:
+                    self.saved_items_count += 1
+                    
+                    if item_created:
+                        self.created_items_count += 1
+                    if item_updated:
+                        self.updated_items_count += 1
+                    
+                    if item_type:
+                        self.items_by_type[item_type] = self.items_by_type.get(item_type, 0) + 1
                 
                 # Log every item with details
                 item_name = item.get('url') or item.get('name') or item.get('title') or item.get('productName') or 'unknown'
                 status_icon = "✨" if item_created else "🔄" if item_updated else "💾"
                 spider.logger.info(f"{status_icon} [{item_type or 'unknown'}] {status_icon} {item_name[:80]}")
-                
-                # Update ScrapingLog every 10 items to avoid too many database writes
-                if self.log_id and self.saved_items_count % 10 == 0:
-                    self._update_scraping_log(spider)
-                    elapsed = (datetime.now(UTC) - self.start_time).total_seconds() if self.start_time else 0
-                    rate = self.saved_items_count / elapsed if elapsed > 0 else 0
-                    spider.logger.info(f"📈 Progress: {self.saved_items_count} items saved | {rate:.2f} items/sec | Created: {self.created_items_count} | Updated: {self.updated_items_count}")
-                    
+
         except IntegrityError as e:
-            self.failed_items_count += 1
+            self._forget_created_ids()
+            with self.lock:
+                self.failed_items_count += 1
             item_name = item.get('url') or item.get('name') or item.get('title') or 'unknown'
             spider.logger.warning(f"⚠️  Duplicate/Integrity error for {item_name}: {str(e)[:100]}")
             # Note: rollback is handled by get_db_session context manager
         except Exception as e:
-            self.failed_items_count += 1
+            self._forget_created_ids()
+            with self.lock:
+                self.failed_items_count += 1
             item_name = item.get('url') or item.get('name') or item.get('title') or 'unknown'
             spider.logger.error(f"❌ Error saving {item_name}: {str(e)[:200]}")
             import traceback
@@ -222,20 +525,419 @@ class DatabasePipeline:
 
         return item
 
-    def _update_scraping_log(self, spider):
-        """Update ScrapingLog with current items count"""
-        if not self.log_id:
+    def _flush_if_due(self, spider):
+        """Flush buffered items if the batch interval has passed"""
+        if self.buffered_count and time.monotonic() - self.last_flush >= self.batch_interval:
+            self._run(self._write_buffers, self._take_buffers(), spider)
+
+    def _take_buffers(self):
+        """Swap out the buffers so new items can be collected while they are written"""
+        self.last_flush = time.monotonic()
+        buffers = self.buffers
+        self.buffers = {item_type: [] for item_type in self.ITEM_TYPES}
+        self.buffered_count = 0
+        return buffers
+
+    def _write_buffers(self, buffers, spider):
+        """Write all buffered items, one batch per item type"""
+        for item_type in self.ITEM_TYPES:
+            if buffers[item_type]:
+                self._flush_batch(item_type, buffers[item_type], spider)
+
+    def _flush_batch(self, item_type: str, items: List[Dict[str, Any]], spider):
+        """Upsert one batch of items, falling back to row mode if the batch fails"""
+        writers = {
+            "retailers": self._write_retailers,
+            "flyers": self._write_flyers,
+            "offers": self._write_offers,
+            "stores": self._write_stores,
+        }
+        started = time.monotonic()
+        self.transaction.created = []
+        try:
+            with get_db_session() as session:
+                results = writers[item_type](items, session)
+        except Exception as e:
+            self._forget_created_ids()
+            spider.logger.warning(f"⚠️  Batch write of {len(items)} {item_type} failed, retrying row by row: {str(e)[:200]}")
+            for item in items:
+                self._process_item_row(item, spider)
+            return
+
+        # One result per written row: rows of the batch with the same key were merged into one
+        written = len(results)
+        created = sum(1 for row in results if row.inserted)
+        updated = written - created
+        with self.lock:
+            self.saved_items_count += written
+            self.created_items_count += created
+            self.updated_items_count += updated
+            self.items_by_type[item_type] = self.items_by_type.get(item_type, 0) + written
+        spider.logger.info(f"💾 [{item_type}] Flushed {written} items (✨ {created} created | 🔄 {updated} updated) in {time.monotonic() - started:.2f}s")
+
+    def _skip_batch_item(self, item, reason: str):
+        """Count and log an item that can't be part of a batch"""
+        with self.lock:
+            self.failed_items_count += 1
+        item_name = item.get('url') or item.get('name') or item.get('title') or 'unknown'
+        self.logger.error(f"❌ Error saving {item_name}: {reason}")
+
+    @staticmethod
+    def _new_row_defaults(now):
+        """Columns that the ORM would fill in for a new row"""
+        return {"id": str(uuid.uuid4()), "createdAt": now, "updatedAt": now, "scrapedAt": now}
+
+    def _cache_created(self, cache, key, value):
+        """Cache the ID of a row created in the open transaction"""
+        cache[key] = value
+        created = getattr(self.transaction, "created", None)
+        if created is not None:
+            created.append((cache, key))
+
+    def _forget_created_ids(self):
+        """Drop IDs of rows created in a transaction that was rolled back"""
+        for cache, key in getattr(self.transaction, "created", None) or ():
+            cache.pop(key, None)
+        self.transaction.created = []
+
+    def _resolve_retailer_ids(self, names: Dict[str, str], session) -> Dict[str, str]:
+        """Map retailer names to IDs, creating missing retailers in one statement
+
+        ``names`` maps retailer name -> category to use if it has to be created.
+        """
+        missing = {name: category for name, category in names.items() if name and name not in self.retailer_cache}
+        if missing:
+            now = datetime.now(UTC)
+            created = upsert_rows(
+                session,
+                Retailer,
+                [{**self._new_row_defaults(now), "name": name, "category": category, "logoUrl": None} for name, category in missing.items()],
+                index_elements=["name"],
+                returning=["id", "name"],
+            )
+            for row in created:
+                self._cache_created(self.retailer_cache, row.name, row.id)
+            # Created by another spider since the cache was loaded
+            existing = [name for name in missing if name not in self.retailer_cache]
+            if existing:
+                for retailer_id, name in session.query(Retailer.id, Retailer.name).filter(Retailer.name.in_(existing)):
+                    self.retailer_cache[name] = retailer_id
+        return {name: self.retailer_cache.get(name) for name in names}
+
+    def _cache_flyers(self, flyers):
+        """Remember the IDs of written flyers (rows with ``id`` and ``contentId``)"""
+        for flyer in flyers:
+            if flyer.contentId:
+                self._cache_created(self.flyer_cache, flyer.contentId, flyer.id)
+                with self.lock:
+                    self.written_flyers.add(flyer.contentId)
+
+    def _resolve_flyer_ids(self, content_ids, session) -> Dict[str, str]:
+        """Map flyer contentIds to IDs, looking up the ones not cached in one query"""
+        missing = [content_id for content_id in content_ids if content_id and content_id not in self.flyer_cache]
+        if missing:
+            for content_id, flyer_id in session.query(Flyer.contentId, Flyer.id).filter(Flyer.contentId.in_(missing)):
+                self.flyer_cache[content_id] = flyer_id
+            # Their offers are linked when the spider closes, if the flyer shows up by then
+            with self.lock:
+                self.unlinked_parents.update(content_id for content_id in missing if content_id not in self.flyer_cache)
+        return {content_id: self.flyer_cache.get(content_id) for content_id in content_ids}
+
+    def _link_offers(self, spider):
+        """Set flyerId on offers that were stored before their flyer"""
+        with self.lock:
+            content_ids = self.unlinked_parents | self.written_flyers
+        if not content_ids:
             return
-            
         try:
             with get_db_session() as session:
-                log = session.query(ScrapingLog).filter(ScrapingLog.id == self.log_id).first()
-                if log:
-                    log.itemsScraped = self.saved_items_count
-                    session.commit()
-                    spider.logger.debug(f"Updated ScrapingLog: {self.saved_items_count} items scraped")
+                linked = link_offers_to_flyers(session, content_ids)
         except Exception as e:
-            spider.logger.warning(f"Failed to update ScrapingLog: {e}")
+            spider.logger.warning(f"⚠️  Could not link offers to their flyers: {e}")
+            return
+        if linked:
+            spider.logger.info(f"🔗 Linked {linked} offers to flyers stored after them")
+
+    @staticmethod
+    def _product_key(item: Dict[str, Any]):
+        """(name, brand) identifying the product of an offer, None without a name"""
+        name = (item.get("productName") or "").strip()
+        return (name, item.get("brand")) if name else None
+
+    def _resolve_product_ids(self, items: List[Dict[str, Any]], session) -> Dict[Any, str]:
+        """Map the products of offers to IDs, creating missing products in one statement"""
+        resolved = {}
+        missing = {}
+        for item in items:
+            key = self._product_key(item)
+            if key is None or key in resolved or key in missing:
+                continue
+            product_id = self.product_cache.get(key)
+            if product_id:
+                resolved[key] = product_id
+            else:
+                missing[key] = item
+        if not missing:
+            return resolved
+
+        now = datetime.now(UTC)
+        created = upsert_rows(
+            session,
+            Product,
+            [
+                {
+                    **self._new_row_defaults(now),
+                    "name": name,
+                    "brand": brand,
+                    "category": item.get("category"),
+                    "description": item.get("description"),
+                    "imageUrl": normalize_url(item["imageUrl"]) if item.get("imageUrl") else None,
+                }
+                for (name, brand), item in missing.items()
+            ],
+            index_elements=["name", "brand"],
+            returning=["id", "name", "brand"],
+        )
+        for row in created:
+            key = (row.name, row.brand)
+            resolved[key] = row.id
+            self._cache_created(self.product_cache, key, row.id)
+
+        # Products that already existed (evicted from or never in the cache)
+        existing = [key for key in missing if key not in resolved]
+        if existing:
+            rows = session.query(Product.id, Product.name, Product.brand).filter(
+                Product.name.in_({name for name, _ in existing})
+            )
+            for product_id, name, brand in rows:
+                key = (name, brand)
+                if key in missing and key not in resolved:
+                    resolved[key] = product_id
+                    self.product_cache[key] = product_id
+        return resolved
+
+    def _write_retailers(self, items: List[Dict[str, Any]], session):
+        """Upsert a batch of retailers"""
+        now = datetime.now(UTC)
+        rows = [
+            {
+                **self._new_row_defaults(now),
+                "name": item["name"],
+                "category": item.get("category") or "General",
+                "logoUrl": item.get("logoUrl"),
+            }
+            for item in items
+        ]
+        results = upsert_rows(
+            session, Retailer, rows,
+            index_elements=["name"],
+            update_columns=["updatedAt"],
+            coalesce_columns=["logoUrl"],
+            returning=["id", "name"],
+        )
+        for row in results:
+            self.retailer_cache[row.name] = row.id
+        return results
+
+    def _write_flyers(self, items: List[Dict[str, Any]], session):
+        """Upsert a batch of flyers"""
+        retailer_ids = self._resolve_retailer_ids({item.get("retailerId"): "General" for item in items}, session)
+        now = datetime.now(UTC)
+        rows = []
+        for item in items:
+            retailer_id = retailer_ids.get(item.get("retailerId"))
+            if not retailer_id:
+                self._skip_batch_item(item, "Retailer ID is required for flyer")
+                continue
+            rows.append({
+                **self._new_row_defaults(now),
+                "retailerId": retailer_id,
+                "title": item["title"],
+                "pages": item["pages"],
+                "validFrom": item["validFrom"],
+                "validUntil": item["validUntil"],
+                "url": normalize_url(item["url"]),
+                "pdfUrl": normalize_url(item["pdfUrl"]) if item.get("pdfUrl") else None,
+                "thumbnailUrl": normalize_url(item["thumbnailUrl"]) if item.get("thumbnailUrl") else None,
+                "contentId": item.get("contentId"),
+                "publishedFrom": item.get("publishedFrom"),
+                "publishedUntil": item.get("publishedUntil"),
+                "contentHash": item.get("contentHash"),
+            })
+        results = upsert_rows(
+            session, Flyer, rows,
+            index_elements=["url"],
+            update_columns=["title", "pages", "validFrom", "validUntil", "updatedAt", "scrapedAt"],
+            coalesce_columns=["pdfUrl", "thumbnailUrl", "contentId", "publishedFrom", "publishedUntil", "contentHash"],
+            returning=["id", "contentId"],
+        )
+        self._cache_flyers(results)
+        return results
+
+    def _write_offers(self, items: List[Dict[str, Any]], session):
+        """Upsert a batch of offers"""
+        retailer_ids = self._resolve_retailer_ids(
+            {item.get("retailerId"): item.get("category") or "General" for item in items}, session
+        )
+
+        flyer_ids = self._resolve_flyer_ids({item.get("parentContentId") for item in items}, session)
+
+        product_ids = self._resolve_product_ids(items, session)
+
+        now = datetime.now(UTC)
+        rows = []
+        written = []
+        for item in items:
+            retailer_id = retailer_ids.get(item.get("retailerId"))
+            if not retailer_id:
+                self._skip_batch_item(item, "Retailer ID is required for offer")
+                continue
+            written.append(item)
+            rows.append({
+                **self._new_row_defaults(now),
+                "flyerId": flyer_ids.get(item.get("parentContentId")) or item.get("flyerId"),
+                "productId": product_ids.get(self._product_key(item)),
+                "retailerId": retailer_id,
+                "productName": item["productName"],
+                "brand": item.get("brand"),
+                "category": item.get("category"),
+                "currentPrice": item["currentPrice"],
+                "oldPrice": item.get("oldPrice"),
+                "discount": item.get("discount"),
+                "discountPercentage": item.get("discountPercentage"),
+                "unitPrice": item.get("unitPrice"),
+                "url": normalize_url(item["url"]),
+                "imageUrl": normalize_url(item["imageUrl"]) if item.get("imageUrl") else None,
+                "validUntil": item.get("validUntil"),
+                "validFrom": item.get("validFrom"),
+                "description": item.get("description"),
+                "contentId": item.get("contentId"),
+                "parentContentId": item.get("parentContentId"),
+                "pageNumber": item.get("pageNumber"),
+                "publisherId": item.get("publisherId"),
+                "priceFormatted": item.get("priceFormatted"),
+                "oldPriceFormatted": item.get("oldPriceFormatted"),
+                "priceFrequency": item.get("priceFrequency"),
+                "priceConditions": item.get("priceConditions"),
+                "imageAlt": item.get("imageAlt"),
+                "imageTitle": item.get("imageTitle"),
+                "contentHash": item.get("contentHash"),
+            })
+        results = upsert_rows(
+            session, Offer, rows,
+            index_elements=["url"],
+            update_columns=[
+                "productName", "currentPrice", "oldPrice", "discount", "discountPercentage",
+                "updatedAt", "scrapedAt",
+            ],
+            coalesce_columns=[
+                "productId", "description", "validFrom", "contentId", "parentContentId", "pageNumber",
+                "publisherId", "priceFormatted", "oldPriceFormatted", "priceFrequency", "priceConditions",
+                "imageAlt", "imageTitle", "contentHash",
+            ],
+        )
+        self._record_prices(written, session)
+        return results
+
+    def _write_stores(self, items: List[Dict[str, Any]], session):
+        """Upsert a batch of stores"""
+        retailer_ids = self._resolve_retailer_ids({item.get("retailerId"): "General" for item in items}, session)
+        now = datetime.now(UTC)
+        rows = []
+        for item in items:
+            retailer_id = retailer_ids.get(item.get("retailerId"))
+            address = (item.get("address") or "").strip()
+            if not retailer_id or not address:
+                self._skip_batch_item(item, "Retailer ID and address are required for store")
+                continue
+            rows.append({
+                **self._new_row_defaults(now),
+                "retailerId": retailer_id,
+                "address": address,
+                "city": item.get("city", ""),
+                "postalCode": item.get("postalCode", ""),
+                "latitude": item.get("latitude"),
+                "longitude": item.get("longitude"),
+                "phone": item.get("phone"),
+                "openingHours": item.get("openingHours"),
+            })
+        results = upsert_rows(
+            session, Store, rows,
+            index_elements=["retailerId", "address"],
+            update_columns=["city", "postalCode", "phone", "openingHours", "updatedAt", "scrapedAt"],
+            # Coordinates may be backfilled by geocoding after the store was written
+            coalesce_columns=["latitude", "longitude"],
+        )
+        return results
+
+    # Fields without which an item can't be merged, per item type
+    BACKFILL_REQUIRED = {
+        "retailers": ("name",),
+        "flyers": ("retailerId", "title", "pages", "validFrom", "validUntil", "url"),
+        "offers": ("retailerId", "productName", "currentPrice", "url"),
+        "stores": ("retailerId", "address"),
+    }
+
+    def _backfill_row(self, item_type: str, item: Dict[str, Any]):
+        """Staging row for an item (see database/backfill.py), None if it can't be loaded"""
+        missing = [field for field in self.BACKFILL_REQUIRED[item_type] if item.get(field) in (None, "")]
+        if missing or (item_type == "stores" and not item["address"].strip()):
+            self._skip_batch_item(item, f"Missing {', '.join(missing) or 'address'} for {item_type[:-1]}")
+            return None
+        row = dict(item)
+        if item_type != "retailers":
+            row["retailerName"] = item["retailerId"]
+        for field in ("url", "pdfUrl", "thumbnailUrl", "imageUrl"):
+            if row.get(field):
+                row[field] = normalize_url(row[field])
+        # Offers merged before their flyer are linked like in the other modes
+        if item_type == "offers" and item.get("parentContentId"):
+            self.unlinked_parents.add(item["parentContentId"])
+        elif item_type == "flyers" and item.get("contentId"):
+            self.written_flyers.add(item["contentId"])
+        return row
+
+    def _load_backfill(self, spider):
+        """COPY the spooled items into staging tables and merge them in one transaction"""
+        paths = self.spool.paths()
+        spooled = sum(self.spool.counts.values())
+        if not paths:
+            return
+        spider.logger.info(f"📥 Loading {spooled} spooled items with COPY")
+        started = time.monotonic()
+        try:
+            with get_db_session() as session:
+                results = load_spool(session, paths, price_history=self.price_history)
+        except Exception as e:
+            with self.lock:
+                self.failed_items_count += spooled
+            spider.logger.error(f"❌ Backfill load failed, spool files kept in {self.spool.directory}: {str(e)[:200]}")
+            return
+
+        self.spool.remove()
+        with self.lock:
+            for item_type in self.ITEM_TYPES:
+                created, updated = results.get(item_type, (0, 0))
+                self.created_items_count += created
+                self.updated_items_count += updated
+                self.saved_items_count += created + updated
+                self.items_by_type[item_type] = self.items_by_type.get(item_type, 0) + created + updated
+            self.price_changes_count += results["price_changes"]
+        spider.logger.info(f"💾 Backfill merged {self.saved_items_count} items (✨ {self.created_items_count} created | 🔄 {self.updated_items_count} updated) in {time.monotonic() - started:.2f}s")
+
+    def _record_prices(self, items: List[Dict[str, Any]], session):
+        """Append changed offer prices to OfferPriceHistory in the same transaction"""
+        if not self.price_history:
+            return
+        observations = {
+            item["contentId"]: (item["currentPrice"], item.get("oldPrice"))
+            for item in items
+            if item.get("contentId") and item.get("currentPrice") is not None
+        }
+        recorded = record_price_changes(session, observations)
+        if recorded:
+            with self.lock:
+                self.price_changes_count += recorded
 
     def _save_retailer(self, item: Dict[str, Any], session):
         """Save retailer to database - MUST be called before saving stores"""
@@ -243,9 +945,9 @@ class DatabasePipeline:
         created = False
         updated = False
         
-        # Check cache first
-        if name in self.retailer_cache:
-            retailer_id = self.retailer_cache[name]
+        # Check cache first (preloaded IDs still get their first update of this crawl)
+        retailer_id = self.retailer_cache.get(name) if name in self.saved_retailers else None
+        if retailer_id:
             self.logger.debug(f"Retailer '{name}' found in cache (ID: {retailer_id})")
             return {"id": retailer_id, "created": False, "updated": False}
 
@@ -269,7 +971,11 @@ class DatabasePipeline:
             self.logger.debug(f"Retailer '{name}' already exists (ID: {retailer.id})")
         
         # Cache retailer ID - IMPORTANT: cache after flush to ensure ID is available
-        self.retailer_cache[name] = retailer.id
+        if created:
+            self._cache_created(self.retailer_cache, name, retailer.id)
+        else:
+            self.retailer_cache[name] = retailer.id
+        self.saved_retailers.add(name)
         return {"id": retailer.id, "created": created, "updated": updated}
 
     def _save_flyer(self, item: Dict[str, Any], session):
@@ -298,26 +1004,15 @@ class DatabasePipeline:
                 flyer.publishedFrom = item["publishedFrom"]
             if item.get("publishedUntil"):
                 flyer.publishedUntil = item["publishedUntil"]
+            if item.get("contentHash"):
+                flyer.contentHash = item["contentHash"]
             flyer.scrapedAt = datetime.now(UTC)
+            self._cache_flyers([flyer])
             return {"id": flyer.id, "created": False, "updated": True}
 
-        # Get retailer ID
-        retailer_id = item.get("retailerId")
-        if isinstance(retailer_id, str) and retailer_id not in self.retailer_cache:
-            # Try to find retailer by name
-            retailer = session.query(Retailer).filter(Retailer.name == retailer_id).first()
-            if retailer:
-                self.retailer_cache[retailer_id] = retailer.id
-                retailer_id = retailer.id
-            else:
-                # Create retailer if not exists
-                retailer = Retailer(name=retailer_id, category="General")
-                session.add(retailer)
-                session.flush()
-                self.retailer_cache[retailer_id] = retailer.id
-                retailer_id = retailer.id
-        elif retailer_id in self.retailer_cache:
-            retailer_id = self.retailer_cache[retailer_id]
+        # Get retailer ID (the retailer is created if it doesn't exist)
+        name = item.get("retailerId")
+        retailer_id = self._resolve_retailer_ids({name: "General"}, session).get(name)
 
         if not retailer_id:
             raise ValueError("Retailer ID is required for flyer")
@@ -338,9 +1033,11 @@ class DatabasePipeline:
             contentId=item.get("contentId"),
             publishedFrom=item.get("publishedFrom"),
             publishedUntil=item.get("publishedUntil"),
+            contentHash=item.get("contentHash"),
         )
         session.add(flyer)
         session.flush()
+        self._cache_flyers([flyer])
         return {"id": flyer.id, "created": True, "updated": False}
 
     def _save_offer(self, item: Dict[str, Any], session):
@@ -385,6 +1082,8 @@ class DatabasePipeline:
                 offer.imageAlt = item["imageAlt"]
             if item.get("imageTitle"):
                 offer.imageTitle = item["imageTitle"]
+            if item.get("contentHash"):
+                offer.contentHash = item["contentHash"]
             # Update product relationship
             product_id = self._get_or_create_product(item, session)
             if product_id:
@@ -392,21 +1091,9 @@ class DatabasePipeline:
             offer.scrapedAt = datetime.now(UTC)
             return {"id": offer.id, "created": False, "updated": True}
 
-        # Get retailer ID
-        retailer_id = item.get("retailerId")
-        if isinstance(retailer_id, str) and retailer_id not in self.retailer_cache:
-            retailer = session.query(Retailer).filter(Retailer.name == retailer_id).first()
-            if retailer:
-                self.retailer_cache[retailer_id] = retailer.id
-                retailer_id = retailer.id
-            else:
-                retailer = Retailer(name=retailer_id, category=item.get("category", "General"))
-                session.add(retailer)
-                session.flush()
-                self.retailer_cache[retailer_id] = retailer.id
-                retailer_id = retailer.id
-        elif retailer_id in self.retailer_cache:
-            retailer_id = self.retailer_cache[retailer_id]
+        # Get retailer ID (the retailer is created if it doesn't exist)
+        name = item.get("retailerId")
+        retailer_id = self._resolve_retailer_ids({name: item.get("category") or "General"}, session).get(name)
 
         if not retailer_id:
             raise ValueError("Retailer ID is required for offer")
@@ -415,10 +1102,7 @@ class DatabasePipeline:
         flyer_id = item.get("flyerId")
         parent_content_id = item.get("parentContentId")
         if parent_content_id:
-            # Try to find flyer by contentId
-            flyer = session.query(Flyer).filter(Flyer.contentId == parent_content_id).first()
-            if flyer:
-                flyer_id = flyer.id
+            flyer_id = self._resolve_flyer_ids({parent_content_id}, session)[parent_content_id] or flyer_id
         elif flyer_id:
             flyer = session.query(Flyer).filter(Flyer.id == flyer_id).first()
             if not flyer:
@@ -455,6 +1139,7 @@ class DatabasePipeline:
             priceConditions=item.get("priceConditions"),
             imageAlt=item.get("imageAlt"),
             imageTitle=item.get("imageTitle"),
+            contentHash=item.get("contentHash"),
         )
         session.add(offer)
         session.flush()
@@ -462,40 +1147,10 @@ class DatabasePipeline:
 
     def _get_or_create_product(self, item: Dict[str, Any], session) -> str:
         """Get or create Product from offer data"""
-        product_name = item.get("productName", "").strip()
-        if not product_name:
+        key = self._product_key(item)
+        if key is None:
             return None
-        
-        brand = item.get("brand")
-        cache_key = f"{product_name}|{brand or ''}"
-        
-        # Check cache first
-        if cache_key in self.product_cache:
-            return self.product_cache[cache_key]
-        
-        # Try to find existing product by name and brand
-        query = session.query(Product).filter(Product.name == product_name)
-        if brand:
-            query = query.filter(Product.brand == brand)
-        else:
-            query = query.filter(Product.brand.is_(None))
-        
-        product = query.first()
-        
-        if not product:
-            # Create new product
-            product = Product(
-                name=product_name,
-                brand=brand,
-                category=item.get("category"),
-                description=item.get("description"),
-                imageUrl=normalize_url(item["imageUrl"]) if item.get("imageUrl") else None,
-            )
-            session.add(product)
-            session.flush()
-        
-        self.product_cache[cache_key] = product.id
-        return product.id
+        return self._resolve_product_ids([item], session).get(key)
 
     def _save_store(self, item: Dict[str, Any], session):
         """Save store to database - REQUIRES retailer to be saved first"""
@@ -506,37 +1161,13 @@ class DatabasePipeline:
             self.logger.warning(f"Store item missing required fields: retailerId={retailer_id}, address={address}")
             raise ValueError("Retailer ID and address are required for store")
         
-        # Convert retailer name to ID if needed
-        # IMPORTANT: Check cache first (retailers should be saved before stores)
-        if isinstance(retailer_id, str) and retailer_id not in self.retailer_cache:
-            # Retailer not in cache - try to find it in database
-            retailer = session.query(Retailer).filter(Retailer.name == retailer_id).first()
-            if retailer:
-                # Found in database - add to cache
-                self.retailer_cache[retailer_id] = retailer.id
-                retailer_id = retailer.id
-                self.logger.debug(f"Found retailer '{retailer_id}' in database (not in cache)")
-            else:
-                # Retailer not found - create it as fallback (shouldn't happen if order is correct)
-                self.logger.warning(f"⚠️  Retailer '{retailer_id}' not found in cache or database, creating it as fallback...")
-                try:
-                    new_retailer = Retailer(
-                        name=retailer_id,
-                        category="General",
-                    )
-                    session.add(new_retailer)
-                    session.flush()  # Flush to get ID
-                    self.retailer_cache[retailer_id] = new_retailer.id
-                    retailer_id = new_retailer.id
-                    self.logger.info(f"✨ Created retailer '{retailer_id}' as fallback for store")
-                except Exception as e:
-                    self.logger.error(f"❌ Failed to create retailer '{retailer_id}': {e}")
-                    raise ValueError(f"Retailer '{retailer_id}' not found and could not be created: {e}")
-        elif retailer_id in self.retailer_cache:
-            # Retailer in cache - use cached ID
-            retailer_id = self.retailer_cache[retailer_id]
-            self.logger.debug(f"Using cached retailer ID for '{item.get('retailerId')}': {retailer_id}")
-        
+        # Convert retailer name to ID (retailers should be saved before stores,
+        # a missing one is created as fallback)
+        name = retailer_id
+        retailer_id = self._resolve_retailer_ids({name: "General"}, session).get(name)
+        if not retailer_id:
+            raise ValueError(f"Retailer '{name}' not found and could not be created")
+
         # Check if store exists (unique constraint on retailerId + address)
         store = session.query(Store).filter(
             Store.retailerId == retailer_id,
@@ -547,8 +1178,11 @@ class DatabasePipeline:
             # Update existing store
             store.city = item.get("city", store.city)
             store.postalCode = item.get("postalCode", store.postalCode)
-            store.latitude = item.get("latitude")
-            store.longitude = item.get("longitude")
+            # Keep backfilled coordinates when the item has none
+            if item.get("latitude") is not None:
+                store.latitude = item.get("latitude")
+            if item.get("longitude") is not None:
+                store.longitude = item.get("longitude")
             store.phone = item.get("phone")
             store.openingHours = item.get("openingHours")
             store.scrapedAt = datetime.now(UTC)
@@ -570,7 +1204,21 @@ class DatabasePipeline:
         return {"id": store.id, "created": True, "updated": False}
 
     def close_spider(self, spider):
-        """Close database session and log final statistics"""
+        """Flush pending items, drain the writer and log final statistics"""
+        if self.flush_loop and self.flush_loop.running:
+            self.flush_loop.stop()
+        if self.buffered_count:
+            self._run(self._write_buffers, self._take_buffers(), spider)
+        if self.spool:
+            self._run(self._load_backfill, spider)
+        self._run(self._link_offers, spider)
+
+        if self.writer:
+            return self.writer.close().addCallback(lambda _: self._log_final_stats(spider))
+        self._log_final_stats(spider)
+
+    def _log_final_stats(self, spider):
+        """Log final statistics"""
         end_time = datetime.now(UTC)
         duration = (end_time - self.start_time).total_seconds() if self.start_time else 0
         
@@ -585,6 +1233,8 @@ class DatabasePipeline:
         spider.logger.info(f"   🔄 Updated: {self.updated_items_count}")
         spider.logger.info(f"   ❌ Failed: {self.failed_items_count}")
         spider.logger.info(f"   📦 Total saved: {self.saved_items_count}")
+        if self.price_changes_count:
+            spider.logger.info(f"   📈 Price changes recorded: {self.price_changes_count}")
         spider.logger.info("")
         spider.logger.info("📋 Items by type:")
         for item_type, count in self.items_by_type.items():
@@ -595,32 +1245,18 @@ class DatabasePipeline:
             spider.logger.info(f"")
             spider.logger.info(f"⚡ Speed: {rate:.2f} items/second")
         spider.logger.info("=" * 80)
-        
-        self.Session.remove()
-
-    def _update_scraping_log(self, spider):
-        """Update ScrapingLog with current items count"""
-        if not self.log_id:
-            return
-            
-        try:
-            with get_db_session() as session:
-                log = session.query(ScrapingLog).filter(ScrapingLog.id == self.log_id).first()
-                if log:
-                    log.itemsScraped = self.saved_items_count
-                    session.commit()
-                    spider.logger.debug(f"Updated ScrapingLog: {self.saved_items_count} items scraped")
-        except Exception as e:
-            spider.logger.warning(f"Failed to update ScrapingLog: {e}")
 
 
 class LoggingPipeline:
-    """Log scraping progress and update ScrapingLog in real-time"""
+    """Log the start, end and item count of a spider
+
+    Progress of the ScrapingLog entry is written by the ScrapingProgress
+    extension (see progress.py).
+    """
 
     def __init__(self):
         """Initialize logging pipeline"""
         self.items_count = 0
-        self.log_id = None
         self.start_time = None
 
     def open_spider(self, spider):
@@ -631,18 +1267,6 @@ class LoggingPipeline:
         spider.logger.info(f"🕷️  Spider '{spider.name}' started")
         spider.logger.info(f"⏰ Start time: {self.start_time.strftime('%Y-%m-%d %H:%M:%S UTC')}")
         spider.logger.info("=" * 80)
-        
-        # Try to find the latest running log entry
-        try:
-            with get_db_session() as session:
-                log = session.query(ScrapingLog).filter(
-                    ScrapingLog.status == "running"
-                ).order_by(ScrapingLog.startedAt.desc()).first()
-                if log:
-                    self.log_id = log.id
-                    spider.logger.info(f"📝 Connected to ScrapingLog ID: {self.log_id}")
-        except Exception as e:
-            spider.logger.warning(f"⚠️  Could not find running log entry: {e}")
 
     def close_spider(self, spider):
         """Called when spider closes"""
@@ -653,41 +1277,20 @@ class LoggingPipeline:
         spider.logger.info("=" * 80)
         spider.logger.info(f"✅ Spider '{spider.name}' finished")
         spider.logger.info(f"📊 Items processed: {self.items_count}")
+        # spider.state only exists with a JOBDIR: it carries the count over to a resumed spider
+        state = getattr(spider, "state", None)
+        if state is not None:
+            state["items_processed"] = state.get("items_processed", 0) + self.items_count
+            if state["items_processed"] != self.items_count:
+                spider.logger.info(f"📊 Items processed since the crawl started: {state['items_processed']}")
         spider.logger.info(f"⏰ End time: {end_time.strftime('%Y-%m-%d %H:%M:%S UTC')}")
         spider.logger.info(f"⏱️  Duration: {int(duration // 60)}m {int(duration % 60)}s ({duration:.2f}s total)")
         if duration > 0 and self.items_count > 0:
             rate = self.items_count / duration
             spider.logger.info(f"⚡ Processing rate: {rate:.2f} items/second")
         spider.logger.info("=" * 80)
-        
-        # Update log with final count
-        if self.log_id:
-            try:
-                with get_db_session() as session:
-                    log = session.query(ScrapingLog).filter(ScrapingLog.id == self.log_id).first()
-                    if log:
-                        log.itemsScraped = (log.itemsScraped or 0) + self.items_count
-                        session.commit()
-                        spider.logger.info(f"📝 Updated ScrapingLog ID {self.log_id}: {log.itemsScraped} total items")
-            except Exception as e:
-                spider.logger.error(f"❌ Failed to update log entry: {e}")
 
     def process_item(self, item, spider):
-        """Log item processing and update ScrapingLog in real-time"""
+        """Count processed items"""
         self.items_count += 1
-        
-        # Update log every 20 items to avoid too many database writes
-        if self.log_id and self.items_count % 20 == 0:
-            try:
-                with get_db_session() as session:
-                    log = session.query(ScrapingLog).filter(ScrapingLog.id == self.log_id).first()
-                    if log:
-                        log.itemsScraped = (log.itemsScraped or 0) + 20
-                        session.commit()
-                        elapsed = (datetime.now(UTC) - self.start_time).total_seconds() if self.start_time else 0
-                        rate = self.items_count / elapsed if elapsed > 0 else 0
-                        spider.logger.info(f"📈 Progress: {self.items_count} items processed | {rate:.2f} items/sec")
-            except Exception as e:
-                spider.logger.warning(f"⚠️  Failed to update log entry: {e}")
-        
         return item
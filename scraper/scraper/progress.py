@@ -0,0 +1,190 @@
+"""Progress of the running ScrapingLog entry, written by one Scrapy extension
+
+``ScrapingProgress`` counts the items of a spider from the ``item_scraped``
+and ``item_dropped`` signals. Every SCRAPING_PROGRESS_INTERVAL seconds (and
+once more when the spider closes) the new items are added to
+``ScrapingLog.itemsScraped`` with a single UPDATE. The same UPDATE stores the
+spider's counts per item type and its throughput in ``ScrapingLog.metadata``
+under ``progress.<spider name>``, along with the ``incremental/*`` stats of
+a spider that skipped known brochures.
+
+The entry is SCRAPING_LOG_ID (set by scripts/scrape_all.py), or the latest
+running one when the setting is empty. The spiders of one run share it:
+each adds its own items and writes its own key under ``progress``. With a
+JOBDIR the counts are checkpointed after every UPDATE, so a resumed spider
+carries on counting where it stopped (see checkpoint.py).
+"""
+import json
+import time
+from collections import Counter
+from datetime import datetime, UTC
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from sqlalchemy import select, text
+from twisted.internet import task
+
+from database.session import get_db_session
+from models import ScrapingLog
+from .checkpoint import load_checkpoint, save_checkpoint
+from .items import FlyerItem, OfferItem, RetailerItem, StoreItem
+from .writer import DatabaseWriter
+
+ITEM_TYPES = {
+    RetailerItem: "retailers",
+    FlyerItem: "flyers",
+    OfferItem: "offers",
+    StoreItem: "stores",
+}
+
+# metadata is a text column holding a JSON object; its other keys are kept.
+# Only columns of the row itself are used, so concurrent UPDATEs from other
+# spiders are applied on top of each other rather than lost.
+UPDATE_PROGRESS_SQL = text("""
+UPDATE "ScrapingLog"
+SET "itemsScraped" = "itemsScraped" + :items,
+    metadata = jsonb_set(
+        COALESCE(NULLIF(metadata, '')::jsonb, '{}'::jsonb),
+        '{progress}',
+        COALESCE(NULLIF(metadata, '')::jsonb -> 'progress', '{}'::jsonb)
+            || jsonb_build_object(CAST(:spider AS text), CAST(:progress AS jsonb))
+    )::text,
+    "updatedAt" = :now
+WHERE id = :id
+""")
+
+
+class ScrapingProgress:
+    """Report item counts and throughput of a spider to its ScrapingLog entry"""
+
+    def __init__(self, writer: DatabaseWriter, stats, settings, interval: float = 10.0):
+        self.writer = writer
+        self.stats = stats
+        self.settings = settings
+        self.interval = interval
+        self.log_id = None
+        self.spider = None
+        self.started = None
+        self.scraped = Counter()
+        self.dropped = Counter()
+        self.written = 0  # items already added to itemsScraped
+        self.elapsed_before = 0.0  # seconds spent before the spider was resumed
+        self.loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("SCRAPING_PROGRESS_ENABLED", True):
+            raise NotConfigured
+        extension = cls(
+            DatabaseWriter.from_crawler(crawler),
+            crawler.stats,
+            crawler.settings,
+            interval=settings.getfloat("SCRAPING_PROGRESS_INTERVAL", 10.0),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extension.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(extension.item_dropped, signal=signals.item_dropped)
+        return extension
+
+    def spider_opened(self, spider):
+        self.spider = spider
+        self.started = time.monotonic()
+        saved = load_checkpoint(self.settings, "progress")
+        if saved:
+            self.scraped.update(saved.get("scraped", {}))
+            self.dropped.update(saved.get("dropped", {}))
+            self.written = saved.get("written", 0)
+            self.elapsed_before = saved.get("elapsedSeconds", 0.0)
+            # The skipped brochures were counted before the stop, not again
+            for key, value in saved.get("incremental", {}).items():
+                self.stats.inc_value(f"incremental/{key}", value)
+            spider.logger.info(f"📈 Resuming progress: {self.written} items counted before")
+        self.writer.open()
+        d = self.writer.submit(self._find_running_log)
+        self.loop = task.LoopingCall(self._report)
+        self.loop.start(self.interval, now=False)
+        return d
+
+    def spider_closed(self, spider, reason):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        self._report(finished=True)
+        return self.writer.close()
+
+    def item_scraped(self, item, spider):
+        self.scraped[ITEM_TYPES.get(type(item), "other")] += 1
+
+    def item_dropped(self, item, spider, exception):
+        self.dropped[ITEM_TYPES.get(type(item), "other")] += 1
+
+    def _find_running_log(self):
+        """Find the log entry to report to: SCRAPING_LOG_ID, else the latest running one"""
+        try:
+            with get_db_session() as session:
+                query = select(ScrapingLog.id)
+                log_id = self.settings.get("SCRAPING_LOG_ID")
+                if log_id:
+                    query = query.where(ScrapingLog.id == log_id)
+                else:
+                    query = query.where(ScrapingLog.status == "running").order_by(ScrapingLog.startedAt.desc()).limit(1)
+                self.log_id = session.execute(query).scalar()
+            if self.log_id:
+                self.spider.logger.info(f"📝 Connected to ScrapingLog ID: {self.log_id}")
+        except Exception as e:
+            self.spider.logger.warning(f"⚠️  Could not find running log entry: {e}")
+
+    def _report(self, finished: bool = False):
+        """Log progress and queue the UPDATE for items counted since the last one"""
+        total = sum(self.scraped.values())
+        elapsed = self.elapsed_before + time.monotonic() - self.started
+        rate = total / elapsed if elapsed > 0 else 0
+        if total == self.written and not finished:
+            return
+        self.spider.logger.info(
+            f"📈 Progress: {total} items scraped | {rate:.2f} items/sec | "
+            f"Dropped: {sum(self.dropped.values())}"
+        )
+        progress = {
+            "items": dict(self.scraped),
+            "dropped": dict(self.dropped),
+            "itemsPerSecond": round(rate, 2),
+            "elapsedSeconds": round(elapsed, 1),
+            "finished": finished,
+        }
+        incremental = {
+            key.split("/", 1)[1]: value
+            for key, value in self.stats.get_stats().items()
+            if key.startswith("incremental/")
+        }
+        if incremental:
+            progress["incremental"] = incremental
+        checkpoint = {
+            "scraped": dict(self.scraped),
+            "dropped": dict(self.dropped),
+            "written": total,
+            "elapsedSeconds": elapsed,
+            "incremental": incremental,
+        }
+        # Not waited for: progress updates must not hold up items
+        self.writer.submit(self._write, total - self.written, progress, checkpoint)
+        self.written = total
+
+    def _write(self, items: int, progress: dict, checkpoint: dict):
+        if self.log_id:
+            self._update_log(items, progress)
+        save_checkpoint(self.settings, "progress", checkpoint)
+
+    def _update_log(self, items: int, progress: dict):
+        try:
+            with get_db_session() as session:
+                session.execute(UPDATE_PROGRESS_SQL, {
+                    "id": self.log_id,
+                    "items": items,
+                    "spider": self.spider.name,
+                    "progress": json.dumps(progress),
+                    "now": datetime.now(UTC),
+                })
+        except Exception as e:
+            self.spider.logger.warning(f"⚠️  Failed to update ScrapingLog: {e}")
@@ -0,0 +1,68 @@
+"""Request meta helpers for pages that may need a browser"""
+import time
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from scrapy_playwright.page import PageMethod
+
+# Marker of the server-rendered Next.js data the spiders parse
+NEXT_DATA_MARKER = b'id="__NEXT_DATA__"'
+NEXT_DATA_SELECTOR = "script#__NEXT_DATA__"
+
+
+async def wait_until_ready(page, selector: str = NEXT_DATA_SELECTOR, network_idle: bool = False, ceiling_ms: int = 5000):
+    """Wait until the page is ready to be parsed, but never longer than ``ceiling_ms``
+
+    The page is ready once ``selector`` is attached to the DOM (and, with
+    ``network_idle``, once the network has gone quiet). Hitting the ceiling
+    is not an error: the page is parsed as it is, like after the old fixed
+    ``wait_for_timeout``. The returned dict ends up in ``PageMethod.result``
+    and is turned into crawl stats by ReadinessStatsMiddleware.
+    """
+    start = time.monotonic()
+    timed_out = False
+    try:
+        if selector:
+            await page.wait_for_selector(selector, state="attached", timeout=ceiling_ms)
+        if network_idle:
+            remaining_ms = ceiling_ms - (time.monotonic() - start) * 1000
+            await page.wait_for_load_state("networkidle", timeout=max(1, remaining_ms))
+    except PlaywrightTimeoutError:
+        timed_out = True
+    return {
+        "wait_ms": int((time.monotonic() - start) * 1000),
+        "ceiling_ms": ceiling_ms,
+        "timed_out": timed_out,
+    }
+
+
+def browser_page_methods(wait_ms: int = 5000, selector: str = NEXT_DATA_SELECTOR, network_idle: bool = False):
+    """Page methods used when a page is rendered with Playwright
+
+    ``wait_ms`` is only an upper bound, see wait_until_ready.
+    """
+    return [
+        PageMethod("wait_for_load_state", "domcontentloaded", timeout=60000),
+        PageMethod(wait_until_ready, selector=selector, network_idle=network_idle, ceiling_ms=wait_ms),
+    ]
+
+
+def browser_meta(wait_ms: int = 5000, selector: str = NEXT_DATA_SELECTOR, network_idle: bool = False, **meta):
+    """Request meta that always renders the page with Playwright"""
+    return {
+        "playwright": True,
+        "playwright_page_methods": browser_page_methods(wait_ms, selector, network_idle),
+        **meta,
+    }
+
+
+def next_data_meta(wait_ms: int = 5000, **meta):
+    """Request meta for pages whose data lives in the __NEXT_DATA__ script
+
+    The page is fetched over plain HTTP first. PlaywrightFallbackMiddleware
+    re-requests it through Playwright only when the JSON is missing.
+    """
+    return {
+        "playwright_fallback": True,
+        "playwright_page_methods": browser_page_methods(wait_ms),
+        **meta,
+    }
@@ -0,0 +1,383 @@
+"""Typed schemas of the kaufDA JSON documents
+
+The homepage ``__NEXT_DATA__`` (brochures and offers) and the brochure pages
+API are decoded into these pydantic models instead of being walked with
+chained ``.get()`` calls. The JSON itself is parsed by next_data.loads:
+orjson followed by ``model_validate`` is faster than pydantic's own JSON
+parser (``model_validate_json``) on these documents.
+
+Schema drift fails loudly: a document whose containers changed shape raises
+a ValidationError, and a brochure/offer entry that no longer matches its
+model is dropped, counted under ``schema/dropped/<Model>`` in the stats
+passed as ``context={"stats": ...}``. Each entry is logged at debug level;
+callers log one warning per document with the counts of DroppedEntries. The models also carry the
+constraints of utils.validators (non-empty title, pages > 0, price > 0), so
+items built from them don't need to be validated again.
+"""
+import logging
+from datetime import datetime, UTC
+from functools import partial
+from typing import Annotated, Any, List, Optional, Union
+
+from pydantic import (
+    AfterValidator,
+    BaseModel,
+    ConfigDict,
+    Field,
+    ValidationError,
+    WrapValidator,
+    model_validator,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def describe_errors(error: ValidationError) -> str:
+    """One-line summary of a ValidationError"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or '<root>'}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+def _skip_invalid(name, value, handler, info):
+    try:
+        return handler(value)
+    except ValidationError as e:
+        logger.debug(f"Dropping {name} entry that doesn't match its schema: {describe_errors(e)}")
+        stats = (info.context or {}).get("stats")
+        if stats is not None:
+            stats.inc_value(f"schema/dropped/{name}")
+        return None
+
+
+def _as_utc(value: datetime) -> datetime:
+    """``value`` comparable with aware datetimes: naive timestamps are taken as UTC"""
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value
+
+
+def _drop_skipped(entries: list) -> list:
+    return [entry for entry in entries if entry is not None]
+
+
+def Entry(model):
+    """``model``, or None (logged and counted) when the value doesn't validate"""
+    return Annotated[Optional[model], WrapValidator(partial(_skip_invalid, model.__name__))]
+
+
+def Entries(model):
+    """List of ``model`` where entries that fail validation are dropped"""
+    return Annotated[List[Entry(model)], AfterValidator(_drop_skipped)]
+
+
+class DroppedEntries:
+    """Stats that count the entries dropped from one document
+
+    Counts are passed on to ``stats``, and ``str()`` summarizes them for a
+    single warning per document.
+    """
+
+    def __init__(self, stats=None):
+        self.stats = stats
+        self.counts = {}
+
+    def inc_value(self, key, count=1):
+        self.counts[key] = self.counts.get(key, 0) + count
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+
+    def __str__(self) -> str:
+        return ", ".join(f"{count} {key.rsplit('/', 1)[-1]}" for key, count in self.counts.items())
+
+
+def decode(model, data, stats=None):
+    """Validate parsed JSON into ``model``
+
+    ``stats`` receives the ``schema/dropped/*`` counts. Raises
+    ValidationError when the document doesn't match the schema.
+    """
+    return model.model_validate(data, context={"stats": stats})
+
+
+def decoded(item):
+    """Mark an item built from a decoded model: its constraints already hold
+
+    ValidationPipeline passes marked items through without validating them
+    again.
+    """
+    item._decoded = True
+    return item
+
+
+class Schema(BaseModel):
+    """Base model: unknown fields are ignored, wrong types are errors"""
+    model_config = ConfigDict(extra="ignore")
+
+
+class ImageUrls(Schema):
+    large: Optional[str] = None
+    normal: Optional[str] = None
+    thumbnail: Optional[str] = None
+    url: Optional[str] = None
+
+    def first(self, *sizes: str) -> Optional[str]:
+        """First non-empty URL among ``sizes``"""
+        for size in sizes:
+            url = getattr(self, size)
+            if url:
+                return url
+        return None
+
+
+ImageUrl = Union[ImageUrls, str, None]
+
+
+def pick_url(value: ImageUrl, *sizes: str) -> Optional[str]:
+    """URL of an image field that is either a plain string or a set of sizes"""
+    if isinstance(value, ImageUrls):
+        return value.first(*sizes)
+    return value or None
+
+
+class Publisher(Schema):
+    id: Optional[str] = None
+    name: str = ""
+
+
+class PageRef(Schema):
+    number: Optional[int] = None
+
+
+class ParentContent(Schema):
+    id: Optional[str] = None
+    type: Optional[str] = None
+    page: Optional[PageRef] = None
+
+
+class Preview(Schema):
+    url: ImageUrl = None
+    description: Optional[str] = None
+
+
+# Homepage brochures
+
+
+class BrochurePage(Schema):
+    url: ImageUrl = None
+
+
+class Brochure(Schema):
+    id: str
+    contentId: Optional[str] = None
+    title: str = Field(min_length=1)
+    publisher: Publisher = Publisher()
+    pageCount: int = Field(gt=0)
+    validFrom: Optional[datetime] = None
+    validUntil: Optional[datetime] = None
+    publishedFrom: Optional[datetime] = None
+    publishedUntil: Optional[datetime] = None
+    pages: List[BrochurePage] = []
+    preview: Union[Preview, str, bool, None] = None
+    imageUrl: ImageUrl = None
+    thumbnailUrl: ImageUrl = None
+    previewUrl: ImageUrl = None
+
+    @model_validator(mode="after")
+    def check_dates(self):
+        # Missing dates default to now when the item is built
+        now = datetime.now(UTC)
+        if _as_utc(self.validUntil or now) < _as_utc(self.validFrom or now):
+            raise ValueError("validUntil must be after validFrom")
+        return self
+
+
+class BrochureList(Schema):
+    items: Entries(Brochure) = []
+
+
+class Brochures(Schema):
+    topRanked: Entries(Brochure) = []
+    main: BrochureList = BrochureList()
+
+
+# Homepage offers
+
+
+class Prices(Schema):
+    mainPrice: Optional[float] = None
+    price: Optional[float] = None
+    mainPriceFormatted: Optional[str] = None
+    mainPriceFrequency: Optional[str] = None
+    conditions: List[Any] = []
+    priceByBaseUnit: Optional[str] = None
+    secondaryPrice: Optional[float] = None
+    secondaryPriceFormatted: Optional[str] = None
+
+    @property
+    def current(self) -> float:
+        return self.mainPrice or self.price or 0.0
+
+
+class ImageMetaData(Schema):
+    imageAlt: Optional[str] = None
+    imageTitle: Optional[str] = None
+
+
+class OfferImages(Schema):
+    url: Optional[ImageUrls] = None
+    metaData: Optional[ImageMetaData] = None
+
+
+class Offer(Schema):
+    id: str = Field(min_length=1)
+    title: str = Field(min_length=1)
+    brand: Optional[str] = None
+    publisherId: Optional[str] = None
+    publisherName: str = ""
+    description: Optional[str] = None
+    preview: Union[Preview, str, bool, None] = None
+    parentContent: Optional[ParentContent] = None
+    prices: Prices = Prices()
+    validFrom: Optional[datetime] = None
+    validUntil: Optional[datetime] = None
+    offerImages: Optional[OfferImages] = None
+
+    @model_validator(mode="after")
+    def check_price(self):
+        if self.prices.current <= 0:
+            raise ValueError("offer has no price")
+        return self
+
+
+class OfferList(Schema):
+    items: Entries(Offer) = []
+
+
+class Offers(Schema):
+    main: OfferList = OfferList()
+
+
+# Homepage document
+
+
+class PageInformation(Schema):
+    brochures: Optional[Brochures] = None
+    offers: Optional[Offers] = None
+
+
+class PageProps(Schema):
+    pageInformation: Optional[PageInformation] = None
+    brochures: Optional[Brochures] = None
+    offers: Optional[Offers] = None
+
+
+class Props(Schema):
+    pageProps: PageProps = PageProps()
+
+
+def _given(model: Optional[Schema]) -> Optional[Schema]:
+    """``model`` unless it was decoded from an empty object"""
+    return model if model is not None and model.model_fields_set else None
+
+
+class HomepageData(Schema):
+    """``__NEXT_DATA__`` of the homepage"""
+    props: Props = Props()
+
+    @property
+    def brochures(self) -> Brochures:
+        # pageInformation first, then directly under pageProps
+        info = self.props.pageProps.pageInformation
+        return (
+            _given(info and info.brochures)
+            or _given(self.props.pageProps.brochures)
+            or Brochures()
+        )
+
+    @property
+    def offers(self) -> Offers:
+        info = self.props.pageProps.pageInformation
+        return (
+            _given(info and info.offers)
+            or _given(self.props.pageProps.offers)
+            or Offers()
+        )
+
+
+# Brochure pages API
+
+
+class Paragraph(Schema):
+    paragraph: str = ""
+
+
+class Category(Schema):
+    name: Optional[str] = None
+
+
+class Product(Schema):
+    name: str = ""
+    brandName: Optional[str] = None
+    description: List[Union[Paragraph, Any]] = []
+    categoryPaths: List[Category] = []
+
+
+class Deal(Schema):
+    type: Optional[str] = None  # SALES_PRICE, REGULAR_PRICE or OTHER
+    min: Optional[float] = None
+    max: Optional[float] = None
+    currencyCode: Optional[str] = "EUR"
+    frequency: Optional[str] = None
+    priceByBaseUnit: Optional[str] = None
+
+    @property
+    def price(self) -> float:
+        return self.min or self.max or 0.0
+
+
+class OfferContent(Schema):
+    type: Optional[str] = None
+    id: Optional[str] = None
+    products: List[Product] = []
+    deals: List[Deal] = []
+    image: Optional[str] = None
+    parentContent: Optional[ParentContent] = None
+    publisher: Publisher = Publisher()
+
+    @property
+    def regular_deal(self) -> Optional[Deal]:
+        """The regular price the offer's price replaces, if the brochure shows one"""
+        return next((deal for deal in self.deals if deal.type == "REGULAR_PRICE"), None)
+
+    @model_validator(mode="after")
+    def check_offer(self):
+        # Other content types (ads, links) carry none of this
+        if self.type != "offer":
+            return self
+        if not self.id:
+            raise ValueError("offer has no id")
+        if not self.products or not self.products[0].name:
+            raise ValueError("offer has no product name")
+        if not self.deals or self.deals[0].price <= 0:
+            raise ValueError("offer has no price")
+        return self
+
+
+class PageOffer(Schema):
+    content: Optional[OfferContent] = None
+
+
+class PageImage(Schema):
+    size: str = ""
+    url: Optional[str] = None
+
+
+class Page(Schema):
+    """Entry of ``contents`` in a pages API response"""
+    number: Optional[int] = None
+    images: List[PageImage] = []
+    offers: Entries(PageOffer) = []
+
+
+class PagesResponse(Schema):
+    contents: Entries(Page) = []
@@ -34,19 +34,32 @@ AUTOTHROTTLE_MAX_DELAY = 10
 AUTOTHROTTLE_TARGET_CONCURRENCY = 2.0
 AUTOTHROTTLE_DEBUG = False
 
-# Enable and configure HTTP caching
-HTTPCACHE_ENABLED = False
-HTTPCACHE_EXPIRATION_SECS = 0
-HTTPCACHE_DIR = "httpcache"
+# HTTP cache: "off", "record" (store plain and Playwright responses, serve them
+# until they expire) or "replay" (serve only stored responses, never download)
+HTTPCACHE_MODE = os.getenv("SCRAPER_HTTPCACHE", "off").lower()
+HTTPCACHE_ENABLED = HTTPCACHE_MODE in ("record", "replay")
+HTTPCACHE_IGNORE_MISSING = HTTPCACHE_MODE == "replay"
+# Replay uses whatever was recorded, however old
+HTTPCACHE_EXPIRATION_SECS = 0 if HTTPCACHE_MODE == "replay" else int(os.getenv("SCRAPER_HTTPCACHE_TTL", "0"))
+HTTPCACHE_DIR = os.getenv("SCRAPER_HTTPCACHE_DIR", "httpcache")
 HTTPCACHE_IGNORE_HTTP_CODES = []
-HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_STORAGE = "scraper.httpcache.ContentAddressedCacheStorage"
 
 # Playwright settings (for JavaScript rendering)
+# Requests without meta["playwright"] are passed on to Scrapy's HTTP/1.1 handler,
+# so only pages that really need a browser start Chromium
 DOWNLOAD_HANDLERS = {
     "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
     "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
 }
 
+# Pages with server-rendered __NEXT_DATA__ are fetched over plain HTTP first,
+# falling back to Playwright only when the JSON is missing
+DOWNLOADER_MIDDLEWARES = {
+    "scraper.middlewares.PlaywrightFallbackMiddleware": 580,
+    "scraper.middlewares.ReadinessStatsMiddleware": 590,
+}
+
 # Use default reactor (compatible with Python 3.13)
 # TWISTED_REACTOR = "twisted.internet.asyncio.AsyncIOReactor"
 
@@ -58,6 +71,44 @@ PLAYWRIGHT_LAUNCH_OPTIONS = {
 }
 PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT = 60000  # 60 seconds
 
+# Playwright resource blocking: the spiders only need the DOM and __NEXT_DATA__
+# (ResourceBlocker installs itself as PLAYWRIGHT_ABORT_REQUEST)
+ADDONS = {
+    "scraper.middlewares.ResourceBlocker": 100,
+}
+PLAYWRIGHT_BLOCK_RESOURCES = os.getenv("SCRAPER_BLOCK_RESOURCES", "true").lower() == "true"
+PLAYWRIGHT_BLOCKED_RESOURCE_TYPES = os.getenv("SCRAPER_BLOCKED_RESOURCE_TYPES", "image,media,font").split(",")
+PLAYWRIGHT_BLOCKED_HOSTS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "criteo.com",
+    "criteo.net",
+    "taboola.com",
+    "outbrain.com",
+    "adnxs.com",
+    "amazon-adsystem.com",
+    "scorecardresearch.com",
+    "cookielaw.org",
+    "usercentrics.eu",
+]
+PLAYWRIGHT_ALLOWED_HOSTS = []  # Never blocked, whatever the resource type
+# Rough average size per blocked request, used for the bytes saved stats
+PLAYWRIGHT_BLOCKED_BYTES_ESTIMATE = {
+    "image": 40000,
+    "media": 500000,
+    "font": 30000,
+    "stylesheet": 20000,
+    "script": 50000,
+    "xhr": 5000,
+    "fetch": 5000,
+}
+
 # Pipelines
 ITEM_PIPELINES = {
     "scraper.pipelines.ValidationPipeline": 300,
@@ -66,6 +117,63 @@ ITEM_PIPELINES = {
     "scraper.pipelines.LoggingPipeline": 600,
 }
 
+# Progress of the running ScrapingLog entry: one UPDATE per interval with item counts and throughput
+EXTENSIONS = {
+    "scraper.progress.ScrapingProgress": 500,
+}
+SCRAPING_PROGRESS_INTERVAL = float(os.getenv("SCRAPER_PROGRESS_INTERVAL", "10"))  # seconds
+# ScrapingLog entry to report to (scripts/scrape_all.py sets it); without it the latest running entry is used
+SCRAPING_LOG_ID = None
+
+# Database writes: "batch" buffers items and upserts them in bulk, "row" saves one item per transaction,
+# "backfill" spools items to CSV and loads them with COPY when the spider closes
+DATABASE_WRITE_MODE = os.getenv("SCRAPER_DB_WRITE_MODE", "batch")
+DATABASE_BATCH_SIZE = int(os.getenv("SCRAPER_DB_BATCH_SIZE", "500"))
+DATABASE_BATCH_INTERVAL = float(os.getenv("SCRAPER_DB_BATCH_INTERVAL", "5"))  # seconds
+BACKFILL_SPOOL_DIR = os.getenv("SCRAPER_BACKFILL_SPOOL_DIR")  # default: the system temp directory
+PRODUCT_CACHE_SIZE = int(os.getenv("SCRAPER_PRODUCT_CACHE_SIZE", "100000"))  # product IDs kept in memory (LRU)
+
+# Database calls run on a dedicated thread pool so they don't block downloads
+DATABASE_WRITER_THREADS = int(os.getenv("SCRAPER_DB_WRITER_THREADS", "1"))  # >1 gives up write ordering
+DATABASE_WRITER_QUEUE_SIZE = int(os.getenv("SCRAPER_DB_WRITER_QUEUE_SIZE", "100"))  # max pending calls
+
+# Record offer price changes in the partitioned OfferPriceHistory table
+PRICE_HISTORY_ENABLED = os.getenv("SCRAPER_PRICE_HISTORY", "true").lower() == "true"
+
+# Deduplication against stored items (64-bit hash index, probable hits confirmed in the database)
+# "changes" drops known items only when their content hash is unchanged, "skip" drops all known items
+DEDUP_MODE = os.getenv("SCRAPER_DEDUP_MODE", "changes")
+DEDUP_CONFIRM_HITS = os.getenv("SCRAPER_DEDUP_CONFIRM_HITS", "true").lower() == "true"
+DEDUP_LOAD_CHUNK_SIZE = 100000  # rows per server-side cursor fetch
+# Duplicates and invalid items are dropped with DropItem; don't log each one as a warning
+DEFAULT_DROPITEM_LOG_LEVEL = "DEBUG"
+
+# Homepage snapshot shared by the spiders of one run (scripts/scrape_all.py sets the run id)
+HOMEPAGE_SNAPSHOT_DIR = os.getenv("SCRAPER_SNAPSHOT_DIR", "snapshots")
+HOMEPAGE_SNAPSHOT_RUN_ID = None
+
+# Geocoding of stores without coordinates (needs geopy); results are cached locally
+GEOCODING_ENABLED = os.getenv("SCRAPER_GEOCODING_ENABLED", "true").lower() == "true"
+GEOCODING_CACHE_PATH = os.getenv("SCRAPER_GEOCODING_CACHE", "cache/geocode_cache.sqlite3")
+GEOCODING_MIN_DELAY = 1.0  # seconds between requests (Nominatim usage policy)
+GEOCODING_TIMEOUT = 10
+GEOCODING_DRAIN_TIMEOUT = int(os.getenv("SCRAPER_GEOCODING_DRAIN_TIMEOUT", "300"))  # seconds at spider close
+
+# Checkpoints of scripts/scrape_all.py: a JOBDIR per spider and run.json, so a
+# stopped run is resumed by the next start (--fresh starts over)
+JOBS_DIR = os.getenv("SCRAPER_JOBS_DIR", "jobs")
+
+# Incremental crawls: brochures already stored with the same validUntil are skipped
+# before their pages and offers are requested (scripts/scrape_all.py --incremental)
+INCREMENTAL_MODE = os.getenv("SCRAPER_INCREMENTAL", "false").lower() == "true"
+
+# Brochure pages API responses kept across crawls: valid brochures are parsed
+# from the stored payload, expired ones are revalidated with ETag/Last-Modified
+PAGES_CACHE_ENABLED = os.getenv("SCRAPER_PAGES_CACHE_ENABLED", "true").lower() == "true"
+PAGES_CACHE_PATH = os.getenv("SCRAPER_PAGES_CACHE", "cache/pages_cache.sqlite3")
+# Entries are deleted this long after their brochure expired; until then they are revalidated
+PAGES_CACHE_RETENTION_DAYS = float(os.getenv("SCRAPER_PAGES_CACHE_RETENTION_DAYS", "14"))
+
 # Logging
 LOG_LEVEL = "INFO"
 LOG_FILE = None  # Set to a file path to log to file
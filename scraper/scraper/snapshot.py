@@ -0,0 +1,108 @@
+"""Homepage snapshot shared by the spiders of one scraping run
+
+scripts/scrape_all.py runs the ``homepage`` spider first. It fetches
+https://www.kaufda.de once and stores the parsed ``__NEXT_DATA__`` JSON in
+memory and on disk under HOMEPAGE_SNAPSHOT_DIR/<run id>.json. The retailers,
+flyers and offers spiders then start from that snapshot instead of loading
+the homepage themselves. Without HOMEPAGE_SNAPSHOT_RUN_ID, or when the
+snapshot is missing, they load the homepage as before.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from scrapy.http import Request
+
+from .next_data import loads
+from .rendering import next_data_meta
+
+logger = logging.getLogger(__name__)
+
+# Parsed snapshots of this process, keyed by run id
+_snapshots = {}
+
+
+def snapshot_path(settings) -> Optional[Path]:
+    """Path of the snapshot for the current run, None if no run id is set"""
+    run_id = settings.get("HOMEPAGE_SNAPSHOT_RUN_ID")
+    if not run_id:
+        return None
+    return Path(settings.get("HOMEPAGE_SNAPSHOT_DIR", "snapshots")).resolve() / f"{run_id}.json"
+
+
+def save_homepage_snapshot(settings, json_data: dict) -> Optional[Path]:
+    """Keep the homepage JSON for the other spiders of this run"""
+    path = snapshot_path(settings)
+    if path is None:
+        return None
+    _snapshots[path] = json_data
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(json_data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_homepage_snapshot(settings, response=None) -> Optional[dict]:
+    """Return the snapshot JSON, from memory if this process took it"""
+    path = snapshot_path(settings)
+    if path is None:
+        return None
+    if path in _snapshots:
+        return _snapshots[path]
+    try:
+        body = response.body if response is not None else path.read_bytes()
+        json_data = loads(body)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read homepage snapshot {path}: {e}")
+        return None
+    _snapshots[path] = json_data
+    return json_data
+
+
+class HomepageSnapshotMixin:
+    """Start a spider from the run's homepage snapshot when there is one
+
+    Spiders implement ``parse_homepage_data(json_data, response)`` with the
+    part of their homepage callback (``parse``) that works on the parsed JSON.
+    """
+
+    def start_requests(self):
+        # spider.state exists with a JOBDIR (see checkpoint.py). When it says the
+        # spider started before, this is a resumed crawl: the homepage was
+        # handled and the requests it led to are in the persisted queue.
+        state = getattr(self, "state", None)
+        if state is not None:
+            if state.get("started"):
+                self.logger.info("⏯️  Resuming from the persisted request queue")
+                self.crawler.stats.inc_value("checkpoint/resumed")
+                return
+            state["started"] = True
+        path = snapshot_path(self.settings)
+        if path is not None and (path in _snapshots or path.exists()):
+            self.logger.info(f"📸 Using homepage snapshot {path}")
+            self.crawler.stats.inc_value("homepage_snapshot/used")
+            yield Request(path.as_uri(), callback=self.parse_homepage_snapshot, dont_filter=True)
+            return
+        if path is not None:
+            self.logger.warning(f"Homepage snapshot {path} not found, loading the homepage")
+        for url in self.start_urls:
+            yield self.homepage_request(url)
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def homepage_request(self, url):
+        """Homepage request, rendered by PlaywrightFallbackMiddleware only if __NEXT_DATA__ is missing"""
+        return Request(url, meta=next_data_meta(wait_ms=5000), dont_filter=True)
+
+    def parse_homepage_snapshot(self, response):
+        json_data = load_homepage_snapshot(self.settings, response)
+        if not json_data:
+            return [self.homepage_request(url) for url in self.start_urls]
+        # Returned, not re-yielded: it may be an async generator (see FlyersSpider)
+        return self.parse_homepage_data(json_data, response)
@@ -1,14 +1,51 @@
 """Flyer spider"""
 import re
-import json
 import scrapy
 from datetime import datetime, UTC
-from scrapy_playwright.page import PageMethod
 from scrapy.http import Request
+from scrapy.utils.defer import maybe_deferred_to_future
+from pydantic import ValidationError
+from sqlalchemy import text
+from twisted.internet import threads
+from ..pages_api import iter_page_models
+from ..next_data import extract_next_data
+from ..pages_cache import PagesCache
+from ..rendering import browser_meta
+from ..snapshot import HomepageSnapshotMixin
+from ..dedup import set_placeholder
 from ..items import FlyerItem, OfferItem
+from ..schemas import (
+    Brochure,
+    DroppedEntries,
+    HomepageData,
+    OfferContent,
+    Page,
+    Paragraph,
+    Preview,
+    decode,
+    decoded,
+    describe_errors,
+    pick_url,
+)
 
+# Stored state of the listed brochures in one round trip. validUntil goes
+# through the same timestamptz -> TIMESTAMP(3) conversion as on insert, so
+# equal values compare equal whatever the session time zone. A flyer
+# without offers isn't unchanged: its pages API request may have failed, and
+# the next run has to try again (a brochure that really has no offers is
+# then answered by the pages cache).
+KNOWN_BROCHURES_SQL = text("""
+SELECT b.content_id, bool_or(
+    f."validUntil" = CAST(b.valid_until AS timestamp(3))
+    AND EXISTS (SELECT 1 FROM "Offer" o WHERE o."flyerId" = f.id)
+) AS unchanged
+FROM unnest(CAST(:content_ids AS text[]), CAST(:valid_untils AS timestamptz[])) AS b(content_id, valid_until)
+JOIN "Flyer" f ON f."contentId" = b.content_id
+GROUP BY b.content_id
+""")
 
-class FlyersSpider(scrapy.Spider):
+
+class FlyersSpider(HomepageSnapshotMixin, scrapy.Spider):
     """Spider for scraping flyers from kaufDA.de"""
     name = "flyers"
     allowed_domains = ["kaufda.de", "www.kaufda.de"]
@@ -17,227 +54,165 @@ class FlyersSpider(scrapy.Spider):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.base_url = "https://www.kaufda.de"
+        self.pages_cache = None
+        self.incremental = False
 
-    def parse(self, response):
-        """Parse main page and extract flyer data from JSON"""
-        yield response.follow(
-            response.url,
-            callback=self.parse_flyer_list,
-            meta={
-                "playwright": True,
-                "playwright_page_methods": [
-                    PageMethod("wait_for_load_state", "domcontentloaded", timeout=60000),
-                    PageMethod("wait_for_timeout", 5000),
-                ],
-            },
-        )
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # Stored pages API responses of known brochures (None if the cache is off)
+        spider.pages_cache = PagesCache.from_crawler(crawler)
+        spider.incremental = crawler.settings.getbool("INCREMENTAL_MODE", False)
+        return spider
 
-    def parse_flyer_list(self, response):
+    def parse(self, response):
         """Extract flyer data from embedded JSON"""
         # Extract JSON data from __NEXT_DATA__ script tag
-        json_data = None
-        script_tags = response.css('script#__NEXT_DATA__::text').getall()
-        
-        if not script_tags:
-            # Try alternative selector
-            script_tags = response.xpath('//script[@id="__NEXT_DATA__"]/text()').getall()
-        
-        for script_content in script_tags:
-            try:
-                json_data = json.loads(script_content)
-                break
-            except json.JSONDecodeError:
-                continue
+        json_data = extract_next_data(response, self.crawler.stats, model=HomepageData)
         
         if not json_data:
             self.logger.warning("Could not find __NEXT_DATA__ JSON")
             # Fallback to HTML parsing
             return self.parse_flyer_list_html(response)
-        
-        # Extract flyers from JSON
+
+        return self.parse_homepage_data(json_data, response)
+
+    def parse_homepage_data(self, json_data, response):
+        """Extract flyers from the homepage __NEXT_DATA__ JSON
+
+        In incremental mode the stored brochures are looked up first, off the
+        reactor thread; the flyers and requests then come from an async
+        generator.
+        """
         try:
-            page_props = json_data.get("props", {}).get("pageProps", {})
-            # Try pageInformation first, then fallback to direct
-            page_info = page_props.get("pageInformation", {})
-            brochures = page_info.get("brochures", {}) or page_props.get("brochures", {})
-            
+            if not isinstance(json_data, HomepageData):
+                json_data = decode(HomepageData, json_data, self.crawler.stats)
+            brochures = json_data.brochures
+
             # Flyers are in topRanked, not main.items
-            top_ranked = brochures.get("topRanked", [])
-            main_brochures = brochures.get("main", {}).get("items", [])
+            top_ranked = brochures.topRanked
+            main_brochures = brochures.main.items
             all_brochures = top_ranked + main_brochures  # Combine both sources
-            
-            self.logger.info(f"Found {len(all_brochures)} flyers in JSON (topRanked: {len(top_ranked)}, main: {len(main_brochures)})")
-            
-            for brochure in all_brochures:
-                item = FlyerItem()
-                
-                # Extract basic info
-                item["title"] = brochure.get("title", "")
-                item["url"] = f"{self.base_url}/Prospekte/{brochure.get('id', '')}"
-                content_id = brochure.get("contentId")
-                item["contentId"] = content_id
-                if content_id:
-                    self.logger.debug(f"Extracted contentId: {content_id} for {item['title']}")
-                
-                # Extract retailer name
-                publisher = brochure.get("publisher", {})
-                retailer_name = publisher.get("name", "")
-                item["retailerId"] = retailer_name
-                
-                # Extract pages
-                item["pages"] = brochure.get("pageCount", 0)
-                
-                # Extract published dates
-                published_from_str = brochure.get("publishedFrom")
-                published_until_str = brochure.get("publishedUntil")
-                
-                if published_from_str:
-                    try:
-                        item["publishedFrom"] = datetime.fromisoformat(published_from_str.replace("+0000", "+00:00"))
-                    except (ValueError, AttributeError):
-                        pass
-                
-                if published_until_str:
-                    try:
-                        item["publishedUntil"] = datetime.fromisoformat(published_until_str.replace("+0000", "+00:00"))
-                    except (ValueError, AttributeError):
-                        pass
-                
-                # Extract dates
-                valid_from_str = brochure.get("validFrom")
-                valid_until_str = brochure.get("validUntil")
-                
-                if valid_from_str:
-                    try:
-                        # Parse ISO format: 2025-11-16T23:00:00.000+0000
-                        item["validFrom"] = datetime.fromisoformat(valid_from_str.replace("+0000", "+00:00"))
-                    except (ValueError, AttributeError):
-                        item["validFrom"] = datetime.now(UTC)
-                else:
-                    item["validFrom"] = datetime.now(UTC)
-                
-                if valid_until_str:
-                    try:
-                        item["validUntil"] = datetime.fromisoformat(valid_until_str.replace("+0000", "+00:00"))
-                    except (ValueError, AttributeError):
-                        item["validUntil"] = datetime.now(UTC)
-                else:
-                    item["validUntil"] = datetime.now(UTC)
-                
-                # Extract preview image (thumbnail) - در JSON جدید، thumbnail در pages[0].url است
-                # اول سعی می‌کنیم از pages[0].url استفاده کنیم
-                pages = brochure.get("pages", [])
-                if pages and len(pages) > 0:
-                    first_page = pages[0]
-                    if isinstance(first_page, dict):
-                        page_url = first_page.get("url", {})
-                        if isinstance(page_url, dict):
-                            # Try different sizes - large is best quality for thumbnail
-                            thumbnail_url = (
-                                page_url.get("large") or 
-                                page_url.get("normal") or 
-                                page_url.get("thumbnail") or
-                                page_url.get("url")
-                            )
-                            if thumbnail_url:
-                                item["thumbnailUrl"] = thumbnail_url
-                                self.logger.debug(f"Extracted thumbnailUrl from pages[0].url: {thumbnail_url}")
-                        elif isinstance(page_url, str):
-                            item["thumbnailUrl"] = page_url
-                            self.logger.debug(f"Extracted thumbnailUrl from pages[0].url (string): {page_url}")
-                
-                # If still no thumbnail, try to get from preview image URL pattern
-                if not item.get("thumbnailUrl") and content_id:
-                    # Build preview URL from contentId
-                    preview_url = f"https://content-media.bonial.biz/{content_id}/preview.jpg"
-                    item["thumbnailUrl"] = preview_url
-                    self.logger.debug(f"Built thumbnailUrl from contentId: {preview_url}")
-                
-                # Fallback: Check preview field (for older JSON structure)
-                if not item.get("thumbnailUrl"):
-                    preview = brochure.get("preview", {})
-                    if preview:
-                        preview_url = preview.get("url", {})
-                        if isinstance(preview_url, dict):
-                            thumbnail_url = (
-                                preview_url.get("large") or 
-                                preview_url.get("normal") or 
-                                preview_url.get("thumbnail") or
-                                preview_url.get("url")
-                            )
-                            if thumbnail_url:
-                                item["thumbnailUrl"] = thumbnail_url
-                        elif isinstance(preview_url, str):
-                            item["thumbnailUrl"] = preview_url
-                
-                # Also check direct preview/image fields
-                if not item.get("thumbnailUrl"):
-                    image_url = brochure.get("imageUrl") or brochure.get("thumbnailUrl") or brochure.get("previewUrl")
-                    if image_url:
-                        if isinstance(image_url, dict):
-                            item["thumbnailUrl"] = image_url.get("url") or image_url.get("large") or image_url.get("normal")
-                        elif isinstance(image_url, str):
-                            item["thumbnailUrl"] = image_url
-                
-                # اگر thumbnailUrl پیدا نشد، سعی کنیم از PDF URL بسازیم
-                # معمولاً URL PDF به صورت https://content-media.bonial.biz/{id}/file.pdf است
-                # و preview به صورت https://content-media.bonial.biz/{id}/preview.jpg است
-                if not item.get("thumbnailUrl") and item.get("pdfUrl"):
-                    pdf_url = item["pdfUrl"]
-                    # اگر URL شامل bonial.biz است، preview.jpg را بسازیم
-                    if "bonial.biz" in pdf_url:
-                        # جایگزین کردن /file.pdf با /preview.jpg
-                        if "/file.pdf" in pdf_url:
-                            preview_url = pdf_url.replace("/file.pdf", "/preview.jpg")
-                        elif pdf_url.endswith(".pdf"):
-                            preview_url = pdf_url.replace(".pdf", "/preview.jpg")
-                        else:
-                            # اگر ساختار متفاوت است، سعی کنیم preview.jpg را اضافه کنیم
-                            preview_url = pdf_url.rstrip("/") + "/preview.jpg"
-                        item["thumbnailUrl"] = preview_url
-                
-                # Extract PDF URL - flyers don't have PDF, they have images
-                # So we don't set pdfUrl, but we'll fetch pages from API later
-                # pdf_url = brochure.get("downloadUrl") or brochure.get("pdfUrl")
-                # if pdf_url:
-                #     item["pdfUrl"] = pdf_url
-                
-                # Always fetch thumbnail from pages API if we have contentId
-                # This ensures we get the first page image as thumbnail
+        except ValidationError as e:
+            self.logger.error(f"Homepage JSON doesn't match its schema: {describe_errors(e)}")
+            self.crawler.stats.inc_value("schema/errors/HomepageData")
+            return self.parse_flyer_list_html(response)
+
+        self.logger.info(f"Found {len(all_brochures)} flyers in JSON (topRanked: {len(top_ranked)}, main: {len(main_brochures)})")
+        if self.incremental:
+            return self._parse_new_or_changed(all_brochures, response)
+        return self._parse_brochures(all_brochures, response)
+
+    def _parse_brochures(self, brochures, response):
+        """Yield the pages API request of each brochure (or its flyer item)"""
+        try:
+            for brochure in brochures:
+                item = self._flyer_item(brochure)
+                content_id = brochure.contentId
+
+                # Fetch pages API once: the first page image becomes the thumbnail
+                # and the same response provides the flyer's offers
                 if content_id:
-                    # Request pages API to get first page image as thumbnail
-                    pages_api_url = f"https://content-viewer-be.kaufda.de/api/v1/brochures/{content_id}/pages?partner=kaufda_web&lat=52.522&lng=13.4161"
-                    yield Request(
-                        pages_api_url,
-                        callback=self.parse_flyer_thumbnail,
-                        meta={
-                            "flyer_item": item,
-                            "content_id": content_id,
-                        },
-                        dont_filter=True,
-                        priority=1,  # Higher priority to get thumbnail first
-                    )
+                    body = self.pages_cache.lookup(content_id, brochure.validUntil) if self.pages_cache else None
+                    if body is not None:
+                        # Published brochures don't change: no request for one we have
+                        yield from self._parse_pages(body, item, content_id)
+                        continue
+                    yield self._pages_request(item, content_id, brochure.validUntil)
+                    # Thumbnail and offers used to be fetched with two identical requests
+                    self.crawler.stats.inc_value("flyers/pages_api_requests_saved")
                 else:
                     # Yield flyer item if no contentId
                     yield item
-                
-                # Also fetch pages API to get offers (separate request)
-                if content_id:
-                    pages_api_url = f"https://content-viewer-be.kaufda.de/api/v1/brochures/{content_id}/pages?partner=kaufda_web&lat=52.522&lng=13.4161"
-                    yield Request(
-                        pages_api_url,
-                        callback=self.parse_flyer_pages,
-                        meta={
-                            "flyer_item": item,
-                            "content_id": content_id,
-                        },
-                        dont_filter=True,
-                    )
-                
+
         except Exception as e:
             self.logger.error(f"Error parsing JSON flyer data: {e}")
             # Fallback to HTML parsing
-            return self.parse_flyer_list_html(response)
+            yield from self.parse_flyer_list_html(response)
+
+    async def _parse_new_or_changed(self, brochures, response):
+        """Incremental mode: parse the brochures that aren't stored unchanged
+
+        When the lookup fails, every brochure is processed.
+        """
+        listed = [b for b in brochures if b.contentId]
+        try:
+            known = await maybe_deferred_to_future(threads.deferToThread(self._known_brochures, listed))
+        except Exception as e:
+            self.logger.warning(f"⚠️  Could not look up known brochures, processing all of them: {e}")
+        else:
+            brochures = self._new_or_changed(brochures, known)
+        for output in self._parse_brochures(brochures, response):
+            yield output
+
+    @staticmethod
+    def _known_brochures(brochures):
+        """{contentId: unchanged} of the stored brochures (runs in a thread)"""
+        # Imported here: importing the spider must not need a database
+        from database.session import get_db_session
+
+        with get_db_session() as session:
+            return dict(session.execute(KNOWN_BROCHURES_SQL, {
+                "content_ids": [b.contentId for b in brochures],
+                "valid_untils": [b.validUntil for b in brochures],
+            }).all())
+
+    def _new_or_changed(self, brochures, known):
+        """Brochures that aren't stored yet or whose validUntil changed"""
+        stats = self.crawler.stats
+        selected = []
+        for brochure in brochures:
+            unchanged = known.get(brochure.contentId) if brochure.contentId else None
+            if unchanged:
+                stats.inc_value("incremental/brochures_skipped")
+                continue
+            stats.inc_value("incremental/brochures_changed" if brochure.contentId in known else "incremental/brochures_new")
+            selected.append(brochure)
+        self.logger.info(
+            f"⏭️  Incremental: {len(brochures) - len(selected)} of {len(brochures)} brochures unchanged, "
+            f"{len(selected)} new or changed"
+        )
+        return selected
+
+    def _flyer_item(self, brochure: Brochure):
+        """Build a FlyerItem from a homepage brochure"""
+        item = FlyerItem()
+        item["title"] = brochure.title
+        item["url"] = f"{self.base_url}/Prospekte/{brochure.id}"
+        item["contentId"] = brochure.contentId
+        if brochure.contentId:
+            self.logger.debug(f"Extracted contentId: {brochure.contentId} for {item['title']}")
+        item["retailerId"] = brochure.publisher.name
+        item["pages"] = brochure.pageCount
+
+        if brochure.publishedFrom:
+            item["publishedFrom"] = brochure.publishedFrom
+        if brochure.publishedUntil:
+            item["publishedUntil"] = brochure.publishedUntil
+        # Missing dates default to now, which must not change the content hash
+        for field in ("validFrom", "validUntil"):
+            if getattr(brochure, field):
+                item[field] = getattr(brochure, field)
+            else:
+                set_placeholder(item, field, datetime.now(UTC))
+
+        # Thumbnail: first page image (large is best quality), then the preview
+        # built from contentId, then the older preview/image fields
+        thumbnail_url = None
+        if brochure.pages:
+            thumbnail_url = pick_url(brochure.pages[0].url, "large", "normal", "thumbnail", "url")
+        if not thumbnail_url and brochure.contentId:
+            thumbnail_url = f"https://content-media.bonial.biz/{brochure.contentId}/preview.jpg"
+        if not thumbnail_url and isinstance(brochure.preview, Preview):
+            thumbnail_url = pick_url(brochure.preview.url, "large", "normal", "thumbnail", "url")
+        if not thumbnail_url:
+            image_url = brochure.imageUrl or brochure.thumbnailUrl or brochure.previewUrl
+            thumbnail_url = pick_url(image_url, "url", "large", "normal")
+        if thumbnail_url:
+            item["thumbnailUrl"] = thumbnail_url
+
+        # Flyers don't have a PDF, their page images come from the pages API
+        return decoded(item)
 
     def parse_flyer_list_html(self, response):
         """Fallback: Extract flyer links from HTML"""
@@ -264,13 +239,7 @@ class FlyersSpider(scrapy.Spider):
             yield Request(
                 link,
                 callback=self.parse_flyer_details,
-                meta={
-                    "playwright": True,
-                    "playwright_page_methods": [
-                        PageMethod("wait_for_load_state", "domcontentloaded", timeout=60000),
-                        PageMethod("wait_for_timeout", 2000),
-                    ],
-                },
+                meta=browser_meta(wait_ms=2000, selector="h1", network_idle=True),
             )
 
     def parse_flyer_details(self, response):
@@ -306,8 +275,8 @@ class FlyersSpider(scrapy.Spider):
         pages = int(pages_match.group(1)) if pages_match else 1
 
         # Extract dates
-        valid_from = datetime.now(UTC)
-        valid_until = datetime.now(UTC)
+        valid_from = None
+        valid_until = None
 
         date_matches = re.findall(r"(\d{1,2})\.(\d{1,2})\.(\d{4})", body_text)
         if len(date_matches) >= 2:
@@ -317,11 +286,15 @@ class FlyersSpider(scrapy.Spider):
                 valid_from = datetime(int(year1), int(month1), int(day1))
                 valid_until = datetime(int(year2), int(month2), int(day2))
             except (ValueError, IndexError):
-                pass
+                valid_from = valid_until = None
 
         item["pages"] = pages
-        item["validFrom"] = valid_from
-        item["validUntil"] = valid_until
+        if valid_from and valid_until:
+            item["validFrom"] = valid_from
+            item["validUntil"] = valid_until
+        else:
+            set_placeholder(item, "validFrom", datetime.now(UTC))
+            set_placeholder(item, "validUntil", datetime.now(UTC))
         item["retailerId"] = retailer_name
 
         # Extract PDF URL
@@ -333,141 +306,150 @@ class FlyersSpider(scrapy.Spider):
 
         yield item
 
-    def parse_flyer_thumbnail(self, response):
-        """Parse flyer pages API to extract first page image as thumbnail"""
+    def _extract_thumbnail_url(self, page: Page):
+        """Pick a page image from the pages API to use as thumbnail"""
+        if not page.images:
+            return None
+        # Prefer a medium size (768x1024 or 1600x1600) as a balance between quality and size
+        for img in page.images:
+            if "768x1024" in img.size or "1600x1600" in img.size:
+                return img.url
+        # If no medium size found, use largest (usually last one)
+        return page.images[-1].url
+
+    def _pages_request(self, flyer_item, content_id, valid_until, revalidate: bool = True):
+        """Pages API request of a brochure, conditional if its response is stored"""
+        pages_api_url = f"https://content-viewer-be.kaufda.de/api/v1/brochures/{content_id}/pages?partner=kaufda_web&lat=52.522&lng=13.4161"
+        headers = self.pages_cache.conditional_headers(content_id) if self.pages_cache and revalidate else {}
+        meta = {
+            "playwright": False,  # JSON API, never needs a browser
+            "flyer_item": flyer_item,
+            "content_id": content_id,
+            "valid_until": valid_until,
+        }
+        if headers:
+            meta["handle_httpstatus_list"] = [304]
+        return Request(
+            pages_api_url,
+            headers=headers,
+            callback=self.parse_flyer_pages,
+            errback=self.errback_flyer_pages,
+            meta=meta,
+            dont_filter=True,
+            priority=1,  # Higher priority so flyers are saved before other work
+        )
+
+    def parse_flyer_pages(self, response):
+        """Parse flyer pages API response: thumbnail for the flyer item, then its offers
+
+        A 304 answer to a revalidation is parsed from the stored payload, a
+        full response is stored for the next run.
+        """
+        flyer_item = response.meta.get("flyer_item", {})
+        content_id = response.meta.get("content_id")
+        body = response.body
+        if self.pages_cache and content_id:
+            valid_until = response.meta.get("valid_until")
+            if response.status == 304:
+                body = self.pages_cache.revalidated(content_id, valid_until)
+                if body is None:
+                    # The stored payload can't be used after all: download it
+                    yield self._pages_request(flyer_item, content_id, valid_until, revalidate=False)
+                    return
+            else:
+                self.pages_cache.store(content_id, response, valid_until)
+        yield from self._parse_pages(body, flyer_item, content_id)
+
+    def _parse_pages(self, body: bytes, flyer_item, content_id):
+        """Yield the flyer item with its thumbnail, then its offers
+
+        The body is read page by page (see pages_api.iter_page_models), so
+        the flyer and the offers of the first page are yielded before the rest
+        of the body is parsed.
+        """
+        flyer_sent = False
+        page_count = 0
+        dropped = DroppedEntries(self.crawler.stats)
         try:
-            data = json.loads(response.text)
-            contents = data.get("contents", [])
-            flyer_item = response.meta.get("flyer_item", {})
-            content_id = response.meta.get("content_id")
-            
-            # Extract thumbnail from first page (page 0)
-            if contents:
-                first_page = contents[0]
-                images = first_page.get("images", [])
-                if images:
-                    # Use the largest image (usually last one) for best quality
-                    # But for thumbnail, we can use a medium size (768x1024 or 1600x1600)
-                    # Try to find a good balance between quality and size
-                    thumbnail_url = None
-                    for img in images:
-                        size = img.get("size", "")
-                        url = img.get("url")
-                        # Prefer 768x1024 or 1600x1600 for thumbnail
-                        if "768x1024" in size or "1600x1600" in size:
-                            thumbnail_url = url
-                            break
-                    # If no medium size found, use largest
-                    if not thumbnail_url:
-                        thumbnail_url = images[-1].get("url") if images else None
-                    
+            for page in iter_page_models(body, dropped):
+                page_count += 1
+                if not flyer_sent:
+                    # Extract thumbnail from first page (page 0)
+                    thumbnail_url = self._extract_thumbnail_url(page)
                     if thumbnail_url:
                         flyer_item["thumbnailUrl"] = thumbnail_url
                         self.logger.info(f"Extracted thumbnailUrl from pages API for {content_id}: {thumbnail_url[:80]}...")
-            
-            # Yield flyer item with thumbnail - this will update existing or create new
-            yield flyer_item
-            
+                    # Yield flyer before its offers so offers can be linked to it
+                    flyer_sent = True
+                    yield flyer_item
+
+                for offer in page.offers:
+                    if offer.content is not None and offer.content.type == "offer":
+                        yield self._offer_item(offer.content)
+        except ValidationError as e:
+            self.logger.error(f"Pages API response for {content_id} doesn't match its schema: {describe_errors(e)}")
+            self.crawler.stats.inc_value("schema/errors/PagesResponse")
         except Exception as e:
-            self.logger.error(f"Error parsing flyer thumbnail from API: {e}")
-            import traceback
-            self.logger.error(traceback.format_exc())
-            # Yield original item even if thumbnail extraction fails
-            flyer_item = response.meta.get("flyer_item", {})
+            self.logger.error(f"Error parsing flyer pages API for {content_id}: {e}")
+        if dropped.counts:
+            self.logger.warning(f"Dropped entries of the pages API response for {content_id} that don't match their schema: {dropped}")
+
+        self.logger.info(f"Found {page_count} pages for flyer {content_id}")
+        if not flyer_sent:
+            # Yield original item even if the pages API can't be parsed
             yield flyer_item
 
-    def parse_flyer_pages(self, response):
-        """Parse flyer pages API response to extract page images and offers"""
-        try:
-            data = json.loads(response.text)
-            contents = data.get("contents", [])
-            flyer_item = response.meta.get("flyer_item", {})
-            content_id = response.meta.get("content_id")
-            
-            self.logger.info(f"Found {len(contents)} pages for flyer {content_id}")
-            
-            # Note: thumbnailUrl should already be set from pages[0].url in parse_flyer_list
-            # But if not, we can extract from pages API as fallback
-            if contents:
-                first_page = contents[0]
-                images = first_page.get("images", [])
-                if images and not flyer_item.get("thumbnailUrl"):
-                    # Use the largest image (usually last one)
-                    thumbnail_url = images[-1].get("url") if images else None
-                    if thumbnail_url:
-                        # Create a flyer update item to update thumbnailUrl
-                        update_item = FlyerItem()
-                        update_item["url"] = flyer_item.get("url")
-                        update_item["thumbnailUrl"] = thumbnail_url
-                        update_item["title"] = flyer_item.get("title")  # Required field
-                        update_item["retailerId"] = flyer_item.get("retailerId")  # Required field
-                        update_item["pages"] = flyer_item.get("pages", 0)  # Required field
-                        update_item["validFrom"] = flyer_item.get("validFrom")  # Required field
-                        update_item["validUntil"] = flyer_item.get("validUntil")  # Required field
-                        self.logger.debug(f"Updating flyer with thumbnailUrl from pages API: {thumbnail_url}")
-                        yield update_item
-            
-            # Extract offers from all pages
-            for page_data in contents:
-                page_number = page_data.get("number", 0)
-                offers = page_data.get("offers", [])
-                
-                for offer_data in offers:
-                    offer_content = offer_data.get("content", {})
-                    if offer_content and offer_content.get("type") == "offer":
-                        # Create offer item
-                        offer_item = OfferItem()
-                        
-                        # Extract product info
-                        products = offer_content.get("products", [])
-                        if products:
-                            product = products[0]
-                            offer_item["productName"] = product.get("name", "")
-                            offer_item["brand"] = product.get("brandName")
-                            description_parts = product.get("description", [])
-                            if description_parts:
-                                offer_item["description"] = " ".join([d.get("paragraph", "") for d in description_parts if isinstance(d, dict)])
-                        
-                        # Extract price
-                        deals = offer_content.get("deals", [])
-                        if deals:
-                            deal = deals[0]
-                            offer_item["currentPrice"] = deal.get("min", 0.0) or deal.get("max", 0.0)
-                            offer_item["priceFormatted"] = f"{offer_item['currentPrice']} {deal.get('currencyCode', 'EUR')}"
-                            offer_item["priceFrequency"] = deal.get("frequency")
-                            offer_item["unitPrice"] = deal.get("priceByBaseUnit")
-                        
-                        # Extract image
-                        offer_item["imageUrl"] = offer_content.get("image")
-                        
-                        # Extract parent content info
-                        parent_content = offer_content.get("parentContent", {})
-                        if parent_content:
-                            offer_item["parentContentId"] = parent_content.get("id")
-                            page_info = parent_content.get("page", {})
-                            if page_info:
-                                offer_item["pageNumber"] = page_info.get("number")
-                        
-                        # Extract retailer
-                        publisher = offer_content.get("publisher", {})
-                        offer_item["retailerId"] = publisher.get("name", "")
-                        offer_item["publisherId"] = publisher.get("id")
-                        
-                        # Extract offer ID and URL
-                        offer_id = offer_content.get("id")
-                        offer_item["contentId"] = offer_id
-                        if offer_id:
-                            offer_item["url"] = f"{self.base_url}/Angebote/{offer_id}"
-                        
-                        # Extract category from categoryPaths
-                        category_paths = products[0].get("categoryPaths", []) if products else []
-                        if category_paths:
-                            # Use the most specific category (last one)
-                            offer_item["category"] = category_paths[-1].get("name")
-                        
-                        yield offer_item
-            
-        except Exception as e:
-            self.logger.error(f"Error parsing flyer pages API: {e}")
-            import traceback
-            self.logger.error(traceback.format_exc())
+    def _offer_item(self, content: OfferContent):
+        """Build an OfferItem from the content of an offer on a flyer page"""
+        offer_item = OfferItem()
+
+        # Extract product info
+        product = content.products[0]
+        offer_item["productName"] = product.name
+        offer_item["brand"] = product.brandName
+        if product.description:
+            offer_item["description"] = " ".join(d.paragraph for d in product.description if isinstance(d, Paragraph))
+
+        # Extract price
+        deal = content.deals[0]
+        offer_item["currentPrice"] = deal.price
+        offer_item["priceFormatted"] = f"{deal.price} {deal.currencyCode}"
+        offer_item["priceFrequency"] = deal.frequency
+        offer_item["unitPrice"] = deal.priceByBaseUnit
+        # Same oldPrice/discount as OffersSpider derives from secondaryPrice, so
+        # both spiders store (and hash) the same prices for an offer
+        regular = content.regular_deal
+        if regular and regular.price > deal.price:
+            offer_item["oldPrice"] = regular.price
+            discount = regular.price - deal.price
+            offer_item["discount"] = discount
+            offer_item["discountPercentage"] = (discount / regular.price) * 100
+
+        offer_item["imageUrl"] = content.image
+
+        # Extract parent content info
+        if content.parentContent:
+            offer_item["parentContentId"] = content.parentContent.id
+            if content.parentContent.page:
+                offer_item["pageNumber"] = content.parentContent.page.number
+
+        # Extract retailer
+        offer_item["retailerId"] = content.publisher.name
+        offer_item["publisherId"] = content.publisher.id
+
+        offer_item["contentId"] = content.id
+        offer_item["url"] = f"{self.base_url}/Angebote/{content.id}"
+
+        # Use the most specific category (last one)
+        if product.categoryPaths:
+            offer_item["category"] = product.categoryPaths[-1].name
+
+        return decoded(offer_item)
+
+    def errback_flyer_pages(self, failure):
+        """Keep the flyer when its pages API request fails"""
+        content_id = failure.request.meta.get("content_id")
+        self.logger.warning(f"Failed to fetch pages API for flyer {content_id}: {failure.value}")
+        flyer_item = failure.request.meta.get("flyer_item")
+        if flyer_item:
+            yield flyer_item
@@ -0,0 +1,39 @@
+"""Homepage snapshot spider"""
+import scrapy
+from scrapy.http import Request
+from ..next_data import extract_next_data
+from ..rendering import next_data_meta
+from ..snapshot import save_homepage_snapshot
+
+
+class HomepageSpider(scrapy.Spider):
+    """Fetch the kaufDA.de homepage once per run for the other spiders
+
+    Yields no items: the parsed __NEXT_DATA__ JSON is stored as the run's
+    homepage snapshot (see scraper/snapshot.py).
+    """
+    name = "homepage"
+    allowed_domains = ["kaufda.de", "www.kaufda.de"]
+    start_urls = ["https://www.kaufda.de"]
+    custom_settings = {
+        "ITEM_PIPELINES": {},
+    }
+
+    async def start(self):
+        # Rendered with Playwright only if the plain response lacks __NEXT_DATA__
+        for url in self.start_urls:
+            yield Request(url, meta=next_data_meta(wait_ms=5000), dont_filter=True)
+
+    def parse(self, response):
+        """Store the __NEXT_DATA__ JSON as the homepage snapshot"""
+        json_data = extract_next_data(response, self.crawler.stats)
+        if not json_data:
+            self.logger.warning("Could not find valid __NEXT_DATA__ JSON, spiders will load the homepage themselves")
+            return []
+
+        path = save_homepage_snapshot(self.settings, json_data)
+        if path:
+            self.logger.info(f"📸 Saved homepage snapshot to {path}")
+        else:
+            self.logger.warning("HOMEPAGE_SNAPSHOT_RUN_ID is not set, snapshot not saved")
+        return []
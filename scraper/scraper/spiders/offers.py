@@ -2,12 +2,14 @@
 import re
 import json
 import scrapy
-from datetime import datetime
-from scrapy_playwright.page import PageMethod
+from pydantic import ValidationError
+from ..next_data import extract_next_data
+from ..snapshot import HomepageSnapshotMixin
 from ..items import OfferItem
+from ..schemas import HomepageData, Offer, Preview, decode, decoded, describe_errors
 
 
-class OffersSpider(scrapy.Spider):
+class OffersSpider(HomepageSnapshotMixin, scrapy.Spider):
     """Spider for scraping offers from kaufDA.de"""
     name = "offers"
     allowed_domains = ["kaufda.de", "www.kaufda.de"]
@@ -18,34 +20,9 @@ class OffersSpider(scrapy.Spider):
         self.base_url = "https://www.kaufda.de"
 
     def parse(self, response):
-        """Parse main page and extract offer data from JSON"""
-        yield response.follow(
-            response.url,
-            callback=self.parse_offers,
-            meta={
-                "playwright": True,
-                "playwright_page_methods": [
-                    PageMethod("wait_for_load_state", "domcontentloaded", timeout=60000),
-                    PageMethod("wait_for_timeout", 5000),
-                ],
-            },
-        )
-
-    def parse_offers(self, response):
         """Extract offer data from embedded JSON"""
         # Extract JSON data from __NEXT_DATA__ script tag
-        json_data = None
-        script_tags = response.css('script#__NEXT_DATA__::text').getall()
-        
-        if not script_tags:
-            script_tags = response.xpath('//script[@id="__NEXT_DATA__"]/text()').getall()
-        
-        for script_content in script_tags:
-            try:
-                json_data = json.loads(script_content)
-                break
-            except json.JSONDecodeError:
-                continue
+        json_data = extract_next_data(response, self.crawler.stats, model=HomepageData)
         
         if not json_data:
             self.logger.warning("Could not find __NEXT_DATA__ JSON")
@@ -53,122 +30,96 @@ class OffersSpider(scrapy.Spider):
             for item in self.parse_offers_html(response):
                 yield item
             return
-        
-        # Extract offers from JSON
+
+        yield from self.parse_homepage_data(json_data, response)
+
+    def parse_homepage_data(self, json_data, response):
+        """Extract offers from the homepage __NEXT_DATA__ JSON"""
         try:
-            page_props = json_data.get("props", {}).get("pageProps", {})
-            # Try pageInformation first, then fallback to direct
-            page_info = page_props.get("pageInformation", {})
-            offers_data = page_info.get("offers", {}) or page_props.get("offers", {})
-            main_offers = offers_data.get("main", {}).get("items", [])
-            
+            if not isinstance(json_data, HomepageData):
+                json_data = decode(HomepageData, json_data, self.crawler.stats)
+            main_offers = json_data.offers.main.items
+
             self.logger.info(f"Found {len(main_offers)} offers in JSON")
-            
+
             for offer in main_offers:
-                item = OfferItem()
-                
-                # Extract basic info
-                item["productName"] = offer.get("title", "")
-                item["brand"] = offer.get("brand")
-                item["contentId"] = offer.get("id")
-                item["publisherId"] = offer.get("publisherId")
-                
-                # Description might be in different places
-                description = offer.get("description")
-                if not description:
-                    preview = offer.get("preview")
-                    if isinstance(preview, dict):
-                        description = preview.get("description")
-                item["description"] = description
-                
-                # Extract parent content (flyer info)
-                parent_content = offer.get("parentContent", {})
-                if parent_content:
-                    item["parentContentId"] = parent_content.get("id")
-                    page_info = parent_content.get("page", {})
-                    if page_info:
-                        item["pageNumber"] = page_info.get("number")
-                
-                # Extract prices
-                prices = offer.get("prices", {})
-                item["currentPrice"] = prices.get("mainPrice", 0.0) or prices.get("price", 0.0) or 0.0
-                item["priceFormatted"] = prices.get("mainPriceFormatted")
-                item["priceFrequency"] = prices.get("mainPriceFrequency")
-                
-                # Extract price conditions
-                conditions = prices.get("conditions", [])
-                if conditions:
-                    import json
-                    item["priceConditions"] = json.dumps(conditions)
-                
-                # Extract unit price
-                unit_price = prices.get("priceByBaseUnit")
-                if unit_price:
-                    item["unitPrice"] = unit_price
-                
-                # Try multiple fields for old price
-                secondary_price = prices.get("secondaryPrice", 0.0)
-                item["oldPriceFormatted"] = prices.get("secondaryPriceFormatted")
-                
-                # Set oldPrice if secondary_price exists and is greater than currentPrice
-                if secondary_price and secondary_price > 0 and secondary_price > item["currentPrice"]:
-                    item["oldPrice"] = secondary_price
-                    # Calculate discount
-                    discount = secondary_price - item["currentPrice"]
-                    item["discount"] = discount
-                    item["discountPercentage"] = (discount / secondary_price) * 100
-                
-                # Extract dates
-                valid_from_str = offer.get("validFrom")
-                valid_until_str = offer.get("validUntil")
-                
-                if valid_from_str:
-                    try:
-                        item["validFrom"] = datetime.fromisoformat(valid_from_str.replace("+0000", "+00:00"))
-                    except (ValueError, AttributeError):
-                        pass
-                
-                if valid_until_str:
-                    try:
-                        item["validUntil"] = datetime.fromisoformat(valid_until_str.replace("+0000", "+00:00"))
-                    except (ValueError, AttributeError):
-                        pass
-                
-                # Extract image URL and metadata
-                offer_images = offer.get("offerImages", {})
-                image_url = offer_images.get("url", {})
-                if image_url:
-                    item["imageUrl"] = image_url.get("large") or image_url.get("normal") or image_url.get("thumbnail")
-                
-                # Extract image metadata
-                image_metadata = offer_images.get("metaData", {})
-                if image_metadata:
-                    item["imageAlt"] = image_metadata.get("imageAlt")
-                    item["imageTitle"] = image_metadata.get("imageTitle")
-                
-                # Extract retailer
-                retailer_name = offer.get("publisherName", "")
-                item["retailerId"] = retailer_name
-                
-                # Extract URL (construct from offer ID)
-                offer_id = offer.get("id", "")
-                if offer_id:
-                    item["url"] = f"{self.base_url}/Angebote/{offer_id}"
-                else:
-                    item["url"] = response.url
-                
-                # Extract category (if available)
-                parent_content = offer.get("parentContent", {})
-                item["category"] = parent_content.get("type")
-                
-                yield item
-                
+                yield self._offer_item(offer)
+
+        except ValidationError as e:
+            self.logger.error(f"Homepage JSON doesn't match its schema: {describe_errors(e)}")
+            self.crawler.stats.inc_value("schema/errors/HomepageData")
+            yield from self.parse_offers_html(response)
         except Exception as e:
             self.logger.error(f"Error parsing JSON offer data: {e}")
             # Fallback to HTML parsing
             for item in self.parse_offers_html(response):
                 yield item
 
+    def _offer_item(self, offer: Offer):
+        """Build an OfferItem from a homepage offer"""
+        item = OfferItem()
+
+        # Extract basic info
+        item["productName"] = offer.title
+        item["brand"] = offer.brand
+        item["contentId"] = offer.id
+        item["publisherId"] = offer.publisherId
+
+        # Description might be in different places
+        description = offer.description
+        if not description and isinstance(offer.preview, Preview):
+            description = offer.preview.description
+        item["description"] = description
+
+        # Extract parent content (flyer info)
+        parent_content = offer.parentContent
+        if parent_content:
+            item["parentContentId"] = parent_content.id
+            if parent_content.page:
+                item["pageNumber"] = parent_content.page.number
+
+        # Extract category (if available)
+        item["category"] = parent_content.type if parent_content else None
+
+        # Extract prices
+        prices = offer.prices
+        item["currentPrice"] = prices.current
+        item["priceFormatted"] = prices.mainPriceFormatted
+        item["priceFrequency"] = prices.mainPriceFrequency
+        if prices.conditions:
+            item["priceConditions"] = json.dumps(prices.conditions)
+        if prices.priceByBaseUnit:
+            item["unitPrice"] = prices.priceByBaseUnit
+
+        item["oldPriceFormatted"] = prices.secondaryPriceFormatted
+        # Set oldPrice if the secondary price is greater than currentPrice
+        secondary_price = prices.secondaryPrice
+        if secondary_price and secondary_price > item["currentPrice"]:
+            item["oldPrice"] = secondary_price
+            # Calculate discount
+            discount = secondary_price - item["currentPrice"]
+            item["discount"] = discount
+            item["discountPercentage"] = (discount / secondary_price) * 100
+
+        # Extract dates
+        if offer.validFrom:
+            item["validFrom"] = offer.validFrom
+        if offer.validUntil:
+            item["validUntil"] = offer.validUntil
+
+        # Extract image URL and metadata
+        if offer.offerImages:
+            if offer.offerImages.url:
+                item["imageUrl"] = offer.offerImages.url.first("large", "normal", "thumbnail")
+            if offer.offerImages.metaData:
+                item["imageAlt"] = offer.offerImages.metaData.imageAlt
+                item["imageTitle"] = offer.offerImages.metaData.imageTitle
+
+        item["retailerId"] = offer.publisherName
+        item["url"] = f"{self.base_url}/Angebote/{offer.id}"
+
+        return decoded(item)
+
     def parse_offers_html(self, response):
         """Fallback: Extract offers from HTML"""
         # Try to find offer elements
@@ -1,19 +1,14 @@
 """Retailer spider"""
-import json
 import scrapy
-from scrapy_playwright.page import PageMethod
+from ..next_data import extract_next_data
+from ..rendering import next_data_meta
+from ..snapshot import HomepageSnapshotMixin
+from ..geocoding import GeocodingService
+from ..store_finder import StoreFinder
 from ..items import RetailerItem, StoreItem
 
-# Geocoding for address to coordinates (optional, only if coordinates not in JSON)
-try:
-    from geopy.geocoders import Nominatim
-    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-    GEOCODING_AVAILABLE = True
-except ImportError:
-    GEOCODING_AVAILABLE = False
 
-
-class RetailersSpider(scrapy.Spider):
+class RetailersSpider(HomepageSnapshotMixin, scrapy.Spider):
     """Spider for scraping retailers from kaufDA.de"""
     name = "retailers"
     allowed_domains = ["kaufda.de", "www.kaufda.de"]
@@ -22,50 +17,45 @@ class RetailersSpider(scrapy.Spider):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.base_url = "https://www.kaufda.de"
-        # Initialize geocoder if available (for fallback when coordinates not in JSON)
-        if GEOCODING_AVAILABLE:
-            try:
-                self.geocoder = Nominatim(user_agent="off-board-scraper/1.0", timeout=10)
-            except Exception:
-                self.geocoder = None
-                self.logger.warning("Failed to initialize geocoder")
-        else:
-            self.geocoder = None
+        self.geocoding = None
+        self.store_finder = StoreFinder()
 
-    def parse(self, response):
-        """Parse main page and extract retailer data from JSON"""
-        yield response.follow(
-            response.url,
-            callback=self.parse_retailers,
-            meta={
-                "playwright": True,
-                "playwright_page_methods": [
-                    PageMethod("wait_for_load_state", "domcontentloaded", timeout=60000),
-                    PageMethod("wait_for_timeout", 5000),
-                ],
-            },
-        )
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # Geocoding fallback for stores without coordinates in JSON (None if geopy is missing)
+        spider.geocoding = GeocodingService.from_crawler(crawler)
+        return spider
+
+    def _geocode(self, retailer_name, address, postal_code, city, latitude, longitude):
+        """Fill missing coordinates from the geocoding cache
+
+        Uncached addresses are geocoded in the background and the store's
+        coordinates are backfilled when the spider closes.
+        """
+        if (latitude is None or longitude is None) and self.geocoding and address and city:
+            coords = self.geocoding.resolve(retailer_name, address, postal_code, city)
+            if coords:
+                if latitude is None:
+                    latitude = coords[0]
+                if longitude is None:
+                    longitude = coords[1]
+        return latitude, longitude
 
-    def parse_retailers(self, response):
+    def parse(self, response):
         """Extract retailer data from embedded JSON"""
         # Extract JSON data from __NEXT_DATA__ script tag
-        json_data = None
-        script_tags = response.css('script#__NEXT_DATA__::text').getall()
-        
-        if not script_tags:
-            script_tags = response.xpath('//script[@id="__NEXT_DATA__"]/text()').getall()
-        
-        for script_content in script_tags:
-            try:
-                json_data = json.loads(script_content)
-                break
-            except json.JSONDecodeError:
-                continue
+        json_data = extract_next_data(response, self.crawler.stats)
         
         if not json_data:
             self.logger.warning("Could not find __NEXT_DATA__ JSON")
-            return self.parse_retailers_html(response)
-        
+            yield from self.parse_retailers_html(response)
+            return
+
+        yield from self.parse_homepage_data(json_data, response)
+
+    def parse_homepage_data(self, json_data, response):
+        """Extract retailers from the homepage __NEXT_DATA__ JSON"""
         retailers = []
         seen_names = set()
         
@@ -206,16 +196,12 @@ class RetailersSpider(scrapy.Spider):
                         yield response.follow(
                             url_patterns[0],
                             callback=self.parse_retailer_stores,
-                            meta={
-                                "playwright": True,
-                                "playwright_page_methods": [
-                                    PageMethod("wait_for_load_state", "domcontentloaded", timeout=60000),
-                                    PageMethod("wait_for_timeout", 5000),
-                                ],
-                                "retailer_name": retailer_name,
-                                "retailer_id": item.get("id"),  # If available
-                                "alternative_urls": url_patterns[1:],  # Try alternatives if first fails
-                            },
+                            meta=next_data_meta(
+                                wait_ms=5000,
+                                retailer_name=retailer_name,
+                                retailer_id=item.get("id"),  # If available
+                                alternative_urls=url_patterns[1:],  # Try alternatives if first fails
+                            ),
                             errback=self.errback_retailer_stores,
                         )
             
@@ -225,7 +211,7 @@ class RetailersSpider(scrapy.Spider):
                 
         except Exception as e:
             self.logger.error(f"Error parsing JSON retailer data: {e}")
-            return self.parse_retailers_html(response)
+            yield from self.parse_retailers_html(response)
     
     def _extract_stores_from_json(self, json_data: dict, retailer_names: set):
         """Extract store data from JSON if available"""
@@ -307,18 +293,7 @@ class RetailersSpider(scrapy.Spider):
                                 longitude = None
                         
                         # If coordinates not found in JSON, try geocoding (fallback)
-                        if (latitude is None or longitude is None) and self.geocoder and address and city:
-                            try:
-                                geocode_address = f"{address}, {postal_code} {city}, Germany"
-                                location = self.geocoder.geocode(geocode_address, timeout=10)
-                                if location:
-                                    if latitude is None:
-                                        latitude = location.latitude
-                                    if longitude is None:
-                                        longitude = location.longitude
-                                    self.logger.debug(f"Geocoded address: {geocode_address} -> ({latitude}, {longitude})")
-                            except (GeocoderTimedOut, GeocoderServiceError, Exception) as e:
-                                self.logger.debug(f"Geocoding failed for {address}, {city}: {e}")
+                        latitude, longitude = self._geocode(retailer_name, address, postal_code, city, latitude, longitude)
                         
                         store_item["latitude"] = latitude
                         store_item["longitude"] = longitude
@@ -388,18 +363,7 @@ class RetailersSpider(scrapy.Spider):
             return
         
         # Extract JSON data from __NEXT_DATA__ script tag
-        json_data = None
-        script_tags = response.css('script#__NEXT_DATA__::text').getall()
-        
-        if not script_tags:
-            script_tags = response.xpath('//script[@id="__NEXT_DATA__"]/text()').getall()
-        
-        for script_content in script_tags:
-            try:
-                json_data = json.loads(script_content)
-                break
-            except json.JSONDecodeError:
-                continue
+        json_data = extract_next_data(response, self.crawler.stats)
         
         if not json_data:
             self.logger.warning(f"Could not find __NEXT_DATA__ JSON for retailer {retailer_name}")
@@ -411,10 +375,12 @@ class RetailersSpider(scrapy.Spider):
                 yield response.follow(
                     next_url,
                     callback=self.parse_retailer_stores,
-                    meta={
-                        **response.meta,
-                        "alternative_urls": alternative_urls[1:],
-                    },
+                    meta=next_data_meta(
+                        wait_ms=5000,
+                        retailer_name=retailer_name,
+                        retailer_id=response.meta.get("retailer_id"),
+                        alternative_urls=alternative_urls[1:],
+                    ),
                     errback=self.errback_retailer_stores,
                 )
             return
@@ -432,14 +398,7 @@ class RetailersSpider(scrapy.Spider):
                 yield response.follow(
                     full_url,
                     callback=self.parse_store_page,
-                    meta={
-                        "playwright": True,
-                        "playwright_page_methods": [
-                            PageMethod("wait_for_load_state", "domcontentloaded", timeout=60000),
-                            PageMethod("wait_for_timeout", 3000),
-                        ],
-                        "retailer_name": retailer_name,
-                    },
+                    meta=next_data_meta(wait_ms=3000, retailer_name=retailer_name),
                 )
         
         # Yield all extracted stores
@@ -455,43 +414,9 @@ class RetailersSpider(scrapy.Spider):
         stores = []
         
         try:
-            # Deep recursive search for store data
-            def find_store_objects(obj, path="", depth=0, max_depth=20):
-                """Recursively find store-like objects"""
-                if depth > max_depth:
-                    return []
-                
-                found_stores = []
-                
-                if isinstance(obj, dict):
-                    # Check if this is a store-like object
-                    store_fields = ['address', 'city', 'postalCode', 'street', 'postcode', 'zipCode']
-                    found_fields = [k for k in store_fields if k in obj]
-                    
-                    if len(found_fields) >= 2:  # At least 2 store fields
-                        found_stores.append(obj)
-                    
-                    # Check for store-related keys
-                    store_keys = ['stores', 'locations', 'branches', 'filialen', 'standorte', 'storeLocations', 'store_locations']
-                    for key in store_keys:
-                        if key in obj:
-                            value = obj[key]
-                            if isinstance(value, list):
-                                for item in value:
-                                    if isinstance(item, dict):
-                                        found_stores.extend(find_store_objects(item, f"{path}.{key}", depth+1, max_depth))
-                    
-                    # Recursively search
-                    for k, v in obj.items():
-                        found_stores.extend(find_store_objects(v, f"{path}.{k}" if path else k, depth+1, max_depth))
-                
-                elif isinstance(obj, list):
-                    for i, item in enumerate(obj):
-                        found_stores.extend(find_store_objects(item, f"{path}[{i}]", depth+1, max_depth))
-                
-                return found_stores
-            
-            all_store_objects = find_store_objects(json_data)
+            # Single pass over the page JSON; template paths learned on earlier pages are read directly
+            all_store_objects = self.store_finder.find(json_data, template=json_data.get("page"))
+            self.crawler.stats.inc_value(f"store_finder/{self.store_finder.last_source}")
             
             # Convert found objects to StoreItems
             seen_stores = set()
@@ -572,19 +497,7 @@ class RetailersSpider(scrapy.Spider):
                         longitude = None
                 
                 # If coordinates not found in JSON, try geocoding (fallback)
-                if (latitude is None or longitude is None) and self.geocoder and address and city:
-                    try:
-                        # Build address string for geocoding
-                        geocode_address = f"{address}, {postal_code} {city}, Germany"
-                        location = self.geocoder.geocode(geocode_address, timeout=10)
-                        if location:
-                            if latitude is None:
-                                latitude = location.latitude
-                            if longitude is None:
-                                longitude = location.longitude
-                            self.logger.debug(f"Geocoded address: {geocode_address} -> ({latitude}, {longitude})")
-                    except (GeocoderTimedOut, GeocoderServiceError, Exception) as e:
-                        self.logger.debug(f"Geocoding failed for {address}, {city}: {e}")
+                latitude, longitude = self._geocode(retailer_name, address, postal_code, city, latitude, longitude)
                 
                 store_item["latitude"] = latitude
                 store_item["longitude"] = longitude
@@ -623,18 +536,7 @@ class RetailersSpider(scrapy.Spider):
             return
         
         # Extract JSON from store page
-        json_data = None
-        script_tags = response.css('script#__NEXT_DATA__::text').getall()
-        
-        if not script_tags:
-            script_tags = response.xpath('//script[@id="__NEXT_DATA__"]/text()').getall()
-        
-        for script_content in script_tags:
-            try:
-                json_data = json.loads(script_content)
-                break
-            except json.JSONDecodeError:
-                continue
+        json_data = extract_next_data(response, self.crawler.stats)
         
         if json_data:
             stores = self._extract_stores_from_retailer_json(json_data, retailer_name)
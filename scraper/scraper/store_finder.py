@@ -0,0 +1,122 @@
+"""Store lookup in __NEXT_DATA__ trees"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A dict with at least two of these keys looks like a store
+STORE_FIELDS = ("address", "city", "postalCode", "street", "postcode", "zipCode")
+
+
+def is_store_like(obj: Any) -> bool:
+    """True for dicts carrying at least two address fields"""
+    if not isinstance(obj, dict):
+        return False
+    return sum(1 for field in STORE_FIELDS if field in obj) >= 2
+
+
+def format_path(link) -> str:
+    """Render a ``(parent link, key)`` chain as ``a.b[0].c``"""
+    keys = path_keys(link)
+    path = ""
+    for key in keys:
+        path += f"[{key}]" if isinstance(key, int) else (f".{key}" if path else key)
+    return path
+
+
+def path_keys(link) -> Tuple:
+    """Keys from the root down to the node of a ``(parent link, key)`` chain"""
+    keys = []
+    while link is not None:
+        link, key = link
+        keys.append(key)
+    return tuple(reversed(keys))
+
+
+class StoreFinder:
+    """Find store-like objects in a page's JSON
+
+    The tree is walked once, iteratively, in document order; every node is
+    visited at most once, so no store is reported twice. Paths are kept as
+    cheap ``(parent link, key)`` chains and only turned into strings for
+    debug logging.
+
+    When all stores of a page sit in the same list, the path to that list is
+    remembered for the page's template (the Next.js ``page`` value, e.g.
+    ``/Geschaefte/[slug]``). Later pages of that template are read from the
+    remembered path directly, falling back to a full walk if it no longer
+    yields stores.
+    """
+
+    def __init__(self, max_depth: int = 20):
+        self.max_depth = max_depth
+        self.known_paths: Dict[str, Tuple] = {}
+        self.last_source = None  # "known_path" or "scan", for stats
+
+    def find(self, json_data: Any, template: Optional[str] = None) -> List[dict]:
+        """Return the store-like objects of ``json_data`` in document order"""
+        if template and template in self.known_paths:
+            stores = self._read_known_path(json_data, self.known_paths[template])
+            if stores:
+                self.last_source = "known_path"
+                return stores
+            logger.debug(f"Known store path for {template} is stale, scanning the page")
+            del self.known_paths[template]
+
+        self.last_source = "scan"
+        stores, links = self._scan(json_data)
+        if template and stores:
+            self._learn(template, links)
+        return stores
+
+    @staticmethod
+    def _read_known_path(json_data: Any, keys: Tuple) -> List[dict]:
+        node = json_data
+        for key in keys:
+            try:
+                node = node[key]
+            except (KeyError, IndexError, TypeError):
+                return []
+        if not isinstance(node, list):
+            return []
+        return [item for item in node if is_store_like(item)]
+
+    def _scan(self, json_data: Any) -> Tuple[List[dict], List]:
+        """Depth-first walk with an explicit stack"""
+        stores = []
+        links = []
+        seen = set()
+        debug = logger.isEnabledFor(logging.DEBUG)
+        stack = [(json_data, 0, None)]
+        while stack:
+            node, depth, link = stack.pop()
+            if depth > self.max_depth or id(node) in seen:
+                continue
+            if isinstance(node, dict):
+                seen.add(id(node))
+                if is_store_like(node):
+                    stores.append(node)
+                    links.append(link)
+                    if debug:
+                        logger.debug(f"Store-like object at {format_path(link) or '<root>'}")
+                children = node.items()
+            elif isinstance(node, list):
+                seen.add(id(node))
+                children = enumerate(node)
+            else:
+                continue
+            # Reversed, so children are popped in document order
+            stack.extend((child, depth + 1, (link, key)) for key, child in reversed(list(children)))
+        return stores, links
+
+    def _learn(self, template: str, links: List) -> None:
+        """Remember the list holding all stores, if there is exactly one"""
+        parents = {id(link[0]) if link else None for link in links}
+        parent = links[0][0] if links[0] else None
+        if len(parents) != 1 or parent is None:
+            return
+        keys = path_keys(parent)
+        if not keys or not all(isinstance(link[1], int) for link in links):
+            return
+        self.known_paths[template] = keys
+        logger.debug(f"Learned store path for {template}: {format_path(parent)}")
@@ -0,0 +1,83 @@
+"""Database writer running off the Twisted reactor thread"""
+import logging
+import threading
+import weakref
+
+from twisted.internet import defer, reactor, threads
+from twisted.python.threadpool import ThreadPool
+
+logger = logging.getLogger(__name__)
+
+# One writer per crawler, shared by all pipelines of that crawler
+_writers = weakref.WeakKeyDictionary()
+
+
+class DatabaseWriter:
+    """Run blocking database calls in a dedicated thread pool
+
+    Calls go through a bounded queue: at most ``queue_size`` calls are pending
+    at once and every caller gets a Deferred that fires once its call has run.
+    Pipelines return these Deferreds to Scrapy, so item processing slows down
+    by itself when the database can't keep up.
+
+    With the default single thread calls run in submission order, which keeps
+    retailers ahead of the stores and flyers that reference them.
+    """
+
+    def __init__(self, threads: int = 1, queue_size: int = 100, name: str = "db-writer"):
+        self.pool = ThreadPool(minthreads=1, maxthreads=max(1, threads), name=name)
+        self.queue = defer.DeferredSemaphore(max(1, queue_size))
+        self.pending = set()
+        self.users = 0
+        self.lock = threading.Lock()  # For callers that share state with the writer threads
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Return the writer shared by all pipelines of a crawler"""
+        writer = _writers.get(crawler)
+        if writer is None:
+            settings = crawler.settings
+            writer = cls(
+                threads=settings.getint("DATABASE_WRITER_THREADS", 1),
+                queue_size=settings.getint("DATABASE_WRITER_QUEUE_SIZE", 100),
+            )
+            _writers[crawler] = writer
+        return writer
+
+    def open(self):
+        """Register a user of the writer, starting the thread pool if needed"""
+        self.users += 1
+        if not self.pool.started:
+            self.pool.start()
+
+    def submit(self, func, *args, **kwargs) -> defer.Deferred:
+        """Queue a blocking call; the returned Deferred fires with its result"""
+        finished = defer.Deferred()
+        self.pending.add(finished)
+
+        def _done(result):
+            self.pending.discard(finished)
+            finished.callback(None)
+            return result
+
+        d = self.queue.run(threads.deferToThreadPool, reactor, self.pool, func, *args, **kwargs)
+        return d.addBoth(_done)
+
+    def drain(self) -> defer.Deferred:
+        """Deferred that fires once every call submitted so far has finished"""
+        if not self.pending:
+            return defer.succeed(None)
+        return defer.DeferredList(list(self.pending)).addCallback(lambda _: None)
+
+    def close(self) -> defer.Deferred:
+        """Unregister a user; the last one drains the queue and stops the threads"""
+        self.users -= 1
+        d = self.drain()
+        if self.users <= 0:
+            d.addBoth(self._stop)
+        return d
+
+    def _stop(self, result):
+        if self.pool.started:
+            self.pool.stop()
+        return result
@@ -3,8 +3,10 @@ import sys
 import os
 import json
 from datetime import datetime, UTC
+from scrapy import signals
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
+from twisted.internet import defer
 
 # Add parent directory to path
 scraper_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,6 +19,70 @@ os.chdir(scraper_dir)
 
 from database.session import get_db_session
 from models import ScrapingLog
+from scraper.checkpoint import RunState
+
+SPIDERS = ["retailers", "flyers", "offers"]
+
+
+def crawl(process, run, name):
+    """Run a spider with its own JOBDIR, recording in run.json when it finishes"""
+    crawler = process.create_crawler(name)
+    # The crawler's settings are a copy, frozen only once it starts
+    crawler.settings.set("JOBDIR", run.spider_jobdir(name))
+
+    def spider_closed(spider, reason):
+        # "shutdown" (stopped) or errors leave the spider to be resumed
+        if reason == "finished":
+            run.mark_finished(name)
+
+    crawler.signals.connect(spider_closed, signal=signals.spider_closed, weak=False)
+    return process.crawl(crawler)
+
+
+@defer.inlineCallbacks
+def crawl_all(process, run):
+    """Take the homepage snapshot, then run the spiders side by side
+
+    Spiders that finished before the run was stopped are not run again.
+    """
+    if "homepage" not in run.finished:
+        yield crawl(process, run, "homepage")
+        if "homepage" not in run.finished:
+            return  # Stopped: the other spiders need the snapshot
+    yield defer.DeferredList([
+        crawl(process, run, name) for name in SPIDERS if name not in run.finished
+    ])
+
+
+def resumable_log_id(run):
+    """ScrapingLog entry of the stopped run to resume, None if there is none"""
+    if not run.log_id:
+        return None
+    with get_db_session() as session:
+        log = session.query(ScrapingLog).filter(ScrapingLog.id == run.log_id).first()
+        return log.id if log and log.status == "running" else None
+
+
+def abandon_log(log_id):
+    """Mark the entry of a stopped run that is not resumed as failed"""
+    with get_db_session() as session:
+        log = session.query(ScrapingLog).filter(ScrapingLog.id == log_id).first()
+        if log and log.status == "running":
+            log.status = "failed"
+            log.completedAt = datetime.now(UTC)
+            log.errors = json.dumps(["Stopped and not resumed: a fresh run was started"])
+            session.commit()
+
+
+def stop_reactor():
+    """Stop the reactor installed by CrawlerProcess"""
+    from twisted.internet import reactor
+    from twisted.internet.error import ReactorNotRunning
+    if reactor.running:
+        try:
+            reactor.stop()
+        except ReactorNotRunning:
+            pass  # Already stopping after SIGTERM/SIGINT
 
 
 def main():
@@ -24,35 +90,61 @@ def main():
     log_id = None
     
     try:
-        # Create scraping log
-        with get_db_session() as session:
-            log = ScrapingLog(
-                type="all",
-                status="running",
-                startedAt=datetime.now(UTC),
-                itemsScraped=0,
-            )
-            session.add(log)
-            session.commit()
-            log_id = log.id
-
         # Get Scrapy settings (must be in scraper directory where scrapy.cfg is)
         settings = get_project_settings()
+        run = RunState(settings.get("JOBS_DIR", "jobs"))
+
+        # Resume a stopped run unless asked to start over
+        if "--fresh" not in sys.argv:
+            log_id = resumable_log_id(run)
+        if log_id:
+            run.resume()
+            print(f"\n⏯️  Resuming run {log_id} (finished: {', '.join(run.finished) or 'none'})")
+        else:
+            if run.log_id:
+                abandon_log(run.log_id)
+            # Create scraping log
+            with get_db_session() as session:
+                log = ScrapingLog(
+                    type="all",
+                    status="running",
+                    startedAt=datetime.now(UTC),
+                    itemsScraped=0,
+                )
+                session.add(log)
+                session.commit()
+                log_id = log.id
+            run.start(log_id)
+
         settings.set("USER_AGENT", "kaufda-scraper/1.0")
+        # Progress goes to this run's log entry, also after a resume
+        settings.set("SCRAPING_LOG_ID", log_id)
+        # The homepage is fetched once and shared by all spiders of this run
+        settings.set("HOMEPAGE_SNAPSHOT_RUN_ID", log_id)
+        if "--backfill" in sys.argv:
+            # Bootstrap load: spool items and COPY them in when each spider closes
+            settings.set("DATABASE_WRITE_MODE", "backfill")
+        if "--incremental" in sys.argv:
+            # Only new or changed brochures get their pages and offers fetched
+            settings.set("INCREMENTAL_MODE", True)
 
         # Create crawler process
         process = CrawlerProcess(settings)
 
-        # Add all spiders
-        process.crawl("retailers")
-        process.crawl("flyers")
-        process.crawl("offers")
-
         # Start crawling
         print("\n" + "=" * 80)
         print("🚀 Starting scraping process...")
         print("=" * 80 + "\n")
-        process.start()
+        crawl_all(process, run).addBoth(lambda _: stop_reactor())
+        process.start(stop_after_crawl=False)
+
+        unfinished = [name for name in ["homepage", *SPIDERS] if name not in run.finished]
+        if unfinished:
+            # The log entry stays "running": the next start resumes the run
+            print(f"\n⏸️  Stopped before {', '.join(unfinished)} finished. "
+                  f"Run scrape_all.py again to resume, or with --fresh to start over.")
+            sys.exit(1)
+        run.clear()
 
         # Get final statistics
         with get_db_session() as session:
@@ -82,6 +174,20 @@ def main():
                 if duration > 0:
                     rate = log.itemsScraped / duration
                     print(f"   • Average speed: {rate:.2f} items/second")
+
+                # Work skipped in incremental mode, as reported by the flyers spider
+                try:
+                    progress = json.loads(log.metadata_json or "{}").get("progress", {})
+                except ValueError:
+                    progress = {}
+                incremental = progress.get("flyers", {}).get("incremental")
+                if incremental:
+                    skipped = incremental.get("brochures_skipped", 0)
+                    listed = skipped + incremental.get("brochures_new", 0) + incremental.get("brochures_changed", 0)
+                    print(f"\n⏭️  Incremental Mode:")
+                    print(f"   • Brochures unchanged and skipped: {skipped} of {listed}")
+                    print(f"   • New: {incremental.get('brochures_new', 0)}, changed: {incremental.get('brochures_changed', 0)}")
+                    print(f"   • Pages API requests avoided: {skipped}")
                 
                 print(f"\n📦 Database Totals:")
                 print(f"   • Flyers: {flyers_count}")
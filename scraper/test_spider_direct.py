@@ -98,21 +98,21 @@ response = HtmlResponse(url="https://www.kaufda.de", body=html_content.encode('u
 
 print("=== Testing FlyersSpider ===")
 flyer_spider = FlyersSpider()
-items = list(flyer_spider.parse_flyer_list(response))
+items = list(flyer_spider.parse(response))
 print(f"Found {len(items)} flyer items")
 for item in items:
     print(f"  - {item.get('title', 'N/A')} ({item.get('pages', 0)} pages)")
 
 print("\n=== Testing OffersSpider ===")
 offer_spider = OffersSpider()
-items = list(offer_spider.parse_offers(response))
+items = list(offer_spider.parse(response))
 print(f"Found {len(items)} offer items")
 for item in items:
     print(f"  - {item.get('productName', 'N/A')} - {item.get('currentPrice', 0)} €")
 
 print("\n=== Testing RetailersSpider ===")
 retailer_spider = RetailersSpider()
-items = list(retailer_spider.parse_retailers(response))
+items = list(retailer_spider.parse(response))
 print(f"Found {len(items)} retailer items")
 for item in items:
     print(f"  - {item.get('name', 'N/A')}")
@@ -0,0 +1,5 @@
+import os
+
+# Importing the pipelines creates the database engine, which needs a URL.
+# The engine connects lazily and the tests never use it.
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/scraper_test")
@@ -0,0 +1,99 @@
+"""upsert_rows against PostgreSQL (skipped without a reachable DATABASE_URL)
+
+The rows go to a temporary table, so no data of the database is touched.
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from database import bulk
+from database.bulk import dedupe_rows, upsert_rows
+
+
+@pytest.fixture
+def session():
+    from database.connection import engine
+
+    try:
+        connection = engine.connect()
+    except OperationalError as e:
+        pytest.skip(f"no database: {e}")
+    with connection, Session(bind=connection) as session:
+        yield session
+        session.rollback()
+
+
+@pytest.fixture
+def model(session):
+    table = Table(
+        "upsert_test", MetaData(),
+        Column("id", Integer),
+        Column("key", String, primary_key=True),
+        Column("name", String),
+        Column("note", String),
+        prefixes=["TEMPORARY"],
+    )
+    table.create(session.connection())
+    return SimpleNamespace(__table__=table)
+
+
+def rows(*values):
+    return [{"id": i, "key": key, "name": name, "note": note} for i, (key, name, note) in enumerate(values)]
+
+
+def stored(session, model):
+    return {row.key: (row.name, row.note) for row in session.execute(model.__table__.select())}
+
+
+def test_dedupe_rows_keeps_the_last_row_per_key():
+    batch = rows(("a", "first", None), ("b", "b", None), ("a", "last", None))
+    assert [(r["key"], r["name"]) for r in dedupe_rows(batch, ["key"])] == [("a", "last"), ("b", "b")]
+
+
+def test_new_and_updated_rows_are_told_apart(session, model):
+    upsert_rows(session, model, rows(("a", "A", None)), ["key"], update_columns=["name"], returning=["key"])
+    results = upsert_rows(
+        session, model, rows(("a", "A2", None), ("b", "B", None)), ["key"],
+        update_columns=["name"], returning=["key"],
+    )
+    assert sorted((row.key, row.inserted) for row in results) == [("a", False), ("b", True)]
+    assert stored(session, model) == {"a": ("A2", None), "b": ("B", None)}
+
+
+def test_duplicate_keys_in_one_batch_are_written_once(session, model):
+    results = upsert_rows(
+        session, model, rows(("a", "first", None), ("a", "last", None), ("b", "B", None)), ["key"],
+        update_columns=["name"], returning=["key"],
+    )
+    assert len(results) == 2
+    assert stored(session, model)["a"] == ("last", None)
+
+
+def test_coalesce_columns_keep_stored_values_over_null(session, model):
+    upsert_rows(session, model, rows(("a", "A", "kept")), ["key"], update_columns=["name"], coalesce_columns=["note"])
+    upsert_rows(session, model, rows(("a", "A2", None)), ["key"], update_columns=["name"], coalesce_columns=["note"])
+    upsert_rows(session, model, rows(("b", "B", None)), ["key"], update_columns=["name"], coalesce_columns=["note"])
+    upsert_rows(session, model, rows(("b", "B", "set")), ["key"], update_columns=["name"], coalesce_columns=["note"])
+    assert stored(session, model) == {"a": ("A2", "kept"), "b": ("B", "set")}
+
+
+def test_without_update_columns_conflicts_are_skipped(session, model):
+    upsert_rows(session, model, rows(("a", "A", None)), ["key"])
+    results = upsert_rows(session, model, rows(("a", "A2", None), ("b", "B", None)), ["key"], returning=["key"])
+    assert [(row.key, row.inserted) for row in results] == [("b", True)]
+    assert stored(session, model)["a"] == ("A", None)
+
+
+def test_large_batches_are_split_below_the_bind_parameter_limit(session, model, monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_BIND_PARAMS", 10)  # 2 rows of 4 columns per statement
+    batch = rows(*[(f"k{i}", f"n{i}", None) for i in range(7)])
+    assert [len(chunk) for chunk in bulk.chunked(batch, 4)] == [2, 2, 2, 1]
+    results = upsert_rows(session, model, batch, ["key"], update_columns=["name"], returning=["key"])
+    assert len(results) == 7 and all(row.inserted for row in results)
+
+
+def test_empty_batch(session, model):
+    assert upsert_rows(session, model, [], ["key"]) == []
@@ -0,0 +1,152 @@
+"""HashIndex, content hashes and DeduplicationPipeline's hit confirmation"""
+import random
+from datetime import datetime, UTC
+
+import pytest
+from scrapy.exceptions import DropItem
+
+from scraper import dedup
+from scraper.dedup import HashIndex, content_hash, hex_to_int, key_hash, set_placeholder
+from scraper.items import FlyerItem, OfferItem
+from scraper.pipelines import DeduplicationPipeline
+
+
+class Stats:
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1):
+        self.values[key] = self.values.get(key, 0) + count
+
+    def get_value(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set_value(self, key, value):
+        self.values[key] = value
+
+
+@pytest.fixture(params=[False, True], ids=["array", "numpy"])
+def numpy_available(request, monkeypatch):
+    if request.param and not dedup.NUMPY_AVAILABLE:
+        pytest.skip("numpy is not installed")
+    monkeypatch.setattr(dedup, "NUMPY_AVAILABLE", request.param)
+    return request.param
+
+
+def test_hash_index_merges_chunks_sorted_and_unique(numpy_available):
+    keys = [random.randint(-2 ** 63, 2 ** 63 - 1) for _ in range(500)]
+    index = HashIndex(chunk_size=64)
+    for key in keys + keys[:100]:
+        index.add(key)
+    index.finish()
+
+    assert list(index.hashes) == sorted(set(keys))
+    assert len(index) == len(set(keys))
+    assert index.nbytes == 8 * len(set(keys))
+    assert all(key in index for key in keys)
+    assert key_hash("url", "https://example.com/unknown") not in index
+
+
+def test_hash_index_keeps_the_last_value_across_chunks(numpy_available):
+    index = HashIndex(chunk_size=3, with_values=True)
+    for key, value in [(5, 1), (-3, 2), (5, 3), (9, 4), (-3, 5), (7, 6), (5, 7)]:
+        index.add(key, value)
+    index.finish()
+
+    assert list(index.hashes) == [-3, 5, 7, 9]
+    assert [index.get(key) for key in (-3, 5, 7, 9)] == [5, 7, 6, 4]
+    assert index.get(4) is None
+    assert index.nbytes == 16 * 4
+
+
+def test_empty_hash_index(numpy_available):
+    index = HashIndex().finish()
+    assert len(index) == 0
+    assert 1 not in index
+    assert index.false_positive_rate() == 0
+
+
+def test_content_hash_ignores_key_order():
+    fields = {
+        "retailerId": "aldi", "productName": "Butter", "currentPrice": 1.99,
+        "url": "https://example.com/offer/1",
+    }
+    forward = OfferItem(**fields)
+    backward = OfferItem(**dict(reversed(list(fields.items()))))
+    assert content_hash(forward, "offers") == content_hash(backward, "offers")
+    assert content_hash(forward, "offers") != content_hash(OfferItem(fields, currentPrice=2.49), "offers")
+
+
+def test_content_hash_leaves_out_placeholders():
+    item = FlyerItem(retailerId="aldi", title="Angebote", pages=12)
+    set_placeholder(item, "validFrom", datetime(2026, 10, 1, tzinfo=UTC))
+    later = FlyerItem(retailerId="aldi", title="Angebote", pages=12)
+    set_placeholder(later, "validFrom", datetime(2026, 10, 8, tzinfo=UTC))
+    assert content_hash(item, "flyers") == content_hash(later, "flyers")
+
+    dated = FlyerItem(retailerId="aldi", title="Angebote", pages=12, validFrom=datetime(2026, 10, 1, tzinfo=UTC))
+    assert content_hash(dated, "flyers") != content_hash(item, "flyers")
+
+
+def offer(price=1.99):
+    return OfferItem(
+        retailerId="aldi", productName="Butter", currentPrice=price,
+        url="https://example.com/offer/1", contentId="offer-1",
+    )
+
+
+def pipeline_storing(item, monkeypatch, is_stored):
+    """Pipeline whose index holds ``item``; the confirming lookup answers ``is_stored``"""
+    pipeline = DeduplicationPipeline(stats=Stats())
+    index = HashIndex(with_values=True)
+    for h in dedup.item_key_hashes(item):
+        index.add(h, hex_to_int(content_hash(item, "offers")))
+    pipeline.index = index.finish()
+    lookups = []
+
+    def lookup(item, item_hash=None):
+        lookups.append(item_hash)
+        return is_stored
+
+    monkeypatch.setattr(DeduplicationPipeline, "_is_stored", staticmethod(lookup))
+    return pipeline, lookups
+
+
+def test_confirmed_hit_is_dropped(monkeypatch):
+    pipeline, lookups = pipeline_storing(offer(), monkeypatch, is_stored=True)
+    with pytest.raises(DropItem):
+        pipeline.process_item(offer(), spider=None)
+    assert lookups == [content_hash(offer(), "offers")]
+    assert pipeline.stats.values["dedup/unchanged"] == 1
+
+
+def test_false_positive_is_passed_on(monkeypatch):
+    pipeline, lookups = pipeline_storing(offer(), monkeypatch, is_stored=False)
+    item = offer()
+    assert pipeline.process_item(item, spider=None) is item
+    assert len(lookups) == 1
+    assert pipeline.stats.values["dedup/false_positives"] == 1
+
+
+def test_changed_item_skips_the_lookup(monkeypatch):
+    pipeline, lookups = pipeline_storing(offer(), monkeypatch, is_stored=True)
+    item = offer(price=1.49)
+    assert pipeline.process_item(item, spider=None) is item
+    assert lookups == []
+    assert pipeline.stats.values["dedup/changed"] == 1
+
+
+def test_unconfirmed_hits_are_dropped_without_a_lookup(monkeypatch):
+    pipeline, lookups = pipeline_storing(offer(), monkeypatch, is_stored=False)
+    pipeline.confirm_hits = False
+    with pytest.raises(DropItem):
+        pipeline.process_item(offer(), spider=None)
+    assert lookups == []
+
+
+def test_run_duplicates_are_dropped(monkeypatch):
+    pipeline, _ = pipeline_storing(offer(), monkeypatch, is_stored=False)
+    pipeline.process_item(offer(price=1.49), spider=None)
+    with pytest.raises(DropItem):
+        pipeline.process_item(offer(price=1.49), spider=None)
+    assert pipeline.stats.values["dedup/run_duplicates"] == 1
@@ -0,0 +1,73 @@
+"""ContentAddressedCacheStorage: round trips, shared bodies, rendered entries"""
+import pytest
+from scrapy import Request
+from scrapy.http import HtmlResponse, Response
+from scrapy.utils.test import get_crawler
+
+from scraper.httpcache import ContentAddressedCacheStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    crawler = get_crawler(settings_dict={"HTTPCACHE_DIR": str(tmp_path), "HTTPCACHE_EXPIRATION_SECS": 0})
+    spider = crawler._create_spider("test")
+    storage = ContentAddressedCacheStorage(crawler.settings)
+    storage.open_spider(spider)
+    return storage, spider
+
+
+def objects(storage):
+    return list((storage.cachedir / "objects").rglob("*.gz"))
+
+
+def test_round_trip_keeps_class_status_headers_and_body(storage):
+    storage, spider = storage
+    request = Request("https://www.kaufda.de/")
+    response = HtmlResponse(
+        "https://www.kaufda.de/", status=200, body="<p>Grüße</p>".encode("utf-8"),
+        headers={"Content-Type": "text/html; charset=utf-8", "Set-Cookie": ["a=1", "b=2"]},
+        encoding="utf-8", flags=["cached"],
+    )
+    storage.store_response(spider, request, response)
+
+    cached = storage.retrieve_response(spider, request)
+    assert type(cached) is HtmlResponse
+    assert cached.status == 200
+    assert cached.body == response.body
+    assert cached.text == "<p>Grüße</p>"
+    assert cached.headers.getlist("Set-Cookie") == [b"a=1", b"b=2"]
+    assert cached.flags == ["cached"]
+    assert "cache_timestamp" in request.meta
+
+
+def test_missing_entry_is_none(storage):
+    storage, spider = storage
+    assert storage.retrieve_response(spider, Request("https://www.kaufda.de/missing")) is None
+
+
+def test_identical_bodies_are_stored_once(storage):
+    storage, spider = storage
+    for url in ("https://www.kaufda.de/a", "https://www.kaufda.de/b"):
+        storage.store_response(spider, Request(url), Response(url, body=b"same body"))
+    assert len(objects(storage)) == 1
+    assert spider.crawler.stats.get_value("httpcache/objects_deduplicated") == 1
+    assert storage.retrieve_response(spider, Request("https://www.kaufda.de/b")).url == "https://www.kaufda.de/b"
+
+
+def test_rendered_and_plain_responses_are_separate_entries(storage):
+    storage, spider = storage
+    url = "https://www.kaufda.de/Angebote"
+    storage.store_response(spider, Request(url), Response(url, body=b"plain"))
+    storage.store_response(spider, Request(url, meta={"playwright": True}), Response(url, body=b"rendered"))
+    assert storage.retrieve_response(spider, Request(url)).body == b"plain"
+    assert storage.retrieve_response(spider, Request(url, meta={"playwright": True})).body == b"rendered"
+
+
+def test_expired_entries_are_not_used(storage, monkeypatch):
+    storage, spider = storage
+    request = Request("https://www.kaufda.de/")
+    storage.store_response(spider, request, Response(request.url, body=b"old"))
+    storage.expiration_secs = 60
+    monkeypatch.setattr("scraper.httpcache.time.time", lambda: 1e12)
+    assert storage.retrieve_response(spider, request) is None
+    assert spider.crawler.stats.get_value("httpcache/expired") == 1
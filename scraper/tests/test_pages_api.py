@@ -0,0 +1,92 @@
+"""Pages API parsing: streaming and whole-body decoding give the same results"""
+import json
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from scraper import pages_api
+from scraper.pages_api import iter_page_models, iter_pages
+
+FIXTURE = Path(__file__).resolve().parent.parent / "pages_api_response.json"
+
+
+class Stats:
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1):
+        self.values[key] = self.values.get(key, 0) + count
+
+
+@pytest.fixture(params=[True, False], ids=["streaming", "whole"])
+def streaming(request):
+    if request.param and not pages_api.IJSON_AVAILABLE:
+        pytest.skip("ijson is not installed")
+    return request.param
+
+
+def offer(offer_id, price=1.99):
+    return {"content": {"type": "offer", "id": offer_id, "products": [{"name": "Butter"}], "deals": [{"min": price}]}}
+
+
+def body(document) -> bytes:
+    return json.dumps(document).encode("utf-8")
+
+
+def pages(document, streaming, stats=None):
+    return list(iter_page_models(body(document), stats, streaming=streaming))
+
+
+def test_pages_in_order_with_float_prices(streaming):
+    document = {"contents": [
+        {"number": 1, "offers": [offer("o1", 1.5)]},
+        {"number": 2, "offers": [offer("o2", 2)]},
+    ]}
+    result = pages(document, streaming)
+    assert [page.number for page in result] == [1, 2]
+    assert [page.offers[0].content.deals[0].min for page in result] == [1.5, 2.0]
+    # ijson would return Decimal without use_float
+    assert not any(isinstance(page["offers"][0]["content"]["deals"][0]["min"], Decimal)
+                   for page in iter_pages(body(document), streaming=streaming))
+
+
+def test_invalid_entries_are_dropped_and_counted(streaming):
+    stats = Stats()
+    document = {"contents": [
+        {"number": 1, "offers": [offer("o1"), offer("o2", price=0)]},
+        {"number": "not a number"},
+        {"number": 3},
+    ]}
+    assert [page.number for page in pages(document, streaming, stats)] == [1, 3]
+    assert stats.values == {"schema/dropped/PageOffer": 1, "schema/dropped/Page": 1}
+
+
+@pytest.mark.parametrize("document", [
+    {"contents": {"number": 1}},
+    {"contents": "none"},
+    {"contents": None},
+    {"meta": {"contents": []}, "contents": 1},
+    [{"number": 1}],
+])
+def test_contents_that_is_not_a_list_raises(document, streaming):
+    with pytest.raises(ValidationError):
+        pages(document, streaming)
+
+
+def test_missing_contents_has_no_pages(streaming):
+    assert pages({"meta": {"contents": [{"number": 1}]}}, streaming) == []
+
+
+def test_contents_after_other_keys(streaming):
+    assert [page.number for page in pages({"meta": {"total": 1}, "contents": [{"number": 1}]}, streaming)] == [1]
+
+
+def test_fixture_gives_the_same_pages_both_ways():
+    if not pages_api.IJSON_AVAILABLE:
+        pytest.skip("ijson is not installed")
+    data = FIXTURE.read_bytes()
+    streamed = [page.model_dump() for page in iter_page_models(data)]
+    whole = [page.model_dump() for page in iter_page_models(data, streaming=False)]
+    assert streamed == whole and len(streamed) == 22
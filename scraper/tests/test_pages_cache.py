@@ -0,0 +1,147 @@
+"""PagesCache: hits, revalidation and pruning of stored pages API responses"""
+import sqlite3
+from datetime import datetime, timedelta, UTC
+
+import pytest
+from scrapy.http import Response
+
+from scraper.pages_cache import PagesCache
+
+
+class Stats:
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1):
+        self.values[key] = self.values.get(key, 0) + count
+
+
+BODY = b'{"contents": []}' * 100
+NOW = datetime.now(UTC)
+
+
+def response(body=BODY):
+    return Response(
+        "https://content-viewer-be.kaufda.de/v1/brochures/1/pages", body=body,
+        headers={"ETag": '"v1"', "Last-Modified": "Wed, 01 Oct 2026 00:00:00 GMT"},
+    )
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "pages_cache.sqlite3"
+
+
+def opened(path, retention_days=14):
+    cache = PagesCache(Stats(), str(path), retention_days=retention_days)
+    cache.open()
+    return cache
+
+
+def closed(cache):
+    # close() without the reactor: wait for the writer thread, then close the reader
+    cache._finish()
+    cache._close_reader(None)
+
+
+def store(path, entries):
+    """Store a response per ``{content_id: valid_until}``"""
+    cache = opened(path)
+    for content_id, valid_until in entries.items():
+        cache.store(content_id, response(), valid_until)
+    closed(cache)
+
+
+def stored(path, entries):
+    """Cache reopened after storing ``entries``"""
+    store(path, entries)
+    return opened(path)
+
+
+def test_valid_brochure_is_a_hit(path):
+    cache = stored(path, {"a": NOW + timedelta(days=3)})
+    assert cache.lookup("a", NOW + timedelta(days=3)) == BODY
+    assert cache.stats.values["pages_cache/hit"] == 1
+    closed(cache)
+
+
+def test_expired_brochure_is_revalidated(path):
+    cache = stored(path, {"a": NOW - timedelta(days=1)})
+    assert cache.lookup("a", NOW - timedelta(days=1)) is None
+    assert cache.stats.values["pages_cache/stale"] == 1
+    assert cache.conditional_headers("a") == {
+        "If-None-Match": '"v1"', "If-Modified-Since": "Wed, 01 Oct 2026 00:00:00 GMT",
+    }
+    assert cache.revalidated("a", NOW + timedelta(days=7)) == BODY
+    closed(cache)
+
+    # The 304 extended the entry
+    cache = opened(path)
+    assert cache.lookup("a", NOW + timedelta(days=7)) == BODY
+    closed(cache)
+
+
+def test_brochure_without_valid_until_is_revalidated(path):
+    cache = stored(path, {"a": None})
+    assert cache.lookup("a", None) is None
+    assert cache.stats.values["pages_cache/stale"] == 1
+    assert "If-None-Match" in cache.conditional_headers("a")
+    closed(cache)
+
+
+def test_unknown_brochure_is_a_miss(path):
+    cache = opened(path)
+    assert cache.lookup("a", NOW + timedelta(days=3)) is None
+    assert cache.stats.values["pages_cache/miss"] == 1
+    assert cache.conditional_headers("a") == {}
+    closed(cache)
+
+
+def test_naive_valid_until_is_utc(path):
+    cache = stored(path, {"a": (NOW + timedelta(hours=2)).replace(tzinfo=None)})
+    assert cache.lookup("a", (NOW + timedelta(hours=2)).replace(tzinfo=None)) == BODY
+    closed(cache)
+
+
+def test_entries_past_the_retention_are_pruned(path):
+    store(path, {
+        "recent": NOW - timedelta(days=2),
+        "old": NOW - timedelta(days=30),
+        "undated": None,
+        "old_undated": None,
+    })
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "UPDATE pages_cache SET fetched_at = ? WHERE content_id = 'old_undated'",
+            ((NOW - timedelta(days=30)).isoformat(),),
+        )
+
+    cache = opened(path, retention_days=14)
+    assert sorted(cache.known) == ["recent", "undated"]
+    assert cache.stats.values["pages_cache/expired"] == 2
+    closed(cache)
+
+
+def test_full_response_to_a_stale_entry_replaces_it(path):
+    cache = stored(path, {"a": NOW - timedelta(days=1)})
+    cache.store("a", response(b'{"contents": [{}]}'), NOW + timedelta(days=7))
+    assert cache.stats.values["pages_cache/changed"] == 1
+    closed(cache)
+
+    cache = opened(path)
+    assert cache.lookup("a", NOW + timedelta(days=7)) == b'{"contents": [{}]}'
+    closed(cache)
+
+
+def test_corrupt_payload_is_forgotten(path):
+    store(path, {"a": NOW + timedelta(days=3)})
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE pages_cache SET payload = ? WHERE content_id = 'a'", (b"garbage",))
+
+    cache = opened(path)
+    assert cache.lookup("a", NOW + timedelta(days=3)) is None
+    assert cache.stats.values["pages_cache/corrupt"] == 1
+    closed(cache)
+    cache = opened(path)
+    assert cache.known == {}
+    closed(cache)
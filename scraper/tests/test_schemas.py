@@ -0,0 +1,114 @@
+"""Schema decoders: entries that fail are dropped and counted, containers fail loudly"""
+import logging
+
+import pytest
+from pydantic import ValidationError
+
+from scraper.schemas import Brochure, DroppedEntries, HomepageData, PagesResponse, decode
+
+
+class Stats:
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key, count=1):
+        self.values[key] = self.values.get(key, 0) + count
+
+
+def brochure(**fields):
+    return {"id": "b1", "contentId": "c1", "title": "Angebote", "pageCount": 12, **fields}
+
+
+def homepage(brochures=None, offers=None):
+    info = {}
+    if brochures is not None:
+        info["brochures"] = {"topRanked": brochures}
+    if offers is not None:
+        info["offers"] = {"main": {"items": offers}}
+    return {"props": {"pageProps": {"pageInformation": info}}}
+
+
+@pytest.mark.parametrize("valid_from, valid_until", [
+    ("2026-10-01T00:00:00", "2026-10-08T00:00:00"),
+    ("2026-10-01T00:00:00", "2026-10-08T00:00:00Z"),
+    ("2026-10-01T00:00:00+02:00", "2026-10-08T00:00:00"),
+    (None, "2099-01-01T00:00:00"),
+])
+def test_naive_and_aware_dates_compare(valid_from, valid_until):
+    decode(Brochure, brochure(validFrom=valid_from, validUntil=valid_until))
+
+
+@pytest.mark.parametrize("valid_from, valid_until", [
+    ("2026-10-08T00:00:00", "2026-10-01T00:00:00"),
+    ("2026-10-08T00:00:00", "2026-10-01T00:00:00Z"),
+    (None, "2000-01-01T00:00:00"),
+])
+def test_dates_in_the_wrong_order_are_a_validation_error(valid_from, valid_until):
+    with pytest.raises(ValidationError):
+        decode(Brochure, brochure(validFrom=valid_from, validUntil=valid_until))
+
+
+def test_invalid_brochures_are_dropped_and_counted():
+    stats = Stats()
+    data = decode(HomepageData, homepage(brochures=[
+        brochure(),
+        brochure(id="b2", title=""),
+        brochure(id="b3", pageCount=0),
+        brochure(id="b4", validFrom="2026-10-08T00:00:00", validUntil="2026-10-01T00:00:00"),
+    ]), stats)
+    assert [b.id for b in data.brochures.topRanked] == ["b1"]
+    assert stats.values == {"schema/dropped/Brochure": 3}
+
+
+def test_offers_without_a_price_are_dropped():
+    stats = Stats()
+    offers = [
+        {"id": "o1", "title": "Butter", "prices": {"mainPrice": 1.99}},
+        {"id": "o2", "title": "Milch", "prices": {"mainPrice": 0}},
+        {"id": "o3", "title": "Brot"},
+    ]
+    data = decode(HomepageData, homepage(offers=offers), stats)
+    assert [o.id for o in data.offers.main.items] == ["o1"]
+    assert stats.values == {"schema/dropped/Offer": 2}
+
+
+def test_brochures_fall_back_to_page_props():
+    data = decode(HomepageData, {"props": {"pageProps": {
+        "pageInformation": {"brochures": {}},
+        "brochures": {"topRanked": [brochure()]},
+    }}})
+    assert [b.id for b in data.brochures.topRanked] == ["b1"]
+
+
+@pytest.mark.parametrize("document", [
+    {"props": {"pageProps": {"pageInformation": {"brochures": {"topRanked": {"id": "b1"}}}}}},
+    {"props": {"pageProps": {"pageInformation": {"offers": {"main": {"items": "none"}}}}}},
+    {"props": []},
+])
+def test_changed_containers_fail_loudly(document):
+    with pytest.raises(ValidationError):
+        decode(HomepageData, document)
+
+
+def test_pages_api_offers_are_checked_only_for_offer_content():
+    response = decode(PagesResponse, {"contents": [{"number": 1, "offers": [
+        {"content": {"type": "offer", "id": "o1", "products": [{"name": "Butter"}], "deals": [{"min": 1.99}]}},
+        {"content": {"type": "offer", "id": "o2", "products": [{"name": "Milch"}], "deals": []}},
+        {"content": {"type": "link"}},
+    ]}]})
+    contents = [offer.content for offer in response.contents[0].offers]
+    assert [(c.type, c.id) for c in contents] == [("offer", "o1"), ("link", None)]
+
+
+def test_dropped_entries_are_summed_up_per_document(caplog):
+    stats = Stats()
+    dropped = DroppedEntries(stats)
+    with caplog.at_level(logging.DEBUG, logger="scraper.schemas"):
+        decode(HomepageData, homepage(
+            brochures=[brochure(title=""), brochure(pageCount=0)],
+            offers=[{"id": "o1", "title": "Butter"}],
+        ), dropped)
+    assert str(dropped) == "2 Brochure, 1 Offer"
+    assert stats.values == dropped.counts
+    # One debug line per entry: the caller logs the summary
+    assert {record.levelno for record in caplog.records} == {logging.DEBUG}
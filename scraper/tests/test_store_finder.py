@@ -0,0 +1,75 @@
+"""StoreFinder: single-pass scan and learned store paths"""
+from scraper.store_finder import StoreFinder, format_path, is_store_like
+
+
+def store(n):
+    return {"address": f"Hauptstr. {n}", "city": "Berlin", "postalCode": "10115"}
+
+
+def page(stores, key="stores"):
+    return {"props": {"pageProps": {"retailer": {"name": "Aldi", key: stores}}}}
+
+
+def test_is_store_like_needs_two_address_fields():
+    assert is_store_like({"address": "Hauptstr. 1", "city": "Berlin"})
+    assert not is_store_like({"address": "Hauptstr. 1"})
+    assert not is_store_like(["address", "city"])
+
+
+def test_scan_finds_stores_in_document_order():
+    data = {"a": [store(1), {"nested": store(2)}], "b": store(3)}
+    assert StoreFinder().find(data) == [store(1), store(2), store(3)]
+
+
+def test_scan_reports_shared_objects_once():
+    shared = store(1)
+    assert StoreFinder().find({"a": shared, "b": [shared]}) == [shared]
+
+
+def test_scan_stops_at_max_depth():
+    data = {"a": {"b": {"c": store(1)}}}
+    assert StoreFinder(max_depth=2).find(data) == []
+    assert StoreFinder(max_depth=3).find(data) == [store(1)]
+
+
+def test_learns_the_list_holding_all_stores():
+    finder = StoreFinder()
+    finder.find(page([store(1), store(2)]), template="/Geschaefte/[slug]")
+    assert finder.last_source == "scan"
+    assert finder.known_paths["/Geschaefte/[slug]"] == ("props", "pageProps", "retailer", "stores")
+
+    assert finder.find(page([store(3)]), template="/Geschaefte/[slug]") == [store(3)]
+    assert finder.last_source == "known_path"
+
+
+def test_does_not_learn_stores_spread_over_several_lists():
+    finder = StoreFinder()
+    data = {"a": [store(1)], "b": [store(2)]}
+    assert finder.find(data, template="/Geschaefte/[slug]") == [store(1), store(2)]
+    assert finder.known_paths == {}
+
+
+def test_stale_known_path_falls_back_to_a_full_scan():
+    finder = StoreFinder()
+    finder.find(page([store(1)]), template="/Geschaefte/[slug]")
+
+    # The template moved its stores: the path is forgotten and relearned
+    moved = page([store(2), store(3)], key="branches")
+    assert finder.find(moved, template="/Geschaefte/[slug]") == [store(2), store(3)]
+    assert finder.last_source == "scan"
+    assert finder.known_paths["/Geschaefte/[slug]"] == ("props", "pageProps", "retailer", "branches")
+
+
+def test_known_path_without_stores_falls_back_to_a_full_scan():
+    finder = StoreFinder()
+    finder.find(page([store(1)]), template="/Geschaefte/[slug]")
+
+    data = page([{"name": "not a store"}])
+    data["props"]["pageProps"]["footer"] = {"store": store(4)}
+    assert finder.find(data, template="/Geschaefte/[slug]") == [store(4)]
+    assert finder.last_source == "scan"
+
+
+def test_format_path():
+    assert format_path(((None, "a"), 0)) == "a[0]"
+    assert format_path((((None, "a"), "b"), "c")) == "a.b.c"
@@ -1,5 +1,5 @@
 """Data validation utilities"""
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 from typing import Optional
 from datetime import datetime
 
@@ -18,9 +18,10 @@ class FlyerData(BaseModel):
     publishedFrom: Optional[datetime] = None
     publishedUntil: Optional[datetime] = None
 
-    @validator("validUntil")
-    def validate_dates(cls, v, values):
-        if "validFrom" in values and v < values["validFrom"]:
+    @field_validator("validUntil")
+    @classmethod
+    def validate_dates(cls, v: datetime, info: ValidationInfo) -> datetime:
+        if "validFrom" in info.data and v < info.data["validFrom"]:
             raise ValueError("validUntil must be after validFrom")
         return v
 